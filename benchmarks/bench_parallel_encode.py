@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+并行分组编码基准测试
+
+生成一组合成片段，分别用 1..N 个FFmpeg进程强制重编码合并，
+输出每种进程数的耗时和相对单进程的加速比。
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from myproject.video_merger import VideoMerger
+from synthetic import generate_clip_set
+
+
+def parse_args():
+    """解析命令行参数"""
+    cpu_count = os.cpu_count() or 4
+    parser = argparse.ArgumentParser(description="并行分组编码基准测试")
+    parser.add_argument("--clips", type=int, default=24, help="合成片段数量")
+    parser.add_argument("--duration", type=float, default=20, help="每个片段的时长（秒）")
+    parser.add_argument("--size", default="1280x720", help="片段分辨率")
+    parser.add_argument("--preset", default="faster", help="编码预设")
+    parser.add_argument("--max-processes", type=int, default=min(cpu_count, 16), help="最大进程数")
+    parser.add_argument("--work-dir", default=None, help="工作目录（默认使用临时目录）")
+    parser.add_argument("--output", default=None, help="把结果写入JSON文件")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_parallel_encode_")
+    input_dir = os.path.join(work_dir, "input")
+    output_dir = os.path.join(work_dir, "output")
+
+    print(f"生成 {args.clips} 个合成片段到 {input_dir} ...")
+    generate_clip_set(input_dir, args.clips, duration=args.duration, size=args.size)
+
+    process_counts = []
+    n = 1
+    while n <= args.max_processes:
+        process_counts.append(n)
+        n *= 2
+    if process_counts[-1] != args.max_processes:
+        process_counts.append(args.max_processes)
+
+    results = []
+    for processes in process_counts:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        merger = VideoMerger(input_dir=input_dir, output_dir=output_dir, probe_cache=False)
+        start = time.perf_counter()
+        merger.merge_videos("bench", force_encode=True, auto_split=False, use_hw_accel=False,
+                            encode_preset=args.preset, encode_processes=processes)
+        elapsed = time.perf_counter() - start
+        results.append({"processes": processes, "seconds": round(elapsed, 3)})
+
+    baseline = results[0]["seconds"]
+    print("\n进程数  耗时(秒)  加速比")
+    for r in results:
+        r["speedup"] = round(baseline / r["seconds"], 2) if r["seconds"] else 0
+        print(f"{r['processes']:>6}  {r['seconds']:>8.2f}  {r['speedup']:>6.2f}x")
+
+    report = {
+        "benchmark": "parallel_encode",
+        "cpu_count": os.cpu_count(),
+        "clips": args.clips,
+        "clip_duration": args.duration,
+        "size": args.size,
+        "preset": args.preset,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if not args.work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
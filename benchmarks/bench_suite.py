@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+完整基准测试套件
+
+用FFmpeg lavfi（testsrc/sine）生成几种典型形态的合成片段集：
+大量短片段、少量长片段、混合编码、混合分辨率、部分缺少音轨，
+分别测量文件扫描、探测（冷/热缓存）、兼容性检查、各种合并模式、
+自动分割和字幕音频提取的耗时，结果写为JSON，便于在不同提交之间比较。
+
+只依赖FFmpeg，可在离线环境中运行；语音识别模型不存在时只测量音频提取。
+
+用法：
+    python benchmarks/bench_suite.py --output before.json
+    python benchmarks/bench_suite.py --output after.json --baseline before.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import platform
+import argparse
+import resource
+import tempfile
+import statistics
+import subprocess
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from myproject.video_merger import VideoMerger
+from myproject.probe_cache import ProbeCache
+from myproject.subtitle_generator import SubtitleGenerator
+from synthetic import generate_clip_specs
+
+SUITE_VERSION = 1
+
+
+def shape_specs(shape, scale=1.0):
+    """返回某种形态的片段参数列表，scale 按比例调整片段数量"""
+    def count(n):
+        return max(2, int(round(n * scale)))
+
+    if shape == 'many_short':
+        return [dict(duration=2, size='640x360') for _ in range(count(120))]
+    if shape == 'few_long':
+        return [dict(duration=60, size='1280x720') for _ in range(count(3))]
+    if shape == 'mixed_codecs':
+        # 每三个片段中有一个MPEG-4 Part 2视频，每四个片段中有一个AC-3音频
+        return [dict(duration=5, size='1280x720',
+                     vcodec='mpeg4' if i % 3 == 2 else 'libx264',
+                     acodec='ac3' if i % 4 == 3 else 'aac')
+                for i in range(count(8))]
+    if shape == 'mixed_resolutions':
+        return [dict(duration=5, size='640x360' if i % 4 == 3 else '1280x720',
+                     rate=30 if i % 5 == 4 else 25)
+                for i in range(count(8))]
+    if shape == 'missing_audio':
+        return [dict(duration=5, size='1280x720', audio=i % 3 != 1) for i in range(count(8))]
+    if shape == 'mixed_containers':
+        # 相同的H.264/AAC流，每三个片段中有一个MKV、一个AVI
+        return [dict(duration=5, size='1280x720', ext=('mp4', 'mkv', 'avi')[i % 3])
+                for i in range(count(9))]
+    if shape == 'audio_offset':
+        # 每三个片段中有一个音频比视频晚0.5秒开始
+        return [dict(duration=5, size='1280x720', audio_offset=0.5 if i % 3 == 1 else 0.0)
+                for i in range(count(9))]
+    raise ValueError(f"未知的片段集形态: {shape}")
+
+
+SHAPES = ['many_short', 'few_long', 'mixed_codecs', 'mixed_resolutions', 'missing_audio',
+          'mixed_containers', 'audio_offset']
+
+
+def build_shape(work_dir, shape, scale):
+    """生成片段集，目录名包含参数摘要，参数相同时可在同一工作目录中复用"""
+    specs = shape_specs(shape, scale)
+    encoded = json.dumps(specs, sort_keys=True).encode('utf-8')
+    digest = hashlib.blake2b(encoded, digest_size=4).hexdigest()
+    input_dir = os.path.join(work_dir, f"{shape}_{digest}")
+    names = generate_clip_specs(input_dir, specs)
+    return input_dir, names, specs
+
+
+def time_repeated(func, repeat):
+    """多次运行 func，返回耗时的最小值和中位数"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {'seconds': round(min(samples), 6), 'median': round(statistics.median(samples), 6),
+            'repeat': repeat}
+
+
+def new_merger(input_dir, output_dir, probe_cache=False, **kwargs):
+    return VideoMerger(input_dir=input_dir, output_dir=output_dir, probe_cache=probe_cache,
+                       show_progress=False, **kwargs)
+
+
+def children_io():
+    """已结束子进程累计写入和读取的字节数（Linux上 ru_oublock/ru_inblock 以512字节为单位）"""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_oublock * 512, usage.ru_inblock * 512
+
+
+def merge_modes(args, names, total_duration):
+    """返回 (模式名, merge_videos参数, 预先合并的片段列表, VideoMerger参数) 列表"""
+    common = dict(auto_split=False, use_hw_accel=False, encode_preset=args.preset, resume=False)
+    parts = 3
+    split_duration = max(total_duration / parts, 1.0)
+    split = dict(common, auto_split=True, split_max_duration=split_duration)
+    modes = [
+        ('simple', dict(common, simple_mode=True), None, {}),
+        ('selective', dict(common, normalize_mode='selective'), None, {}),
+        ('full_normalize', dict(common, normalize_mode='full'), None, {}),
+        ('force_encode', dict(common, force_encode=True), None, {}),
+        ('parallel_encode', dict(common, force_encode=True, encode_processes=args.processes),
+         None, {}),
+        ('auto_split', split, None, {}),
+        ('split_from_sources', dict(split, split_from_sources=True), None, {}),
+        # 输出布局：对比全部使用faststart（中间文件也重写）和各种布局下自动分割流程的写入量
+        ('layout_all_faststart', split, None,
+         dict(output_layout='faststart', intermediate_layout='faststart')),
+        ('layout_all_fragmented', split, None,
+         dict(output_layout='fragmented', intermediate_layout='fragmented')),
+        ('layout_all_plain', split, None, dict(output_layout='plain', intermediate_layout='plain')),
+    ]
+    if len(names) > 1:
+        # 增量模式：先合并除最后一个片段外的全部片段，再计时追加最后一个片段
+        modes.append(('incremental', dict(common, incremental=True), names[:-1], {}))
+    return modes
+
+
+def run_merge(input_dir, output_dir, names, kwargs, prepare, merger_kwargs):
+    shutil.rmtree(output_dir, ignore_errors=True)
+    merger = new_merger(input_dir, output_dir, **merger_kwargs)
+    if prepare:
+        merger.merge_videos("bench", video_files=prepare, **kwargs)
+        merger = new_merger(input_dir, output_dir, **merger_kwargs)
+    written_before, read_before = children_io()
+    start = time.perf_counter()
+    result = merger.merge_videos("bench", video_files=list(names), **kwargs)
+    elapsed = time.perf_counter() - start
+    written_after, read_after = children_io()
+    totals = result.metrics.stage_totals()
+    return {
+        'seconds': round(elapsed, 6),
+        # 子进程实际写入/读取的块设备字节数（含faststart重写），以及指标中记录的逻辑写入量
+        'child_bytes_written': written_after - written_before,
+        'child_bytes_read': read_after - read_before,
+        'bytes_written': sum(total.get('bytes_written') or 0 for total in totals.values()),
+        'success': result.success,
+        'strategy': result.strategy,
+        'outputs': len(result.outputs),
+        'output_bytes': sum(os.path.getsize(p) for p in result.outputs if os.path.exists(p)),
+        'stages': {name: total['wall_time'] for name, total in totals.items()},
+    }, result
+
+
+def bench_subtitles(output_dir, video_path):
+    """测量字幕生成：总是测量音频提取，语音识别模型存在时再测量完整识别"""
+    subtitle_dir = os.path.join(output_dir, "subtitles")
+    generator = SubtitleGenerator(input_dir=output_dir, output_dir=subtitle_dir)
+    audio_path = os.path.join(subtitle_dir, "bench_audio.wav")
+    start = time.perf_counter()
+    ok = generator.extract_audio(video_path, audio_path)
+    results = {'extract_audio': {'seconds': round(time.perf_counter() - start, 6), 'success': ok}}
+    if os.path.exists(generator.model_path):
+        start = time.perf_counter()
+        subtitle = generator.generate_subtitle(video_path)
+        results['recognize'] = {'seconds': round(time.perf_counter() - start, 6),
+                                'success': bool(subtitle)}
+    else:
+        results['recognize'] = {'skipped': f"找不到语音识别模型: {generator.model_path}"}
+    return results
+
+
+def bench_shape(args, work_dir, shape):
+    print(f"\n=== {shape} ===")
+    input_dir, names, specs = build_shape(work_dir, shape, args.scale)
+    output_dir = os.path.join(work_dir, f"{shape}_output")
+    print(f"{len(names)} 个片段：{input_dir}")
+    ops = {}
+
+    merger = new_merger(input_dir, output_dir)
+    ops['get_video_files'] = time_repeated(merger.get_video_files, args.repeat)
+
+    # 冷探测：每次使用新的合并器且不使用持久化缓存
+    ops['probe_cold'] = time_repeated(
+        lambda: new_merger(input_dir, output_dir).get_media_info(names), args.repeat)
+
+    # 热缓存：持久化缓存已填充后由新的合并器读取
+    cache_path = os.path.join(work_dir, f"{shape}_probe_cache.sqlite3")
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+    cache = ProbeCache(cache_path)
+    new_merger(input_dir, output_dir, probe_cache=cache).get_media_info(names)
+    ops['probe_warm_cache'] = time_repeated(
+        lambda: new_merger(input_dir, output_dir, probe_cache=cache).get_media_info(names),
+        args.repeat)
+    cache.close()
+
+    # 兼容性检查：探测结果已在内存中，只测量分组和比较本身
+    media_info = merger.get_media_info(names)
+    compatible = merger.check_codecs_compatibility(names)
+    ops['check_codecs_compatibility'] = time_repeated(
+        lambda: merger.check_codecs_compatibility(names), args.repeat)
+    ops['check_codecs_compatibility']['compatible'] = compatible
+    total_duration = sum(info.duration for info in media_info.values() if info is not None)
+
+    merges = {}
+    subtitle_source = None
+    for mode, kwargs, prepare, merger_kwargs in merge_modes(args, names, total_duration):
+        print(f"--- 合并模式 {mode} ---")
+        merges[mode], result = run_merge(input_dir, output_dir, names, kwargs, prepare,
+                                         merger_kwargs)
+        if mode == 'selective' and result.success and result.outputs:
+            subtitle_source = os.path.join(work_dir, f"{shape}_subtitle_source.mp4")
+            shutil.copyfile(result.outputs[0], subtitle_source)
+    ops['merge'] = merges
+
+    if subtitle_source:
+        ops['subtitles'] = bench_subtitles(output_dir, subtitle_source)
+        os.remove(subtitle_source)
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {'clips': len(names), 'media_duration': round(total_duration, 3), 'specs': specs,
+            'operations': ops}
+
+
+def git_revision():
+    """当前提交和工作区是否有未提交的修改"""
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    cwd=root, capture_output=True, text=True,
+                                    check=True).stdout.strip())
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+
+def host_info():
+    try:
+        ffmpeg = subprocess.run(['ffmpeg', '-version'], capture_output=True,
+                                text=True).stdout.splitlines()[0]
+    except (OSError, IndexError):
+        ffmpeg = None
+    return {'platform': platform.platform(), 'machine': platform.machine(),
+            'cpu_count': os.cpu_count(), 'python': platform.python_version(), 'ffmpeg': ffmpeg}
+
+
+def flatten(report):
+    """把报告展开为 {“形态/操作”: 秒数}，用于比较"""
+    flat = {}
+    for shape, data in report.get('shapes', {}).items():
+        for op, value in data.get('operations', {}).items():
+            if 'seconds' in value:
+                flat[f"{shape}/{op}"] = value['seconds']
+            else:
+                for sub, sub_value in value.items():
+                    if isinstance(sub_value, dict) and 'seconds' in sub_value:
+                        flat[f"{shape}/{op}/{sub}"] = sub_value['seconds']
+    return flat
+
+
+def print_layout_io(report):
+    """打印各输出布局下自动分割流程的写入量，对比全部使用faststart时节省的I/O"""
+    for shape, data in report.get('shapes', {}).items():
+        merges = data.get('operations', {}).get('merge', {})
+        baseline = merges.get('layout_all_faststart')
+        if not baseline:
+            continue
+        print(f"\n{shape} 输出布局写入量（子进程块设备写入 / 指标记录）：")
+        for mode in ('layout_all_faststart', 'auto_split', 'layout_all_fragmented',
+                     'layout_all_plain'):
+            r = merges.get(mode)
+            if not r:
+                continue
+            saved = baseline['bytes_written'] - r['bytes_written']
+            print(f"  {mode:<24} {r['child_bytes_written']/1024/1024:>9.1f} MB / "
+                  f"{r['bytes_written']/1024/1024:>9.1f} MB"
+                  f"，比全部faststart少写 {saved/1024/1024:.1f} MB")
+
+
+def compare(baseline, report):
+    """打印两次结果中相同操作的耗时对比"""
+    old, new = flatten(baseline), flatten(report)
+    old_commit = (baseline.get('git') or {}).get('commit')
+    new_commit = (report.get('git') or {}).get('commit')
+    print(f"\n与基线比较（{old_commit} -> {new_commit}）")
+    print(f"{'操作':<50} {'基线(秒)':>10} {'本次(秒)':>10} {'比值':>8}")
+    for key in sorted(set(old) & set(new)):
+        ratio = new[key] / old[key] if old[key] else 0
+        print(f"{key:<50} {old[key]:>10.3f} {new[key]:>10.3f} {ratio:>7.2f}x")
+    for key in sorted(set(new) - set(old)):
+        print(f"{key:<50} {'-':>10} {new[key]:>10.3f}")
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="视频合并基准测试套件")
+    parser.add_argument("--shapes", nargs='+', choices=SHAPES, default=SHAPES, help="要运行的片段集形态")
+    parser.add_argument("--scale", type=float, default=1.0, help="按比例调整每种形态的片段数量")
+    parser.add_argument("--repeat", type=int, default=3, help="扫描、探测和兼容性检查的重复次数")
+    parser.add_argument("--preset", default="ultrafast", help="重编码合并模式使用的编码预设")
+    parser.add_argument("--processes", type=int, default=min(os.cpu_count() or 4, 4),
+                        help="parallel_encode 模式的进程数")
+    parser.add_argument("--work-dir", default=None,
+                        help="工作目录（默认使用临时目录；指定时保留合成片段供下次复用）")
+    parser.add_argument("--output", default=None, help="把结果写入JSON文件")
+    parser.add_argument("--baseline", default=None, help="与之前保存的JSON结果比较")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if shutil.which('ffmpeg') is None or shutil.which('ffprobe') is None:
+        print("错误：需要ffmpeg和ffprobe")
+        sys.exit(1)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_suite_")
+    os.makedirs(work_dir, exist_ok=True)
+    report = {
+        'benchmark': 'suite',
+        'version': SUITE_VERSION,
+        'created': time.time(),
+        'git': git_revision(),
+        'host': host_info(),
+        'options': {'scale': args.scale, 'repeat': args.repeat, 'preset': args.preset,
+                    'processes': args.processes},
+        'shapes': {},
+    }
+    try:
+        for shape in args.shapes:
+            report['shapes'][shape] = bench_shape(args, work_dir, shape)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n{'操作':<50} {'耗时(秒)':>10}")
+    for key, seconds in flatten(report).items():
+        print(f"{key:<50} {seconds:>10.3f}")
+    print_layout_io(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+基于FFmpeg lavfi（testsrc/sine）生成合成测试片段
+
+只依赖FFmpeg，可在离线环境中生成可复现的测试素材。
+"""
+
+import os
+import subprocess
+
+
+def generate_clip(path, duration=10, size='1280x720', rate=25, vcodec='libx264',
+                  acodec='aac', sample_rate=44100, audio=True, pix_fmt='yuv420p', audio_offset=0.0):
+    """生成一个合成片段
+
+    Args:
+        path (str): 输出文件路径
+        duration (float): 时长（秒）
+        size (str): 分辨率
+        rate (int): 帧率
+        vcodec (str): 视频编码器
+        acodec (str): 音频编码器
+        sample_rate (int): 音频采样率
+        audio (bool): 是否包含音轨
+        pix_fmt (str): 像素格式
+        audio_offset (float): 音频相对视频推迟开始的秒数
+    """
+    if os.path.exists(path):
+        return path
+    cmd = [
+        'ffmpeg', '-y', '-v', 'error', '-nostdin',
+        '-f', 'lavfi', '-i', f'testsrc=size={size}:rate={rate}:duration={duration}',
+    ]
+    if audio:
+        if audio_offset:
+            cmd += ['-itsoffset', str(audio_offset)]
+        cmd += ['-f', 'lavfi', '-i',
+                f'sine=frequency=440:sample_rate={sample_rate}:duration={duration}']
+    cmd += ['-c:v', vcodec, '-pix_fmt', pix_fmt]
+    if vcodec in ('libx264', 'libx265'):
+        cmd += ['-preset', 'ultrafast']
+    if audio:
+        cmd += ['-c:a', acodec, '-shortest']
+    cmd.append(path)
+    subprocess.run(cmd, check=True)
+    return path
+
+
+def generate_clip_set(directory, count, **kwargs):
+    """在目录中生成 count 个相同参数的片段，返回文件名列表"""
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for i in range(1, count + 1):
+        name = f"clip{i}.mp4"
+        generate_clip(os.path.join(directory, name), **kwargs)
+        names.append(name)
+    return names
+
+
+def generate_clip_specs(directory, specs):
+    """在目录中按参数列表逐个生成片段（参数可以各不相同），返回文件名列表
+
+    Args:
+        directory (str): 输出目录
+        specs (list): 每个片段的 generate_clip 参数字典，可用 ext 指定容器（默认mp4）
+    """
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for i, spec in enumerate(specs, 1):
+        spec = dict(spec)
+        name = f"clip{i}.{spec.pop('ext', 'mp4')}"
+        generate_clip(os.path.join(directory, name), **spec)
+        names.append(name)
+    return names
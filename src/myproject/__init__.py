@@ -1,6 +1,15 @@
 # myproject package - 视频合并工具
 
 from .video_merger import VideoMerger
+from .media_probe import MediaProbe, MediaInfo, StreamInfo
+from .probe_cache import ProbeCache
+from .async_probe import AsyncProbeEngine
+from .compatibility import CompatibilityReport, Fingerprint, fingerprint
+from .progress import ProgressEvent
+from .metrics import JobMetrics, MergeResult
+from .encoders import EncoderRegistry
+from .batch import BatchScheduler
+from .planner import MergePlan, MergePlanner
 from .subtitle_generator import SubtitleGenerator
 # 移除了对不存在的 DocxFormatter 的导入
 # 可以考虑导出 docx_formatter 模块中的特定函数，如 process_docx 和 batch_process
@@ -0,0 +1,167 @@
+import sys
+import time
+import asyncio
+import concurrent.futures
+from typing import List, Dict, Optional, Tuple, Hashable
+
+# 子进程结果：(退出码, 标准输出, 标准错误)
+CommandResult = Tuple[int, str, str]
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial: int = 8, minimum: int = 2, maximum: int = 64):
+        """根据观测到的延迟自适应调整并发数的信号量
+
+        采用加性增、乘性减（AIMD）策略：平滑后的延迟接近历史最优时，每完成一个
+        “窗口”（等于当前并发数）的任务就把并发数加一；延迟明显恶化或子进程
+        启动失败（如文件句柄耗尽）时按比例收缩。
+
+        Args:
+            initial (int): 初始并发数
+            minimum (int): 并发数下限
+            maximum (int): 并发数上限
+        """
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._ewma: Optional[float] = None
+        self._best: Optional[float] = None
+        self._completed_in_window = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        """等待直到有空闲的并发额度"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    async def release(self, latency: float, ok: bool = True):
+        """归还额度并根据本次延迟调整并发数
+
+        Args:
+            latency (float): 本次任务耗时（秒）
+            ok (bool): 子进程是否成功启动
+        """
+        async with self._cond:
+            self.in_flight -= 1
+            self._adjust(latency, ok)
+            self._cond.notify_all()
+
+    def _adjust(self, latency: float, ok: bool):
+        if not ok:
+            self.limit = max(self.minimum, self.limit / 2)
+            self._completed_in_window = 0
+            return
+
+        self._ewma = latency if self._ewma is None else 0.8 * self._ewma + 0.2 * latency
+        self._best = self._ewma if self._best is None else min(self._best, self._ewma)
+
+        self._completed_in_window += 1
+        if self._completed_in_window < int(self.limit):
+            return
+        self._completed_in_window = 0
+
+        if self._ewma > self._best * 2:
+            # 延迟翻倍说明磁盘或进程创建已经饱和
+            self.limit = max(self.minimum, self.limit * 0.8)
+        elif self._ewma <= self._best * 1.25:
+            self.limit = min(self.maximum, self.limit + 1)
+
+
+class AsyncProbeEngine:
+    def __init__(self, initial_concurrency: int = 8, min_concurrency: int = 2,
+                 max_concurrency: int = 64, timeout: Optional[float] = 120):
+        """基于asyncio子进程的探测引擎
+
+        所有探测命令在同一个事件循环中运行，不为每个子进程占用一个线程；
+        同时运行的子进程数量由 ``AdaptiveLimiter`` 根据延迟动态调整，
+        在网络存储上可以远超CPU核心数。
+
+        Args:
+            initial_concurrency (int): 初始并发子进程数
+            min_concurrency (int): 并发子进程数下限
+            max_concurrency (int): 并发子进程数上限
+            timeout (float, optional): 单个子进程超时时间（秒），None表示不限制
+        """
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.last_peak_concurrency = 0
+        self.last_final_concurrency = 0
+
+    async def _run_one(self, limiter: AdaptiveLimiter, cmd: List[str]) -> CommandResult:
+        await limiter.acquire()
+        start = time.monotonic()
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        except OSError as e:
+            await limiter.release(time.monotonic() - start, ok=False)
+            return -1, '', str(e)
+
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), self.timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            await limiter.release(time.monotonic() - start)
+            return -1, '', f"超时（{self.timeout}秒）"
+
+        await limiter.release(time.monotonic() - start)
+        return (proc.returncode,
+                stdout.decode('utf-8', errors='replace'),
+                stderr.decode('utf-8', errors='replace'))
+
+    async def run_async(self, commands: Dict[Hashable, List[str]]) -> Dict[Hashable, CommandResult]:
+        """在当前事件循环中并发执行所有命令
+
+        Args:
+            commands (Dict[Hashable, List[str]]): 键 -> 命令参数列表
+
+        Returns:
+            Dict[Hashable, CommandResult]: 键 -> (退出码, 标准输出, 标准错误)
+        """
+        limiter = AdaptiveLimiter(self.initial_concurrency, self.min_concurrency,
+                                  self.max_concurrency)
+        keys = list(commands)
+        results = await asyncio.gather(*(self._run_one(limiter, commands[key]) for key in keys))
+        self.last_peak_concurrency = limiter.peak_in_flight
+        self.last_final_concurrency = int(limiter.limit)
+        return dict(zip(keys, results))
+
+    def run(self, commands: Dict[Hashable, List[str]]) -> Dict[Hashable, CommandResult]:
+        """同步包装：在独立线程的私有事件循环中执行所有命令
+
+        私有循环只设置在工作线程上，调用方线程原有的事件循环（无论是否正在运行）
+        都不受影响，也不会因为嵌套而冲突。
+
+        Args:
+            commands (Dict[Hashable, List[str]]): 键 -> 命令参数列表
+
+        Returns:
+            Dict[Hashable, CommandResult]: 键 -> (退出码, 标准输出, 标准错误)
+        """
+        self.last_peak_concurrency = 0
+        self.last_final_concurrency = 0
+        if not commands:
+            return {}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(self._run_in_new_loop, commands).result()
+
+    def _run_in_new_loop(self,
+                         commands: Dict[Hashable, List[str]]) -> Dict[Hashable, CommandResult]:
+        if sys.platform == 'win32':
+            loop = asyncio.ProactorEventLoop()  # Windows上只有Proactor支持子进程
+        else:
+            loop = asyncio.new_event_loop()
+        try:
+            asyncio.set_event_loop(loop)
+            return loop.run_until_complete(self.run_async(commands))
+        finally:
+            asyncio.set_event_loop(None)  # 只清除工作线程自己的事件循环
+            loop.close()
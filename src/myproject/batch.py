@@ -0,0 +1,405 @@
+import os
+import glob
+import json
+import time
+import argparse
+import threading
+import concurrent.futures
+from typing import List, Dict, Optional, Iterable
+from myproject.video_merger import VideoMerger
+from myproject.media_probe import MediaInfo
+from myproject.compatibility import build_report
+from myproject.remux import plan_remux, remuxed_info, target_timescale
+from myproject.metrics import MergeResult
+from myproject.probe_cache import ProbeCache
+from myproject.planner import HostCalibration, MergePlan
+from myproject.progress import ConsoleProgressPrinter
+from myproject.layout import OUTPUT_LAYOUTS
+from myproject.trim import TRIM_DETECT_MODES, TrimSpec
+
+# 拷贝任务中偶尔需要的重编码（拼接点修复、帧精确裁剪的GOP）每个进程使用的线程数
+COPY_JOB_THREADS = 1
+
+
+def encode_share(video_files: List[str], media_info: Dict[str, Optional[MediaInfo]],
+                 normalize_mode: str = 'selective') -> float:
+    """估计合并时需要重编码视频的时长占总时长的比例
+
+    与合并流程一致：容器混用时先按转封装后的结果判断兼容性；选择性规范化只重编码视频与
+    多数类不同的片段，只有音频不同或没有音轨的片段视频直接拷贝，不计入。
+
+    Args:
+        video_files (List[str]): 视频文件列表
+        media_info (Dict[str, Optional[MediaInfo]]): 探测结果，顺序与video_files一致
+        normalize_mode (str): merge_videos 的 normalize_mode 参数
+
+    Returns:
+        float: 0到1之间的比例，有无法探测的片段时为1
+    """
+    infos = dict(zip(video_files, media_info.values()))
+    remux_targets = set(plan_remux(infos))
+    if remux_targets:
+        timescale = target_timescale(infos)
+        infos = {name: remuxed_info(info, timescale) if name in remux_targets else info
+                 for name, info in infos.items()}
+    report = build_report(infos)
+    if report.compatible:
+        return 0.0
+    if report.unknown or report.majority is None:
+        return 1.0
+    if normalize_mode != 'selective' and not report.video_compatible:
+        return 1.0
+    copy_video = set(report.audio_only_outliers)
+    encoded = sum(infos[name].duration for name in report.outliers if name not in copy_video)
+    total = sum(info.duration for info in infos.values())
+    return encoded / total if total > 0 else 1.0
+
+
+class BatchJob:
+    def __init__(self, input_dir: str, output_dir: str, output_name: str, merger: VideoMerger,
+                 video_files: List[str], kind: str, input_bytes: int = 0, duration: float = 0.0):
+        """批量调度中的一个合并任务（一个输入文件夹）
+
+        Args:
+            input_dir (str): 输入文件夹
+            output_dir (str): 输出文件夹
+            output_name (str): 输出文件名（不包含扩展名）
+            merger (VideoMerger): 执行该任务的合并器，规划时的探测结果在合并时复用
+            video_files (List[str]): 要合并的视频文件
+            kind (str): 'copy' 直接拷贝拼接（I/O密集），'encode' 需要重编码（CPU密集）
+            input_bytes (int): 输入文件总大小
+            duration (float): 输入总时长（秒）
+        """
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.output_name = output_name
+        self.merger = merger
+        self.video_files = video_files
+        self.kind = kind
+        self.input_bytes = input_bytes
+        self.duration = duration
+
+    def __repr__(self) -> str:
+        return f"BatchJob({self.output_name!r}, kind={self.kind!r}, files={len(self.video_files)})"
+
+
+class BatchJobResult:
+    def __init__(self, job: BatchJob, result: Optional[MergeResult], wall_time: float,
+                 error: str = ''):
+        """单个任务的执行结果"""
+        self.job = job
+        self.result = result
+        self.wall_time = wall_time
+        self.error = error
+
+    @property
+    def success(self) -> bool:
+        return bool(self.result)
+
+
+class BatchReport:
+    def __init__(self, results: List[BatchJobResult], wall_time: float):
+        """批量合并的汇总结果
+
+        Args:
+            results (List[BatchJobResult]): 各任务结果，顺序与输入一致
+            wall_time (float): 整批墙钟时间（秒）
+        """
+        self.results = results
+        self.wall_time = wall_time
+
+    @property
+    def succeeded(self) -> List[BatchJobResult]:
+        return [r for r in self.results if r.success]
+
+    @property
+    def failed(self) -> List[BatchJobResult]:
+        return [r for r in self.results if not r.success]
+
+    @property
+    def input_bytes(self) -> int:
+        return sum(r.job.input_bytes for r in self.succeeded)
+
+    @property
+    def media_duration(self) -> float:
+        return sum(r.job.duration for r in self.succeeded)
+
+    @property
+    def throughput(self) -> float:
+        """聚合吞吐量（输入字节/秒）"""
+        return self.input_bytes / self.wall_time if self.wall_time > 0 else 0.0
+
+    @property
+    def realtime_factor(self) -> float:
+        """每秒墙钟时间处理的媒体时长（秒）"""
+        return self.media_duration / self.wall_time if self.wall_time > 0 else 0.0
+
+    def __bool__(self) -> bool:
+        return not self.failed
+
+    def print_summary(self):
+        """打印批量合并汇总"""
+        print(f"\n批量合并完成: 成功 {len(self.succeeded)}/{len(self.results)}，"
+              f"用时 {self.wall_time/60:.2f}分钟")
+        for kind in ('copy', 'encode'):
+            done = [r for r in self.succeeded if r.job.kind == kind]
+            if done:
+                print(f"  {kind}: {len(done)} 个任务，{sum(r.job.duration for r in done)/3600:.2f}小时")
+        print(f"  聚合吞吐量: {self.throughput/1024/1024:.1f} MB/s，{self.realtime_factor:.1f}倍实时速度")
+        for r in self.failed:
+            print(f"  失败: {r.job.input_dir}" + (f"（{r.error}）" if r.error else ""))
+
+
+class BatchScheduler:
+    def __init__(self, output_dir: Optional[str] = None, copy_jobs: int = 4,
+                 cpu_budget: Optional[int] = None, threads_per_job: Optional[int] = None,
+                 probe_cache=True, show_progress: bool = False,
+                 recursive: bool = False, include: Optional[List[str]] = None,
+                 exclude: Optional[List[str]] = None, output_layout: str = 'faststart',
+                 **merge_options):
+        """多文件夹批量合并调度器
+
+        每个输入文件夹是一个任务。规划阶段先探测（结果写入持久化缓存），按是否需要重编码视频
+        （见 encode_share，选择性规范化只重编码少数片段也算）把任务分为直接拷贝（I/O密集）和
+        重编码（CPU密集）两类，两类任务在各自的全局预算下并发运行：
+        拷贝任务最多同时运行 ``copy_jobs`` 个，其中偶尔需要的重编码每个进程只用
+        ``COPY_JOB_THREADS`` 个线程；重编码任务每个分配 ``threads_per_job`` 个FFmpeg线程，
+        同时运行的个数保证总线程数不超过 ``cpu_budget``。
+
+        Args:
+            output_dir (str, optional): 输出文件夹，默认输出到各输入文件夹中
+            copy_jobs (int): 同时运行的拷贝任务数
+            cpu_budget (int, optional): 重编码任务的总线程预算，默认为系统CPU核心数
+            threads_per_job (int, optional): 每个重编码任务的线程数，默认为min(8, cpu_budget)
+            probe_cache (bool|str|ProbeCache): 所有任务共享的持久化探测缓存，含义同VideoMerger
+            show_progress (bool): 是否打印各任务的FFmpeg进度（带任务名前缀）
+            recursive (bool): 是否扫描各输入文件夹的子目录
+            include (List[str], optional): 只合并匹配这些通配符的文件
+            exclude (List[str], optional): 排除匹配这些通配符的文件
+            output_layout (str): 最终输出的MP4布局（faststart、fragmented或plain），中间文件总是分片MP4
+            **merge_options: 传给 VideoMerger.merge_videos 的其他参数
+        """
+        self.output_dir = output_dir
+        self.copy_jobs = max(1, copy_jobs)
+        self.cpu_budget = max(1, cpu_budget or os.cpu_count() or 4)
+        self.threads_per_job = max(1, min(threads_per_job or 8, self.cpu_budget))
+        self.encode_jobs = max(1, self.cpu_budget // self.threads_per_job)
+        if probe_cache is True:
+            probe_cache = ProbeCache()
+        elif isinstance(probe_cache, str):
+            probe_cache = ProbeCache(probe_cache)
+        self.probe_cache = probe_cache or False
+        self.show_progress = show_progress
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.output_layout = output_layout
+        self.merge_options = merge_options
+        self._printer = ConsoleProgressPrinter(prefix_job=True)
+
+    @staticmethod
+    def expand_inputs(patterns: Iterable[str]) -> List[str]:
+        """把目录和通配符展开为去重后的目录列表，保持输入顺序"""
+        dirs: List[str] = []
+        seen = set()
+        for pattern in patterns:
+            has_magic = any(c in pattern for c in '*?[')
+            matches = sorted(glob.glob(pattern)) if has_magic else [pattern]
+            for path in matches:
+                key = os.path.abspath(path)
+                if os.path.isdir(path) and key not in seen:
+                    seen.add(key)
+                    dirs.append(path)
+        return dirs
+
+    def _create_merger(self, input_dir: str, output_dir: str) -> VideoMerger:
+        merger = VideoMerger(input_dir=input_dir, output_dir=output_dir,
+                             max_workers=self.threads_per_job, probe_cache=self.probe_cache,
+                             show_progress=False, cpu_threads=self.threads_per_job,
+                             recursive=self.recursive, include=self.include, exclude=self.exclude,
+                             output_layout=self.output_layout)
+        if self.show_progress:
+            merger.add_progress_callback(self._printer)
+        return merger
+
+    def plan(self, input_dirs: List[str]) -> List[BatchJob]:
+        """探测各文件夹并确定任务类型，没有视频文件的文件夹被跳过"""
+        jobs = []
+        for input_dir in input_dirs:
+            output_name = os.path.basename(os.path.normpath(os.path.abspath(input_dir)))
+            output_dir = input_dir
+            if self.output_dir:
+                output_dir = os.path.join(self.output_dir, output_name)
+            merger = self._create_merger(input_dir, output_dir)
+            video_files = merger.get_video_files(exclude_output=output_name)
+            if not video_files:
+                print(f"跳过 {input_dir}：没有视频文件")
+                continue
+
+            media_info = merger.get_media_info(video_files)
+            if self.merge_options.get('simple_mode'):
+                kind = 'copy'
+            elif self.merge_options.get('force_encode'):
+                kind = 'encode'
+            else:
+                normalize_mode = self.merge_options.get('normalize_mode', 'selective')
+                share = encode_share(video_files, media_info, normalize_mode)
+                kind = 'encode' if share > 0 else 'copy'
+            if kind == 'copy':
+                merger.cpu_threads = COPY_JOB_THREADS
+            jobs.append(BatchJob(
+                input_dir, output_dir, output_name, merger, video_files, kind,
+                input_bytes=sum(info.size for info in media_info.values() if info),
+                duration=sum(info.duration for info in media_info.values() if info),
+            ))
+        return jobs
+
+    def _run_job(self, job: BatchJob) -> BatchJobResult:
+        start = time.perf_counter()
+        try:
+            result = job.merger.merge_videos(job.output_name, video_files=job.video_files,
+                                             **self.merge_options)
+            return BatchJobResult(job, result, time.perf_counter() - start)
+        except Exception as e:
+            return BatchJobResult(job, None, time.perf_counter() - start, str(e))
+
+    def dry_run(self, input_dirs: List[str]) -> List[MergePlan]:
+        """只规划不合并：为每个文件夹生成并打印合并计划"""
+        plans = []
+        for job in self.plan(self.expand_inputs(input_dirs)):
+            plan = job.merger.plan(
+                job.output_name, job.video_files,
+                encode_preset=self.merge_options.get('encode_preset', 'faster'),
+                crf=self.merge_options.get('crf', 23),
+                use_hw_accel=self.merge_options.get('use_hw_accel', True),
+                force_encode=self.merge_options.get('force_encode', False),
+                validate_junctions=self.merge_options.get('validate_junctions', False),
+                encode_processes=self.merge_options.get('encode_processes', 1))
+            plan.print_summary()
+            plans.append(plan)
+        total = sum(plan.chosen.wall_time for plan in plans if plan.chosen)
+        print(f"\n共 {len(plans)} 个任务，串行估计耗时 {total/60:.2f}分钟")
+        return plans
+
+    def run(self, input_dirs: List[str]) -> BatchReport:
+        """规划并执行所有任务
+
+        Args:
+            input_dirs (List[str]): 输入文件夹列表（可包含通配符）
+
+        Returns:
+            BatchReport: 汇总结果
+        """
+        start = time.perf_counter()
+        jobs = self.plan(self.expand_inputs(input_dirs))
+        copy_count = sum(1 for job in jobs if job.kind == 'copy')
+        print(f"\n共 {len(jobs)} 个任务：拷贝 {copy_count} 个（并发 {self.copy_jobs}），"
+              f"重编码 {len(jobs) - copy_count} 个（并发 {self.encode_jobs}，每个 {self.threads_per_job} 线程）")
+
+        results: Dict[int, BatchJobResult] = {}
+        lock = threading.Lock()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.copy_jobs) as copy_pool, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=self.encode_jobs) as encode_pool:
+            futures = {}
+            for index, job in enumerate(jobs):
+                pool = copy_pool if job.kind == 'copy' else encode_pool
+                futures[pool.submit(self._run_job, job)] = index
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                with lock:
+                    results[futures[future]] = result
+                    done = len(results)
+                status = "完成" if result.success else "失败"
+                print(f"[{done}/{len(jobs)}] {result.job.output_name} {status}"
+                      f"（{result.wall_time/60:.2f}分钟）")
+
+        report = BatchReport([results[i] for i in range(len(jobs))], time.perf_counter() - start)
+        report.print_summary()
+        return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="批量合并多个文件夹中的视频")
+    parser.add_argument('inputs', nargs='+', help="输入文件夹，支持通配符（如 '/data/series/*'）")
+    parser.add_argument('-o', '--output-dir', help="输出文件夹，默认输出到各输入文件夹中")
+    parser.add_argument('--copy-jobs', type=int, default=4, help="同时运行的拷贝任务数（默认4）")
+    parser.add_argument('--cpu-budget', type=int, default=None, help="重编码任务的总线程预算（默认CPU核心数）")
+    parser.add_argument('--threads-per-job', type=int, default=None, help="每个重编码任务的FFmpeg线程数（默认8）")
+    parser.add_argument('--preset', default='faster', help="编码速度预设（默认faster）")
+    parser.add_argument('--crf', type=int, default=23, help="视频质量参数（默认23）")
+    parser.add_argument('--force-encode', action='store_true', help="强制重编码")
+    parser.add_argument('--no-split', action='store_true', help="不自动分割")
+    parser.add_argument('--incremental', action='store_true', help="只把新增片段追加到上次的合并结果之后")
+    parser.add_argument('--metrics-jsonl', help="把各任务指标追加写入该JSON Lines文件")
+    parser.add_argument('--progress', action='store_true', help="打印各任务的FFmpeg进度")
+    parser.add_argument('-r', '--recursive', action='store_true', help="同时合并各输入文件夹子目录中的视频")
+    parser.add_argument('--include', action='append', help="只合并匹配该通配符的文件（可多次指定）")
+    parser.add_argument('--exclude', action='append', help="排除匹配该通配符的文件（可多次指定）")
+    parser.add_argument('--tree-threshold', type=int, default=1000,
+                        help="片段数超过该值时分层合并（默认1000，0表示总是单次合并）")
+    parser.add_argument('--tree-batch-size', type=int, default=200, help="分层合并时每批的片段数（默认200）")
+    parser.add_argument('--output-layout', choices=OUTPUT_LAYOUTS, default='faststart',
+                        help="最终输出的MP4布局（默认faststart；plain和fragmented不需要重写整个文件）")
+    parser.add_argument('--no-timestamp-repair', action='store_true',
+                        help="不修复音视频时间戳不一致的片段")
+    parser.add_argument('--validate-junctions', action='store_true',
+                        help="拷贝拼接前预检每个拼接点，只重编码时间戳异常的片段")
+    parser.add_argument('--trim-head', type=float, default=0.0, help="每个片段去掉开头的秒数（片头）")
+    parser.add_argument('--trim-tail', type=float, default=0.0, help="每个片段去掉结尾的秒数（片尾）")
+    parser.add_argument('--detect-trim', choices=TRIM_DETECT_MODES,
+                        help="通过音频指纹识别重复出现的片头/片尾并裁剪（auto为两者都识别）")
+    parser.add_argument('--trim-accurate', action='store_true',
+                        help="帧精确裁剪，只重编码裁剪起点所在的不完整GOP（默认起点对齐关键帧）")
+    parser.add_argument('--dry-run', action='store_true', help="只估计各策略的耗时和输出大小并打印合并计划，不合并")
+    parser.add_argument('--plan-json', help="--dry-run时把合并计划写入该JSON文件")
+    parser.add_argument('--calibrate', action='store_true',
+                        help="试编码测量各预设的编码速度，并测量输出（或输入）文件夹所在磁盘的吞吐量，"
+                             "保存后供 --dry-run 使用；不与 --dry-run 同用时测量后即退出")
+    args = parser.parse_args(argv)
+    if args.detect_trim and (args.trim_head or args.trim_tail):
+        parser.error("--detect-trim 不能与 --trim-head/--trim-tail 同时使用")
+    trim = args.detect_trim
+    if args.trim_head or args.trim_tail:
+        trim = TrimSpec(args.trim_head, args.trim_tail)
+
+    scheduler = BatchScheduler(
+        output_dir=args.output_dir,
+        copy_jobs=args.copy_jobs,
+        cpu_budget=args.cpu_budget,
+        threads_per_job=args.threads_per_job,
+        show_progress=args.progress,
+        recursive=args.recursive,
+        include=args.include,
+        exclude=args.exclude,
+        output_layout=args.output_layout,
+        force_encode=args.force_encode,
+        auto_split=not args.no_split,
+        encode_preset=args.preset,
+        crf=args.crf,
+        incremental=args.incremental,
+        tree_threshold=args.tree_threshold or None,
+        tree_batch_size=args.tree_batch_size,
+        validate_junctions=args.validate_junctions,
+        repair_timestamps=not args.no_timestamp_repair,
+        trim=trim,
+        trim_accurate=args.trim_accurate,
+        metrics_jsonl=args.metrics_jsonl,
+    )
+    if args.calibrate:
+        directories = [args.output_dir] if args.output_dir else scheduler.expand_inputs(args.inputs)
+        HostCalibration().calibrate(directories)
+        if not args.dry_run:
+            return 0
+    if args.dry_run:
+        plans = scheduler.dry_run(args.inputs)
+        if args.plan_json:
+            with open(args.plan_json, 'w', encoding='utf-8') as f:
+                json.dump([plan.to_dict() for plan in plans], f, ensure_ascii=False, indent=2)
+        return 0
+
+    report = scheduler.run(args.inputs)
+    return 0 if report else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,172 @@
+import os
+from typing import List, Dict, Optional, NamedTuple, Tuple
+from myproject.media_probe import MediaInfo
+
+# 参与比较的流参数，任一不同都会导致concat直接拷贝的结果损坏或音画不同步
+VIDEO_FIELDS = ('codec_name', 'profile', 'width', 'height', 'pix_fmt',
+                'sample_aspect_ratio', 'frame_rate', 'time_base')
+AUDIO_FIELDS = ('codec_name', 'profile', 'sample_rate', 'channels', 'channel_layout')
+
+
+class Fingerprint(NamedTuple):
+    """一个文件的流兼容性指纹，没有对应流时为None"""
+    video: Optional[Tuple]
+    audio: Optional[Tuple]
+
+    def describe(self) -> str:
+        """生成便于阅读的描述"""
+        parts = []
+        if self.video:
+            v = dict(zip(VIDEO_FIELDS, self.video))
+            parts.append(f"视频 {v['codec_name']}({v['profile'] or '-'}) {v['width']}x{v['height']} "
+                         f"{v['pix_fmt']} SAR {v['sample_aspect_ratio']} {v['frame_rate']}fps "
+                         f"tb {v['time_base']}")
+        else:
+            parts.append("无视频流")
+        if self.audio:
+            a = dict(zip(AUDIO_FIELDS, self.audio))
+            parts.append(f"音频 {a['codec_name']}({a['profile'] or '-'}) {a['sample_rate']}Hz "
+                         f"{a['channels']}ch {a['channel_layout']}")
+        else:
+            parts.append("无音轨")
+        return ', '.join(parts)
+
+
+def fingerprint(info: MediaInfo) -> Fingerprint:
+    """根据完整的流参数计算兼容性指纹
+
+    Args:
+        info (MediaInfo): 媒体信息
+
+    Returns:
+        Fingerprint: 兼容性指纹
+    """
+    video, audio = info.video, info.audio
+    return Fingerprint(
+        video=tuple(getattr(video, f) for f in VIDEO_FIELDS) if video else None,
+        audio=tuple(getattr(audio, f) for f in AUDIO_FIELDS) if audio else None,
+    )
+
+
+def fingerprint_diff(a: Fingerprint, b: Fingerprint) -> List[str]:
+    """列出两个指纹之间不同的参数名称
+
+    Returns:
+        List[str]: 如 ['video.width', 'audio.sample_rate']，完全相同时为空列表
+    """
+    diffs = []
+    for kind, fields in (('video', VIDEO_FIELDS), ('audio', AUDIO_FIELDS)):
+        left, right = getattr(a, kind), getattr(b, kind)
+        if left is None or right is None:
+            if left != right:
+                diffs.append(kind)
+            continue
+        diffs.extend(f"{kind}.{name}" for name, x, y in zip(fields, left, right) if x != y)
+    return diffs
+
+
+class CompatibilityClass(NamedTuple):
+    """指纹完全相同、可以直接拷贝拼接的一组文件"""
+    fingerprint: Fingerprint
+    files: List[str]
+    duration: float
+
+
+class CompatibilityReport:
+    def __init__(self, classes: List[CompatibilityClass], unknown: List[str]):
+        """兼容性报告
+
+        Args:
+            classes (List[CompatibilityClass]): 兼容类，按总时长从大到小排列，第一个为多数类
+            unknown (List[str]): 无法探测的文件
+        """
+        self.classes = classes
+        self.unknown = unknown
+
+    @property
+    def compatible(self) -> bool:
+        """所有文件是否可以直接拷贝拼接"""
+        return len(self.classes) == 1 and not self.unknown
+
+    @property
+    def video_compatible(self) -> bool:
+        """所有文件的视频流参数是否相同（音频可能不同），此时只需转码音频即可直接拷贝拼接视频"""
+        return (bool(self.classes) and not self.unknown
+                and len({cls.fingerprint.video for cls in self.classes}) == 1)
+
+    @property
+    def majority(self) -> Optional[CompatibilityClass]:
+        """总时长最长的兼容类，作为统一的目标格式"""
+        return self.classes[0] if self.classes else None
+
+    @property
+    def outliers(self) -> List[str]:
+        """不属于多数类的文件（包括无法探测的文件）"""
+        return [f for cls in self.classes[1:] for f in cls.files] + list(self.unknown)
+
+    @property
+    def audio_only_outliers(self) -> List[str]:
+        """视频与多数类相同、只有音频不同的文件，规范化时视频可以直接拷贝"""
+        if not self.classes:
+            return []
+        target = self.classes[0].fingerprint.video
+        return [f for cls in self.classes[1:] if cls.fingerprint.video == target for f in cls.files]
+
+    @property
+    def silent_outliers(self) -> List[str]:
+        """没有音轨、视频与多数类相同的文件（多数类有音轨时），补上静音音轨后即可直接拷贝拼接"""
+        if not self.classes or self.classes[0].fingerprint.audio is None:
+            return []
+        target = self.classes[0].fingerprint.video
+        return [f for cls in self.classes[1:]
+                if cls.fingerprint.video == target and cls.fingerprint.audio is None
+                for f in cls.files]
+
+    def class_of(self, video: str) -> Optional[CompatibilityClass]:
+        """返回文件所属的兼容类"""
+        for cls in self.classes:
+            if video in cls.files:
+                return cls
+        return None
+
+    def print_summary(self):
+        """打印兼容类分组"""
+        print(f"\n共 {len(self.classes)} 个兼容类:")
+        for i, cls in enumerate(self.classes, 1):
+            marker = "（多数）" if i == 1 else ""
+            print(f"  类{i}{marker}: {len(cls.files)} 个文件, {cls.duration/60:.2f}分钟 - "
+                  f"{cls.fingerprint.describe()}")
+            if i > 1:
+                diffs = fingerprint_diff(self.classes[0].fingerprint, cls.fingerprint)
+                print(f"    与多数类的差异: {', '.join(diffs)}")
+                for video in cls.files:
+                    print(f"    - {os.path.basename(video)}")
+        if self.unknown:
+            print(f"  无法探测: {len(self.unknown)} 个文件")
+            for video in self.unknown:
+                print(f"    - {os.path.basename(video)}")
+
+
+def build_report(media_info: Dict[str, Optional[MediaInfo]]) -> CompatibilityReport:
+    """将文件按兼容性指纹分组
+
+    Args:
+        media_info (Dict[str, Optional[MediaInfo]]): 文件 -> 媒体信息，None表示探测失败
+
+    Returns:
+        CompatibilityReport: 兼容性报告
+    """
+    groups: Dict[Fingerprint, List[str]] = {}
+    durations: Dict[Fingerprint, float] = {}
+    unknown = []
+    for video, info in media_info.items():
+        if info is None or info.video is None:
+            unknown.append(video)
+            continue
+        fp = fingerprint(info)
+        groups.setdefault(fp, []).append(video)
+        durations[fp] = durations.get(fp, 0.0) + info.duration
+
+    classes = [CompatibilityClass(fp, files, durations[fp]) for fp, files in groups.items()]
+    classes.sort(key=lambda cls: (cls.duration, len(cls.files)), reverse=True)
+    return CompatibilityReport(classes, unknown)
@@ -0,0 +1,145 @@
+import os
+import re
+import time
+import fnmatch
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov')
+
+_DIGITS = re.compile(r'([0-9]+)')
+
+
+def natural_key(name: str) -> tuple:
+    """自然排序键：数字部分按整数比较，例如 video2.mp4 < video10.mp4
+
+    结果是字符串和整数交替的元组（总是以字符串开头），不同文件名的键可以直接比较。
+    """
+    parts = _DIGITS.split(name)
+    parts[1::2] = [int(text) for text in parts[1::2]]
+    parts[0::2] = [text.lower() for text in parts[0::2]]
+    return tuple(parts)
+
+
+def path_key(rel_path: str) -> tuple:
+    """相对路径的自然排序键：逐级比较目录名和文件名，同一子目录中的片段排在一起"""
+    return tuple(natural_key(part) for part in rel_path.split(os.sep))
+
+
+def _matches(rel_path: str, patterns: Sequence[str]) -> bool:
+    """相对路径或文件名匹配任一通配符时返回True"""
+    name = os.path.basename(rel_path)
+    return any(fnmatch.fnmatch(rel_path, p) or fnmatch.fnmatch(name, p) for p in patterns)
+
+
+class DiscoveryProgress:
+    def __init__(self, interval: float = 2.0, enabled: bool = True):
+        """目录扫描进度：只保存计数，按时间间隔打印一行摘要，内存占用与文件数量无关
+
+        Args:
+            interval (float): 打印进度的最小间隔（秒）
+            enabled (bool): 是否打印
+        """
+        self.interval = interval
+        self.enabled = enabled
+        self.directories = 0
+        self.entries = 0
+        self.matched = 0
+        self.excluded = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+        self.printed = False
+        self._last_print = self.started
+
+    def update(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if now - self._last_print >= self.interval:
+            self._last_print = now
+            self.printed = True
+            print(f"扫描中：{self.directories}个目录，{self.entries}个条目，匹配{self.matched}个视频文件")
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        text = (f"扫描完成：{self.directories}个目录，{self.entries}个条目，"
+                f"找到{self.matched}个视频文件，排除{self.excluded}个，用时{elapsed:.2f}秒")
+        if self.errors:
+            text += f"，{self.errors}个目录无法读取"
+        return text
+
+
+def scan_videos(root: str, extensions: Sequence[str] = VIDEO_EXTENSIONS, recursive: bool = False,
+                include: Optional[Sequence[str]] = None, exclude: Optional[Sequence[str]] = None,
+                exclude_pattern: Optional[re.Pattern] = None,
+                progress: Optional[DiscoveryProgress] = None) -> Iterator[Tuple[tuple, str]]:
+    """用 os.scandir 流式扫描视频文件，逐个产出 (排序键, 相对路径)
+
+    排序键在扫描时一次计算好，调用方排序时不再重复拆分文件名。
+    跳过隐藏文件和目录（如合并器的工作目录和分层合并的中间文件、macOS的 ._ 文件），
+    递归扫描不进入符号链接目录。
+
+    Args:
+        root (str): 扫描的根目录
+        extensions (Sequence[str]): 视频文件扩展名（小写）
+        recursive (bool): 是否扫描子目录
+        include (Sequence[str], optional): 包含通配符，匹配相对路径或文件名；为空时包含全部
+        exclude (Sequence[str], optional): 排除通配符，匹配相对路径或文件名
+        exclude_pattern (re.Pattern, optional): 按文件名排除的正则（如输出文件）
+        progress (DiscoveryProgress, optional): 进度计数
+    """
+    extensions = tuple(extensions)
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        if progress:
+            progress.directories += 1
+        try:
+            iterator = os.scandir(os.path.join(root, rel_dir) if rel_dir else root)
+        except OSError as e:
+            print(f"无法读取目录 {os.path.join(root, rel_dir)}: {str(e)}")
+            if progress:
+                progress.errors += 1
+            continue
+        with iterator as entries:
+            for entry in entries:
+                if progress:
+                    progress.entries += 1
+                    progress.update()
+                rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if recursive and entry.is_dir(follow_symlinks=False):
+                        stack.append(rel_path)
+                        continue
+                    if not entry.name.lower().endswith(extensions) or not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                if ((exclude_pattern and exclude_pattern.match(entry.name))
+                        or (include and not _matches(rel_path, include))
+                        or (exclude and _matches(rel_path, exclude))):
+                    if progress:
+                        progress.excluded += 1
+                    continue
+                if progress:
+                    progress.matched += 1
+                yield path_key(rel_path), rel_path
+
+
+def discover_videos(root: str, extensions: Sequence[str] = VIDEO_EXTENSIONS,
+                    recursive: bool = False, include: Optional[Sequence[str]] = None,
+                    exclude: Optional[Sequence[str]] = None,
+                    exclude_pattern: Optional[re.Pattern] = None,
+                    show_progress: bool = False) -> List[str]:
+    """扫描并按自然顺序返回视频文件的相对路径列表，参数含义见 scan_videos
+
+    show_progress 为True时，扫描超过进度间隔才打印进度和最终摘要，小目录不产生输出。
+    """
+    progress = DiscoveryProgress(enabled=show_progress)
+    keyed = list(scan_videos(root, extensions, recursive, include, exclude, exclude_pattern,
+                             progress))
+    keyed.sort()
+    if progress.printed:
+        print(progress.summary())
+    return [rel_path for _, rel_path in keyed]
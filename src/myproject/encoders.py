@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import shutil
+import platform
+import threading
+import subprocess
+from typing import List, Optional, NamedTuple
+from myproject.probe_cache import default_cache_dir
+
+# 候选编码器：(加速类型, 编码器, 编码名称, 固定参数)
+# 软件编码器的 -preset/-crf 在合并时按用户设置追加
+HW_CANDIDATES = {
+    'Darwin': [
+        ('videotoolbox', 'h264_videotoolbox', 'h264', ['-allow_sw', '1', '-b:v', '0']),
+        ('videotoolbox', 'hevc_videotoolbox', 'hevc', ['-allow_sw', '1', '-b:v', '0']),
+    ],
+    'Windows': [
+        ('nvenc', 'h264_nvenc', 'h264', ['-preset', 'p4', '-tune', 'hq']),
+        ('qsv', 'h264_qsv', 'h264', ['-preset', 'faster']),
+        ('amf', 'h264_amf', 'h264', ['-quality', 'speed']),
+        ('nvenc', 'hevc_nvenc', 'hevc', ['-preset', 'p4', '-tune', 'hq']),
+    ],
+    'Linux': [
+        ('nvenc', 'h264_nvenc', 'h264', ['-preset', 'p4', '-tune', 'hq']),
+        ('vaapi', 'h264_vaapi', 'h264',
+         ['-vaapi_device', '/dev/dri/renderD128', '-vf', 'format=nv12,hwupload']),
+        ('qsv', 'h264_qsv', 'h264', ['-preset', 'faster']),
+        ('nvenc', 'hevc_nvenc', 'hevc', ['-preset', 'p4', '-tune', 'hq']),
+    ],
+}
+SW_CANDIDATES = [
+    ('none', 'libx264', 'h264', []),
+    ('none', 'libx265', 'hevc', []),
+]
+
+
+class EncoderCapability(NamedTuple):
+    """一个编码器在本机上的试编码结果"""
+    hw_type: str
+    encoder: str
+    codec: str
+    options: List[str]
+    available: bool
+    fps: float
+    error: str = ''
+
+    @property
+    def hardware(self) -> bool:
+        return self.hw_type != 'none'
+
+    def encode_args(self, encode_preset: str = 'faster', crf: int = 23) -> List[str]:
+        """返回使用该编码器的FFmpeg视频编码参数"""
+        args = ['-c:v', self.encoder] + list(self.options)
+        if not self.hardware:
+            args.extend(['-preset', encode_preset, '-crf', str(crf)])
+        return args
+
+
+def parse_encoder_list(output: str) -> List[str]:
+    """从 ``ffmpeg -encoders`` 的输出中解析编码器名称
+
+    每行格式为 `` V....D libx264   libx264 H.264 ...``，只取第二列，
+    避免按子串匹配时把描述文字中的名称也当作可用编码器。
+    """
+    names = []
+    started = False
+    for line in output.splitlines():
+        if not started:
+            started = line.strip().startswith('------')
+            continue
+        parts = line.split()
+        if len(parts) >= 2 and len(parts[0]) == 6:
+            names.append(parts[1])
+    return names
+
+
+def ffmpeg_identity(ffmpeg: str = 'ffmpeg') -> Optional[List]:
+    """返回FFmpeg可执行文件的 [路径, 大小, 修改时间ns]，升级FFmpeg后能力表随之失效"""
+    path = shutil.which(ffmpeg)
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [os.path.realpath(path), st.st_size, st.st_mtime_ns]
+
+
+class EncoderRegistry:
+    VERSION = 2
+
+    def __init__(self, path: Optional[str] = None, ffmpeg: str = 'ffmpeg',
+                 trial_duration: float = 1.0, trial_size: str = '1280x720', trial_rate: int = 30):
+        """按主机持久化的编码器能力表
+
+        首次使用时对每个候选编码器（包括libx264/libx265软件编码）用lavfi测试源做一次
+        短时间的试编码，记录是否可用和实测编码帧率（扣除只编码1帧的基线耗时，即进程启动和
+        硬件设备初始化的耗时），结果保存为JSON；之后的合并只读取
+        该文件，不再启动任何检测进程。主机名或FFmpeg可执行文件变化时自动重新检测。
+
+        Args:
+            path (str, optional): 能力表路径，默认为缓存目录下的 encoders.json
+            ffmpeg (str): FFmpeg可执行文件
+            trial_duration (float): 试编码时长（秒）
+            trial_size (str): 试编码分辨率
+            trial_rate (int): 试编码帧率
+        """
+        self.path = path or os.path.join(default_cache_dir(), 'encoders.json')
+        self.ffmpeg = ffmpeg
+        self.trial_duration = trial_duration
+        self.trial_size = trial_size
+        self.trial_rate = trial_rate
+        self.trial_runs = 0
+        self._capabilities: Optional[List[EncoderCapability]] = None
+        self._lock = threading.Lock()
+
+    def host_key(self) -> dict:
+        """能力表适用的主机和FFmpeg标识"""
+        return {
+            'version': self.VERSION,
+            'host': platform.node(),
+            'system': platform.system(),
+            'ffmpeg': ffmpeg_identity(self.ffmpeg),
+            'trial': [self.trial_duration, self.trial_size, self.trial_rate],
+        }
+
+    def _load(self) -> Optional[List[EncoderCapability]]:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get('key') != self.host_key():
+            return None
+        try:
+            return [EncoderCapability(**item) for item in data['encoders']]
+        except (KeyError, TypeError):
+            return None
+
+    def _save(self, capabilities: List[EncoderCapability]):
+        data = {
+            'key': self.host_key(),
+            'detected': time.time(),
+            'encoders': [c._asdict() for c in capabilities],
+        }
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"保存编码器能力表失败: {str(e)}")
+
+    def _list_encoders(self) -> List[str]:
+        try:
+            result = subprocess.run([self.ffmpeg, '-hide_banner', '-encoders'],
+                                    capture_output=True, text=True, timeout=30)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"获取编码器列表失败: {str(e)}")
+            return []
+        return parse_encoder_list(result.stdout)
+
+    def trial_command(self, encoder: str, options: List[str], preset: str = 'faster',
+                      frames: Optional[int] = None) -> List[str]:
+        """构建试编码命令：lavfi测试源编码后丢弃输出；给出 frames 时只编码这么多帧"""
+        args = ['-c:v', encoder] + list(options)
+        if encoder.startswith('lib'):
+            args.extend(['-preset', preset, '-crf', '23'])
+        length = ['-frames:v', str(frames)] if frames else ['-t', str(self.trial_duration)]
+        return [
+            self.ffmpeg, '-hide_banner', '-nostdin', '-v', 'error',
+            '-f', 'lavfi', '-i', f"testsrc=size={self.trial_size}:rate={self.trial_rate}",
+        ] + length + [
+            '-pix_fmt', 'yuv420p',
+        ] + args + ['-an', '-f', 'null', '-']
+
+    @property
+    def trial_pixels(self) -> int:
+        """试编码每帧的像素数，用于按分辨率换算实测帧率"""
+        width, _, height = self.trial_size.partition('x')
+        return int(width) * int(height)
+
+    def _timed_run(self, cmd: List[str]):
+        """运行试编码命令，返回 (退出码, 错误信息, 耗时)"""
+        start = time.perf_counter()
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+            returncode, error = result.returncode, result.stderr.strip()
+        except (OSError, subprocess.TimeoutExpired) as e:
+            returncode, error = -1, str(e)
+        return returncode, error, time.perf_counter() - start
+
+    def trial(self, hw_type: str, encoder: str, codec: str, options: List[str],
+              preset: str = 'faster') -> EncoderCapability:
+        """对单个编码器试编码，返回是否可用和实测帧率
+
+        先只编码1帧作为基线，再编码 trial_duration 秒；帧率按两次的耗时差计算，
+        进程启动和硬件编码器的设备初始化（可达几百毫秒）不计入编码速度。
+        """
+        self.trial_runs += 1
+        returncode, error, baseline = self._timed_run(
+            self.trial_command(encoder, options, preset, frames=1))
+        if returncode == 0:
+            returncode, error, elapsed = self._timed_run(
+                self.trial_command(encoder, options, preset))
+
+        if returncode != 0:
+            return EncoderCapability(hw_type, encoder, codec, options, False, 0.0,
+                                     error.splitlines()[-1] if error else f"退出码 {returncode}")
+        frames = self.trial_duration * self.trial_rate
+        if elapsed > baseline and frames > 1:
+            fps = (frames - 1) / (elapsed - baseline)
+        else:
+            # 计时误差导致差值不为正时退回按总耗时计算
+            fps = frames / elapsed if elapsed > 0 else 0.0
+        return EncoderCapability(hw_type, encoder, codec, options, True, round(fps, 1))
+
+    def detect(self) -> List[EncoderCapability]:
+        """重新检测所有候选编码器并保存能力表"""
+        print("检测可用的视频编码器...")
+        listed = set(self._list_encoders())
+        candidates = HW_CANDIDATES.get(platform.system(), []) + SW_CANDIDATES
+        capabilities = []
+        for hw_type, encoder, codec, options in candidates:
+            if encoder not in listed:
+                capabilities.append(EncoderCapability(hw_type, encoder, codec, options, False, 0.0,
+                                                      'FFmpeg未编译该编码器'))
+                continue
+            capability = self.trial(hw_type, encoder, codec, options)
+            if capability.available:
+                status = f"{capability.fps:.0f} fps"
+            else:
+                status = f"不可用（{capability.error}）"
+            print(f"  {encoder}: {status}")
+            capabilities.append(capability)
+        self._save(capabilities)
+        return capabilities
+
+    def capabilities(self, refresh: bool = False) -> List[EncoderCapability]:
+        """返回能力表：优先使用内存和磁盘中的结果，不存在或已失效时才检测"""
+        with self._lock:
+            if self._capabilities is None or refresh:
+                capabilities = None if refresh else self._load()
+                self._capabilities = capabilities if capabilities is not None else self.detect()
+            return self._capabilities
+
+    def best(self, codec: str = 'h264', allow_hardware: bool = True) -> Optional[EncoderCapability]:
+        """返回指定编码中实测最快的可用编码器
+
+        Args:
+            codec (str): 目标编码名称
+            allow_hardware (bool): 是否允许选择硬件编码器
+
+        Returns:
+            Optional[EncoderCapability]: 最快的可用编码器，没有可用编码器时返回None
+        """
+        usable = [c for c in self.capabilities()
+                  if c.available and c.codec == codec and (allow_hardware or not c.hardware)]
+        return max(usable, key=lambda c: c.fps, default=None)
+
+
+_default_registry: Optional[EncoderRegistry] = None
+_default_lock = threading.Lock()
+
+
+def default_registry() -> EncoderRegistry:
+    """返回进程内共享的默认能力表"""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = EncoderRegistry()
+        return _default_registry
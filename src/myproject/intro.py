@@ -0,0 +1,239 @@
+import sys
+import subprocess
+import statistics
+import concurrent.futures
+from array import array
+from collections import Counter, defaultdict
+from typing import List, Dict, Optional, NamedTuple, Sequence, Tuple
+from myproject.trim import TrimSpec
+
+# 能量包络每帧的时长（秒）
+FRAME = 0.1
+# 每个哈希覆盖的帧数：相邻帧能量升降组成的位串，12帧约1.2秒
+HASH_FRAMES = 12
+# 在参考片段中出现次数超过该值的哈希（如持续的单调音）没有区分度，不参与匹配
+MAX_HASH_REPEATS = 8
+
+
+class AudioPrint(NamedTuple):
+    """一段音频的指纹"""
+    offset: float                  # 这段音频在片段中的开始时间（秒）
+    hashes: List[Optional[int]]    # 从每一帧开始的哈希，静音处为None
+
+
+class Match(NamedTuple):
+    """两段音频中重复出现的同一段内容（帧序号）"""
+    start: int   # 在参考音频中的开始帧
+    end: int     # 在参考音频中的结束帧
+    lag: int     # 在另一段音频中的位置 = 参考音频中的位置 + lag
+    votes: int   # 支持该位置的哈希数
+
+
+def build_decode_command(path: str, start: float, duration: float, rate: int = 4000) -> List[str]:
+    """构建把一段音频解码为单声道16位PCM并写到标准输出的FFmpeg命令"""
+    return [
+        'ffmpeg', '-v', 'error', '-nostdin',
+        '-ss', f"{start:.3f}", '-t', f"{duration:.3f}",
+        '-i', path,
+        '-vn', '-ac', '1', '-ar', str(rate),
+        '-f', 's16le', '-',
+    ]
+
+
+def frame_energies(pcm: bytes, samples_per_frame: int) -> List[float]:
+    """计算每帧的平均能量"""
+    samples = array('h')
+    samples.frombytes(pcm[:len(pcm) // 2 * 2])
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    n = samples_per_frame
+    return [sum(x * x for x in samples[i:i + n]) / n for i in range(0, len(samples) - n + 1, n)]
+
+
+def audio_print(energies: Sequence[float], offset: float = 0.0) -> AudioPrint:
+    """根据能量包络计算指纹
+
+    每一位表示下一帧的能量是否高于当前帧，与音量、编码参数无关；连续 HASH_FRAMES 位组成一个哈希。
+    几乎静音的位置能量升降只是噪声，不生成哈希。
+    """
+    bits = [1 if b > a else 0 for a, b in zip(energies, energies[1:])]
+    floor = (sum(energies) / len(energies) * 1e-3 if energies else 0.0) + 1.0
+    hashes: List[Optional[int]] = []
+    for i in range(len(bits) - HASH_FRAMES + 1):
+        if max(energies[i:i + HASH_FRAMES + 1]) < floor:
+            hashes.append(None)
+            continue
+        value = 0
+        for bit in bits[i:i + HASH_FRAMES]:
+            value = (value << 1) | bit
+        hashes.append(value)
+    return AudioPrint(offset, hashes)
+
+
+def align(reference: AudioPrint, other: AudioPrint, min_votes: int = 10,
+          max_gap: int = 50) -> Optional[Match]:
+    """找出两段音频中重复出现的最长内容
+
+    相同内容的哈希在两段音频中的位置差（lag）相同，按位置差投票找出最集中的偏移，
+    再取该偏移下匹配位置中最长的连续区间（相邻匹配间隔不超过 max_gap 帧）。
+
+    Returns:
+        Optional[Match]: 匹配的区间，没有足够多的哈希支持时返回None
+    """
+    index = defaultdict(list)
+    for i, value in enumerate(reference.hashes):
+        if value is not None:
+            index[value].append(i)
+    votes = Counter()
+    positions = defaultdict(list)
+    for j, value in enumerate(other.hashes):
+        matches = index.get(value) if value is not None else None
+        if not matches or len(matches) > MAX_HASH_REPEATS:
+            continue
+        for i in matches:
+            votes[j - i] += 1
+            positions[j - i].append(i)
+    if not votes:
+        return None
+
+    # 两段音频的帧边界不一定对齐，相邻偏移的投票合并计算
+    lag = max(votes, key=lambda k: (votes[k - 1] + votes[k] + votes[k + 1], votes[k]))
+    matched = sorted(positions[lag - 1] + positions[lag] + positions[lag + 1])
+    best = None
+    run_start = prev = matched[0]
+    count = 0
+    for i in matched + [None]:
+        if i is None or i - prev > max_gap:
+            if best is None or prev - run_start > best[1] - best[0]:
+                best = (run_start, prev, count)
+            if i is None:
+                break
+            run_start, count = i, 0
+        prev = i
+        count += 1
+    start, end, count = best
+    if count < min_votes:
+        return None
+    return Match(start, end + HASH_FRAMES, lag, count)
+
+
+def find_recurring(prints: Sequence[Optional[AudioPrint]], min_length: float = 10.0,
+                   candidates: int = 3) -> List[Optional[Tuple[float, float]]]:
+    """在多个片段的同一区域（如开头几分钟）中找出重复出现的内容，如片头曲
+
+    依次尝试前几个片段作为参考，与其余片段逐一对齐，选择匹配片段最多的参考；参考片段自身的
+    区间取各次匹配的中位数。
+
+    Args:
+        prints (Sequence[Optional[AudioPrint]]): 各片段的指纹，无法解码时为None
+        min_length (float): 重复内容的最短时长（秒），更短的匹配（如转场音效）忽略
+        candidates (int): 最多尝试的参考片段数
+
+    Returns:
+        List[Optional[Tuple[float, float]]]: 各片段中重复内容的 (开始, 结束) 时间（秒），没有时为None
+    """
+    min_frames = int(min_length / FRAME)
+    best: List[Optional[Tuple[float, float]]] = [None] * len(prints)
+    best_count = 0
+    tried = 0
+    for r, reference in enumerate(prints):
+        if reference is None or tried >= candidates:
+            continue
+        tried += 1
+        spans: List[Optional[Tuple[float, float]]] = [None] * len(prints)
+        reference_spans = []
+        for k, other in enumerate(prints):
+            if k == r or other is None:
+                continue
+            match = align(reference, other)
+            if match is None or match.end - match.start < min_frames:
+                continue
+            reference_spans.append((match.start, match.end))
+            spans[k] = (other.offset + (match.start + match.lag) * FRAME,
+                        other.offset + (match.end + match.lag) * FRAME)
+        if len(reference_spans) > best_count:
+            start = statistics.median(s for s, _ in reference_spans)
+            end = statistics.median(e for _, e in reference_spans)
+            spans[r] = (reference.offset + start * FRAME, reference.offset + end * FRAME)
+            best, best_count = spans, len(reference_spans)
+        if best_count == len(prints) - 1:
+            break
+    return best
+
+
+class IntroDetector:
+    def __init__(self, search: float = 240.0, min_length: float = 10.0, max_jobs: int = 4,
+                 rate: int = 4000):
+        """通过音频指纹找出各片段中重复出现的片头和片尾
+
+        只解码每个片段开头和结尾 search 秒的音频（单声道、低采样率），计算能量包络的指纹后
+        在片段之间对齐，不需要额外的依赖。
+
+        Args:
+            search (float): 在片段开头/结尾搜索的时长（秒），不超过片段时长的一半
+            min_length (float): 片头/片尾的最短时长（秒）
+            max_jobs (int): 同时运行的FFmpeg进程数
+            rate (int): 解码的采样率
+        """
+        self.search = search
+        self.min_length = min_length
+        self.max_jobs = max(1, max_jobs)
+        self.rate = rate
+
+    def _print(self, path: str, start: float, duration: float) -> Optional[AudioPrint]:
+        cmd = build_decode_command(path, start, duration, self.rate)
+        try:
+            result = subprocess.run(cmd, capture_output=True)
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"无法解码音频: {path}, {str(e)}")
+            return None
+        if result.returncode != 0 or not result.stdout:
+            print(f"无法解码音频: {path}，错误码: {result.returncode}")
+            return None
+        return audio_print(frame_energies(result.stdout, int(self.rate * FRAME)), start)
+
+    def _regions(self, durations: Dict[str, float], outro: bool) -> List[Optional[AudioPrint]]:
+        jobs = []
+        for path, duration in durations.items():
+            length = min(self.search, duration / 2)
+            jobs.append((path, duration - length if outro else 0.0, length))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_jobs) as executor:
+            return list(executor.map(lambda args: self._print(*args), jobs))
+
+    def detect(self, durations: Dict[str, float], intro: bool = True,
+               outro: bool = True) -> Dict[str, TrimSpec]:
+        """识别各片段的片头/片尾并生成裁剪方式
+
+        片头从片段开始时去掉开头，否则（片头之前有冷开场）只去掉片头这一段；
+        片尾从开始处一直去掉到片段结束。
+
+        Args:
+            durations (Dict[str, float]): 片段路径 -> 时长，按拼接顺序排列
+            intro (bool): 是否识别片头
+            outro (bool): 是否识别片尾
+
+        Returns:
+            Dict[str, TrimSpec]: 片段路径 -> 裁剪方式，只包含需要裁剪的片段
+        """
+        paths = list(durations)
+        intros = outros = [None] * len(paths)
+        if intro:
+            intros = find_recurring(self._regions(durations, False), self.min_length)
+        if outro:
+            outros = find_recurring(self._regions(durations, True), self.min_length)
+        specs = {}
+        for path, intro_span, outro_span in zip(paths, intros, outros):
+            head, tail, cut = 0.0, 0.0, None
+            if intro_span is not None:
+                if intro_span[0] < 1.0:
+                    head = intro_span[1]
+                else:
+                    cut = intro_span
+            if outro_span is not None:
+                tail = max(0.0, durations[path] - outro_span[0])
+            if cut:
+                cut = tuple(round(t, 3) for t in cut)
+            spec = TrimSpec(round(head, 3), round(tail, 3), cut)
+            if not spec.empty:
+                specs[path] = spec
+        return specs
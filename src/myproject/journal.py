@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, Optional, Iterable
+from myproject.probe_cache import sampled_hash
+
+JOURNAL_VERSION = 1
+
+
+def journal_path(output_dir: str, output_name: str) -> str:
+    """返回任务日志路径（隐藏文件，不会被当作输入视频）"""
+    return os.path.join(output_dir, f".{output_name}.journal.json")
+
+
+def job_key(video_files: Iterable[str], input_dir: str, options: dict) -> str:
+    """根据输入片段（名称、大小、修改时间）和影响输出的参数计算任务标识
+
+    输入或参数变化后旧日志中的中间结果不再可用。
+    """
+    items = []
+    for video in video_files:
+        try:
+            st = os.stat(os.path.join(input_dir, video))
+            items.append([video, st.st_size, st.st_mtime_ns])
+        except OSError:
+            items.append([video, None, None])
+    payload = json.dumps({'files': items, 'options': options}, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def artifact_record(path: str) -> dict:
+    """记录产物的大小和抽样哈希"""
+    return {'size': os.path.getsize(path), 'hash': sampled_hash(path)}
+
+
+class JobJournal:
+    def __init__(self, path: str, key: str):
+        """记录合并任务已完成阶段的日志，用于崩溃后续跑
+
+        每个阶段完成时记录其产物的大小和抽样内容哈希并立即落盘；重新运行时只要
+        任务标识相同、产物仍然存在且大小和哈希一致，就认为该阶段已完成，直接复用产物。
+        校验只读取每个文件头、中、尾各64KB，几GB的中间文件也能很快完成。
+
+        Args:
+            path (str): 日志文件路径
+            key (str): 任务标识（见 job_key），与已有日志不同时丢弃已有日志
+        """
+        self.path = path
+        self.key = key
+        self.stages: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if (isinstance(data, dict) and data.get('version') == JOURNAL_VERSION
+                and data.get('key') == self.key):
+            self.stages = data.get('stages', {})
+        else:
+            print("任务参数或输入片段已变化，忽略上次的任务日志")
+
+    def _save(self):
+        data = {'version': JOURNAL_VERSION, 'key': self.key, 'updated': time.time(),
+                'stages': self.stages}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"写入任务日志失败: {str(e)}")
+
+    def complete(self, stage: str, artifacts: Iterable[str] = (), **data):
+        """标记阶段完成
+
+        Args:
+            stage (str): 阶段名称
+            artifacts (Iterable[str]): 该阶段产出的文件
+            **data: 续跑时需要的附加信息（需可JSON序列化）
+        """
+        records = {os.path.abspath(path): artifact_record(path) for path in artifacts}
+        with self._lock:
+            self.stages[stage] = {'completed': time.time(), 'artifacts': records, 'data': data}
+            self._save()
+
+    def resume(self, stage: str) -> Optional[dict]:
+        """阶段已完成且产物有效时返回其附加信息，否则返回None
+
+        产物缺失或被修改时删除该阶段记录。
+        """
+        with self._lock:
+            entry = self.stages.get(stage)
+        if entry is None:
+            return None
+        for path, expected in entry['artifacts'].items():
+            try:
+                if (os.path.getsize(path) != expected['size']
+                        or sampled_hash(path) != expected['hash']):
+                    raise ValueError(path)
+            except (OSError, ValueError):
+                print(f"阶段 {stage} 的产物 {os.path.basename(path)} 缺失或已改变，需要重新执行")
+                with self._lock:
+                    self.stages.pop(stage, None)
+                    self._save()
+                return None
+        return entry['data']
+
+    def finish(self):
+        """任务全部完成后删除日志"""
+        with self._lock:
+            self.stages = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
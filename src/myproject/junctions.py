@@ -0,0 +1,224 @@
+import os
+import json
+import subprocess
+import concurrent.futures
+from typing import List, Dict, Optional, NamedTuple, Sequence
+from myproject.media_probe import MediaInfo
+
+
+class Packet(NamedTuple):
+    """ffprobe读出的一个数据包的时间信息（秒）"""
+    codec_type: str
+    pts: float
+    dts: float
+    duration: float
+
+
+class JunctionCheck(NamedTuple):
+    """一个拼接点（片段i的结尾 + 片段i+1的开头）的检查结果"""
+    index: int                  # 拼接点序号，0表示第1、2个片段之间
+    left: str
+    right: str
+    video_gap: float = 0.0      # 拼接点处视频时间戳的间隙（负数为重叠），秒
+    audio_gap: float = 0.0      # 拼接点处音频时间戳的间隙
+    drift: float = 0.0          # 拼接后音频相对视频的偏移变化（audio_gap - video_gap）
+    discontinuity: float = 0.0  # 样本中相邻数据包时间戳的最大跳变
+    offenders: tuple = ()       # 需要规范化的片段
+    reason: str = ''
+
+    @property
+    def ok(self) -> bool:
+        return not self.reason
+
+
+def junction_list(left: str, left_duration: float, right: str, window: float) -> str:
+    """生成只包含左片段结尾 window 秒和右片段开头 window 秒的concat列表内容"""
+    def quote(path):
+        return os.path.abspath(path).replace("'", "'\\''")
+
+    inpoint = max(0.0, left_duration - window)
+    return (f"ffconcat version 1.0\n"
+            f"file '{quote(left)}'\ninpoint {inpoint:.6f}\n"
+            f"file '{quote(right)}'\noutpoint {window:.6f}\n")
+
+
+def build_probe_command(list_file: str) -> List[str]:
+    """构建经由concat解复用器读出样本数据包时间戳的ffprobe命令（不写出文件）"""
+    return [
+        'ffprobe', '-v', 'error',
+        '-f', 'concat', '-safe', '0', '-i', list_file,
+        '-show_entries', 'packet=codec_type,pts_time,dts_time,duration_time',
+        '-of', 'json',
+    ]
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_packets(output: str) -> List[Packet]:
+    """解析ffprobe的JSON输出，跳过没有时间戳的数据包"""
+    packets = []
+    for entry in json.loads(output or '{}').get('packets', []):
+        pts = _float(entry.get('pts_time'))
+        dts = _float(entry.get('dts_time'))
+        if pts is None and dts is None:
+            continue
+        packets.append(Packet(entry.get('codec_type', ''), pts if pts is not None else dts,
+                              dts if dts is not None else pts,
+                              _float(entry.get('duration_time')) or 0.0))
+    return packets
+
+
+def _edge_gap(packets: Sequence[Packet], junction_time: float):
+    """返回拼接点两侧的 (左侧结束时间, 右侧开始时间)，任一侧没有数据包时返回None"""
+    before = [p for p in packets if p.pts < junction_time]
+    after = [p for p in packets if p.pts >= junction_time]
+    if not before or not after:
+        return None
+    return max(p.pts + p.duration for p in before), min(p.pts for p in after)
+
+
+def _max_jump(packets: Sequence[Packet]) -> float:
+    """按解码时间排序后相邻数据包之间的最大跳变：间隙，或与前一个数据包重叠（时间戳回退）"""
+    ordered = sorted(packets, key=lambda p: p.dts)
+    jump = 0.0
+    for prev, cur in zip(ordered, ordered[1:]):
+        jump = max(jump, abs(cur.dts - prev.dts - prev.duration))
+    return jump
+
+
+def analyze_junction(index: int, left: str, right: str, packets: Sequence[Packet],
+                     junction_time: float, tolerance: float = 0.1,
+                     max_drift: float = 0.1) -> JunctionCheck:
+    """根据拼接样本的数据包时间戳判断拼接点是否正常
+
+    - 时间戳跳变：任一路流相邻数据包之间的间隙或回退超过 tolerance（会表现为卡顿、跳帧）
+    - 音画偏移：拼接点处音频和视频的间隙不同，之后的音频整体相对视频偏移 drift 秒
+
+    左片段的音视频结束时间不一致时归咎于左片段，右片段的音视频开始时间不一致时归咎于右片段；
+    都一致但时间戳跳变时两个片段都需要规范化。
+
+    Args:
+        index (int): 拼接点序号
+        left (str): 左片段路径
+        right (str): 右片段路径
+        packets (Sequence[Packet]): 样本中的数据包（按读出顺序）
+        junction_time (float): 样本中右片段开始的时间
+        tolerance (float): 允许的时间戳跳变（秒）
+        max_drift (float): 允许的音画偏移（秒）
+    """
+    video = [p for p in packets if p.codec_type == 'video']
+    audio = [p for p in packets if p.codec_type == 'audio']
+    video_edges = _edge_gap(video, junction_time)
+    if video_edges is None:
+        return JunctionCheck(index, left, right, offenders=(left, right), reason="样本中缺少拼接点一侧的视频数据包")
+    video_end, video_start = video_edges
+    video_gap = video_start - video_end
+    discontinuity = _max_jump(video)
+
+    audio_gap = drift = 0.0
+    left_skew = right_skew = 0.0
+    audio_edges = _edge_gap(audio, junction_time) if audio else None
+    if audio_edges is not None:
+        audio_end, audio_start = audio_edges
+        audio_gap = audio_start - audio_end
+        drift = audio_gap - video_gap
+        left_skew = video_end - audio_end
+        right_skew = video_start - audio_start
+        discontinuity = max(discontinuity, _max_jump(audio))
+
+    reasons = []
+    if discontinuity > tolerance:
+        reasons.append(f"时间戳跳变 {discontinuity:.3f}秒")
+    if abs(drift) > max_drift:
+        reasons.append(f"音画偏移 {drift:+.3f}秒")
+    offenders = ()
+    if reasons:
+        offenders = tuple(path for path, skew in ((left, left_skew), (right, right_skew))
+                          if abs(skew) > max_drift) or (left, right)
+    return JunctionCheck(index, left, right, round(video_gap, 6), round(audio_gap, 6),
+                         round(drift, 6), round(discontinuity, 6), offenders, '，'.join(reasons))
+
+
+class JunctionValidator:
+    def __init__(self, work_dir: str, window: float = 2.0, max_jobs: int = 4,
+                 tolerance: float = 0.1, max_drift: float = 0.1):
+        """拼接点预检：只读取每个拼接点前后几秒，检查拷贝拼接后的时间戳
+
+        样本经由concat解复用器（inpoint/outpoint）读出，与正式的拷贝拼接使用同一套时间戳处理，
+        但不写出文件；各拼接点由独立的ffprobe进程并行检查，耗时与片段总时长无关。
+
+        Args:
+            work_dir (str): 存放样本列表文件的工作目录
+            window (float): 拼接点两侧各读取的时长（秒）
+            max_jobs (int): 同时运行的ffprobe进程数
+            tolerance (float): 允许的时间戳跳变（秒）
+            max_drift (float): 允许的音画偏移（秒）
+        """
+        self.work_dir = work_dir
+        self.window = window
+        self.max_jobs = max(1, max_jobs)
+        self.tolerance = tolerance
+        self.max_drift = max_drift
+
+    def _check_one(self, index: int, left: str, left_info: MediaInfo, right: str) -> JunctionCheck:
+        list_file = os.path.join(self.work_dir, f"junction{index:05d}.txt")
+        with open(list_file, 'w', encoding='utf-8') as f:
+            f.write(junction_list(left, left_info.duration, right, self.window))
+        try:
+            result = subprocess.run(build_probe_command(list_file), capture_output=True, text=True)
+        except (OSError, subprocess.SubprocessError) as e:
+            return JunctionCheck(index, left, right, offenders=(left, right),
+                                 reason=f"无法读取样本: {str(e)}")
+        finally:
+            os.remove(list_file)
+        if result.returncode != 0:
+            return JunctionCheck(index, left, right, offenders=(left, right),
+                                 reason=f"无法读取样本: {result.stderr.strip()}")
+        try:
+            packets = parse_packets(result.stdout)
+        except json.JSONDecodeError:
+            return JunctionCheck(index, left, right, offenders=(left, right),
+                                 reason="无法解析ffprobe输出")
+        junction_time = min(self.window, left_info.duration)
+        return analyze_junction(index, left, right, packets, junction_time, self.tolerance,
+                                self.max_drift)
+
+    def validate(self, clips: Sequence[str],
+                 media_info: Dict[str, Optional[MediaInfo]]) -> List[JunctionCheck]:
+        """并行检查相邻片段之间的所有拼接点
+
+        Args:
+            clips (Sequence[str]): 按拼接顺序排列的片段路径
+            media_info (Dict[str, Optional[MediaInfo]]): 片段路径 -> 探测结果（需要左片段的时长）
+
+        Returns:
+            List[JunctionCheck]: 按拼接点顺序排列的检查结果
+        """
+        os.makedirs(self.work_dir, exist_ok=True)
+        jobs = []
+        results: List[Optional[JunctionCheck]] = [None] * max(0, len(clips) - 1)
+        for i, (left, right) in enumerate(zip(clips, clips[1:])):
+            info = media_info.get(left)
+            if info is None:
+                results[i] = JunctionCheck(i, left, right, offenders=(left,), reason="左片段无法探测")
+            else:
+                jobs.append((i, left, info, right))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_jobs) as executor:
+            for check in executor.map(lambda args: self._check_one(*args), jobs):
+                results[check.index] = check
+        return results
+
+
+def offending_clips(checks: Sequence[JunctionCheck]) -> List[str]:
+    """异常拼接点涉及的片段（去重，保持顺序）"""
+    offenders = []
+    for check in checks:
+        for path in check.offenders:
+            if path not in offenders:
+                offenders.append(path)
+    return offenders
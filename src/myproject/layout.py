@@ -0,0 +1,32 @@
+from typing import List, Optional
+
+# MP4输出布局：
+#   faststart  - moov放在文件开头，便于网络播放；写完后FFmpeg要把整个文件再重写一遍
+#   fragmented - 分片MP4（frag_keyframe+empty_moov），边写边输出，不需要重写；
+#                适合只由本工具再次读取的中间文件
+#   plain      - moov放在文件末尾，不重写，本地播放没有问题
+OUTPUT_LAYOUTS = ('fragmented', 'faststart', 'plain')
+
+_MOVFLAGS = {
+    'faststart': '+faststart',
+    'fragmented': '+frag_keyframe+empty_moov',
+    'plain': None,
+}
+
+
+def movflags(layout: str) -> Optional[str]:
+    """返回布局对应的 -movflags 值，plain 返回None"""
+    if layout not in _MOVFLAGS:
+        raise ValueError(f"未知的输出布局: {layout}，可选值: {', '.join(OUTPUT_LAYOUTS)}")
+    return _MOVFLAGS[layout]
+
+
+def layout_args(layout: str) -> List[str]:
+    """返回布局对应的FFmpeg输出参数"""
+    flags = movflags(layout)
+    return ['-movflags', flags] if flags else []
+
+
+def rewrite_factor(layout: str) -> int:
+    """输出文件实际被写入的次数（faststart 需要重写一遍来移动moov）"""
+    return 2 if layout == 'faststart' else 1
@@ -0,0 +1,118 @@
+import os
+import json
+import time
+from typing import List, Optional, NamedTuple
+from myproject.compatibility import Fingerprint
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path(output_dir: str, output_name: str) -> str:
+    """返回输出文件旁边的清单路径"""
+    return os.path.join(output_dir, f"{output_name}.manifest.json")
+
+
+def _encode_fingerprint(fp: Optional[Fingerprint]) -> Optional[dict]:
+    if fp is None:
+        return None
+    return {'video': list(fp.video) if fp.video else None,
+            'audio': list(fp.audio) if fp.audio else None}
+
+
+def _decode_fingerprint(data: Optional[dict]) -> Optional[Fingerprint]:
+    if data is None:
+        return None
+    return Fingerprint(video=tuple(data['video']) if data.get('video') else None,
+                       audio=tuple(data['audio']) if data.get('audio') else None)
+
+
+class ClipRecord(NamedTuple):
+    """清单中记录的一个已合并片段"""
+    name: str
+    size: int
+    duration: float
+    fingerprint: Optional[Fingerprint]
+
+    def same_clip(self, other: 'ClipRecord') -> bool:
+        """文件名、大小、时长和流参数都相同时视为同一片段（不比较修改时间，复制目录后仍然有效）"""
+        return (self.name == other.name and self.size == other.size
+                and abs(self.duration - other.duration) < 0.01
+                and self.fingerprint == other.fingerprint)
+
+
+class MergeManifest:
+    def __init__(self, output: str, clips: List[ClipRecord], output_size: int = 0,
+                 output_duration: float = 0.0, output_fingerprint: Optional[Fingerprint] = None,
+                 outputs: Optional[List[str]] = None, created: Optional[float] = None):
+        """合并清单：记录合并结果由哪些片段组成，用于增量追加
+
+        Args:
+            output (str): 包含全部片段的合并文件名（未分割时为最终文件，分割时为完整版）
+            clips (List[ClipRecord]): 按合并顺序排列的片段
+            output_size (int): 合并文件大小，用于确认文件没有被替换
+            output_duration (float): 合并文件时长（秒）
+            output_fingerprint (Fingerprint, optional): 合并文件的流兼容性指纹
+            outputs (List[str], optional): 本次生成的全部文件名（含分割部分）
+            created (float, optional): 写入时间
+        """
+        self.output = output
+        self.clips = clips
+        self.output_size = output_size
+        self.output_duration = output_duration
+        self.output_fingerprint = output_fingerprint
+        self.outputs = outputs or [output]
+        self.created = created or time.time()
+
+    def prefix_length(self, clips: List[ClipRecord]) -> Optional[int]:
+        """清单中的片段是clips的前缀时返回前缀长度，否则返回None"""
+        if len(clips) < len(self.clips):
+            return None
+        for old, new in zip(self.clips, clips):
+            if not old.same_clip(new):
+                return None
+        return len(self.clips)
+
+    def to_dict(self) -> dict:
+        return {
+            'version': MANIFEST_VERSION,
+            'output': self.output,
+            'output_size': self.output_size,
+            'output_duration': self.output_duration,
+            'output_fingerprint': _encode_fingerprint(self.output_fingerprint),
+            'outputs': self.outputs,
+            'created': self.created,
+            'clips': [
+                {'name': c.name, 'size': c.size, 'duration': c.duration,
+                 'fingerprint': _encode_fingerprint(c.fingerprint)}
+                for c in self.clips
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'MergeManifest':
+        clips = [ClipRecord(c['name'], c['size'], c['duration'],
+                            _decode_fingerprint(c.get('fingerprint')))
+                 for c in data['clips']]
+        return cls(data['output'], clips, data.get('output_size', 0),
+                   data.get('output_duration', 0.0),
+                   _decode_fingerprint(data.get('output_fingerprint')), data.get('outputs'),
+                   data.get('created'))
+
+    @classmethod
+    def load(cls, path: str) -> Optional['MergeManifest']:
+        """读取清单，文件不存在、损坏或版本不同时返回None"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != MANIFEST_VERSION:
+                return None
+            return cls.from_dict(data)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def save(self, path: str):
+        """原子写入清单"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
@@ -0,0 +1,367 @@
+import os
+import json
+import sqlite3
+import subprocess
+from typing import List, Dict, Optional, NamedTuple, Tuple
+from myproject.async_probe import AsyncProbeEngine
+
+# MediaInfo结构版本，字段变化时递增，使持久化缓存中的旧记录失效
+MEDIA_INFO_VERSION = 4
+
+
+def _to_int(value, default: int = 0) -> int:
+    """将ffprobe返回的字段转换为整数，无法解析时返回默认值"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _to_float(value, default: float = 0.0) -> float:
+    """将ffprobe返回的字段转换为浮点数，无法解析时返回默认值"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _normalize_sar(stream: dict) -> str:
+    """视频流的采样宽高比，未声明（0:1或缺失）时按方形像素处理"""
+    if stream.get('codec_type') != 'video':
+        return ''
+    sar = stream.get('sample_aspect_ratio', '')
+    return sar if sar and sar not in ('0:1', 'N/A') else '1:1'
+
+
+class StreamInfo(NamedTuple):
+    """单条音视频流的精简信息"""
+    index: int
+    codec_type: str
+    codec_name: str
+    profile: str = ''
+    width: int = 0
+    height: int = 0
+    pix_fmt: str = ''
+    sample_aspect_ratio: str = ''
+    frame_rate: str = ''
+    time_base: str = ''
+    sample_rate: int = 0
+    channels: int = 0
+    channel_layout: str = ''
+    bit_rate: int = 0
+    start_time: float = 0.0  # 第一个数据包的时间戳（秒）
+    duration: float = 0.0    # 流时长，容器不提供时为0
+    level: int = 0           # 视频编码级别（H.264的40表示4.0），未知时为0或负数
+    refs: int = 0            # 视频参考帧数
+
+
+class MediaInfo(NamedTuple):
+    """一次ffprobe得到的媒体文件信息"""
+    path: str
+    duration: float
+    format_name: str = ''
+    bit_rate: int = 0
+    size: int = 0
+    streams: Tuple[StreamInfo, ...] = ()
+
+    @property
+    def video(self) -> Optional[StreamInfo]:
+        """第一条视频流，没有则返回None"""
+        for stream in self.streams:
+            if stream.codec_type == 'video':
+                return stream
+        return None
+
+    @property
+    def audio(self) -> Optional[StreamInfo]:
+        """第一条音频流，没有则返回None"""
+        for stream in self.streams:
+            if stream.codec_type == 'audio':
+                return stream
+        return None
+
+    @property
+    def video_codec(self) -> str:
+        return self.video.codec_name if self.video else ''
+
+    @property
+    def audio_codec(self) -> str:
+        return self.audio.codec_name if self.audio else ''
+
+    def to_dict(self) -> dict:
+        """转换为可JSON序列化的字典"""
+        data = self._asdict()
+        data['streams'] = [stream._asdict() for stream in self.streams]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'MediaInfo':
+        """从to_dict()的结果还原"""
+        fields = dict(data)
+        streams = tuple(
+            StreamInfo(**{k: v for k, v in s.items() if k in StreamInfo._fields})
+            for s in fields.pop('streams', [])
+        )
+        fields = {k: v for k, v in fields.items() if k in cls._fields}
+        return cls(streams=streams, **fields)
+
+
+class MediaProbe:
+    def __init__(self, ffprobe: str = 'ffprobe', cache=None,
+                 engine: Optional[AsyncProbeEngine] = None):
+        """初始化媒体探测器
+
+        每个文件只调用一次 ``ffprobe -show_format -show_streams -of json``，
+        结果按 (路径, 大小, 修改时间) 缓存在内存中，同一次运行内不会重复探测。
+
+        Args:
+            ffprobe (str): ffprobe可执行文件路径
+            cache (ProbeCache, optional): 持久化探测缓存，跨运行复用未变化文件的结果
+            engine (AsyncProbeEngine, optional): 批量探测使用的异步引擎
+        """
+        self.ffprobe = ffprobe
+        self.cache = cache
+        self.engine = engine or AsyncProbeEngine()
+        self._memo: Dict[str, Tuple[Tuple[int, int], MediaInfo]] = {}
+        self._keyframe_memo: Dict[str, Tuple[Tuple[int, int], List[float]]] = {}
+        self.ffprobe_calls = 0
+
+    def build_command(self, video_path: str) -> List[str]:
+        """构建单次探测所需的ffprobe命令"""
+        return [
+            self.ffprobe,
+            '-v', 'error',
+            '-show_format',
+            '-show_streams',
+            '-of', 'json',
+            video_path
+        ]
+
+    @staticmethod
+    def parse(video_path: str, data: dict) -> MediaInfo:
+        """将ffprobe的JSON输出解析为MediaInfo
+
+        Args:
+            video_path (str): 视频文件路径
+            data (dict): ffprobe输出的JSON对象
+
+        Returns:
+            MediaInfo: 精简后的媒体信息
+        """
+        fmt = data.get('format', {})
+        streams = []
+        for s in data.get('streams', []):
+            streams.append(StreamInfo(
+                index=_to_int(s.get('index')),
+                codec_type=s.get('codec_type', ''),
+                codec_name=s.get('codec_name', ''),
+                profile=s.get('profile', ''),
+                width=_to_int(s.get('width')),
+                height=_to_int(s.get('height')),
+                pix_fmt=s.get('pix_fmt', ''),
+                sample_aspect_ratio=_normalize_sar(s),
+                frame_rate=s.get('r_frame_rate', '') if s.get('codec_type') == 'video' else '',
+                time_base=s.get('time_base', ''),
+                sample_rate=_to_int(s.get('sample_rate')),
+                channels=_to_int(s.get('channels')),
+                channel_layout=s.get('channel_layout', ''),
+                bit_rate=_to_int(s.get('bit_rate')),
+                start_time=_to_float(s.get('start_time')),
+                duration=_to_float(s.get('duration')),
+                level=_to_int(s.get('level')),
+                refs=_to_int(s.get('refs')),
+            ))
+
+        duration = _to_float(fmt.get('duration'))
+        if duration <= 0:
+            # 部分容器没有format级时长，退而使用最长的流时长
+            duration = max((_to_float(s.get('duration')) for s in data.get('streams', [])),
+                           default=0.0)
+
+        return MediaInfo(
+            path=video_path,
+            duration=duration,
+            format_name=fmt.get('format_name', ''),
+            bit_rate=_to_int(fmt.get('bit_rate')),
+            size=_to_int(fmt.get('size')),
+            streams=tuple(streams),
+        )
+
+    @staticmethod
+    def _file_key(video_path: str) -> Optional[Tuple[int, int]]:
+        """返回用于判断文件是否变化的 (大小, 修改时间) 键"""
+        try:
+            st = os.stat(video_path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _check_file(self, video_path: str) -> Optional[Tuple[int, int]]:
+        """检查文件是否可探测，返回 (大小, 修改时间) 键，无效文件返回None"""
+        file_key = self._file_key(video_path)
+        if file_key is None:
+            print(f"文件不存在: {video_path}")
+            return None
+        if file_key[0] == 0:
+            print(f"文件大小为0: {video_path}")
+            return None
+        if file_key[0] < 1024:  # 小于1KB的文件可能不是有效视频
+            print(f"文件过小，可能不是有效视频: {video_path} ({file_key[0]} 字节)")
+            return None
+        return file_key
+
+    def _lookup(self, video_path: str, file_key: Tuple[int, int]) -> Optional[MediaInfo]:
+        """从内存中查找仍然有效的探测结果"""
+        memo = self._memo.get(video_path)
+        if memo and memo[0] == file_key:
+            return memo[1]
+        return None
+
+    def _run_ffprobe(self, video_path: str) -> Optional[MediaInfo]:
+        """实际调用ffprobe探测文件"""
+        self.ffprobe_calls += 1
+        try:
+            result = subprocess.run(self.build_command(video_path), capture_output=True, text=True)
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"执行ffprobe命令失败: {os.path.basename(video_path)}, {str(e)}")
+            return None
+        return self._parse_result(video_path, result.returncode, result.stdout, result.stderr)
+
+    def _parse_result(self, video_path: str, returncode: int, stdout: str,
+                      stderr: str) -> Optional[MediaInfo]:
+        """处理ffprobe的退出码和输出"""
+        if returncode != 0:
+            print(f"探测媒体信息失败: {os.path.basename(video_path)}，错误码: {returncode}")
+            print(f"错误信息: {(stderr or '').strip()}")
+            return None
+
+        try:
+            return self.parse(video_path, json.loads(stdout or '{}'))
+        except ValueError as e:
+            print(f"解析ffprobe输出失败: {os.path.basename(video_path)}, {str(e)}")
+            return None
+
+    def _cache_call(self, method: str, *args):
+        """调用持久化缓存，缓存不可用时打印警告并停用缓存"""
+        if self.cache is None:
+            return None
+        try:
+            return getattr(self.cache, method)(*args)
+        except (sqlite3.Error, OSError) as e:
+            print(f"探测缓存不可用，将不使用缓存: {str(e)}")
+            self.cache = None
+            return None
+
+    def probe(self, video_path: str) -> Optional[MediaInfo]:
+        """探测单个媒体文件
+
+        Args:
+            video_path (str): 视频文件路径
+
+        Returns:
+            Optional[MediaInfo]: 媒体信息，探测失败返回None
+        """
+        file_key = self._check_file(video_path)
+        if file_key is None:
+            return None
+
+        info = self._lookup(video_path, file_key)
+        if info is not None:
+            return info
+
+        info = self._cache_call('get', video_path)
+        if info is None:
+            info = self._run_ffprobe(video_path)
+            if info is not None:
+                self._cache_call('put', video_path, info)
+
+        if info is not None:
+            self._memo[video_path] = (file_key, info)
+        return info
+
+    def probe_many(self, video_paths: List[str]) -> Dict[str, Optional[MediaInfo]]:
+        """并发探测多个媒体文件
+
+        先查询内存和持久化缓存（批量一次查询），只对未命中的文件调用ffprobe，
+        这些ffprobe在同一个事件循环中以自适应并发数运行。
+
+        Args:
+            video_paths (List[str]): 视频文件路径列表
+
+        Returns:
+            Dict[str, Optional[MediaInfo]]: 路径到媒体信息的映射，顺序与输入一致
+        """
+        results: Dict[str, Optional[MediaInfo]] = {path: None for path in video_paths}
+        file_keys = {}
+        for path in video_paths:
+            file_key = self._check_file(path)
+            if file_key is None:
+                continue
+            info = self._lookup(path, file_key)
+            if info is not None:
+                results[path] = info
+            else:
+                file_keys[path] = file_key
+
+        if file_keys:
+            for path, info in (self._cache_call('get_many', list(file_keys)) or {}).items():
+                results[path] = info
+                self._memo[path] = (file_keys.pop(path), info)
+
+        if file_keys:
+            self.ffprobe_calls += len(file_keys)
+            outputs = self.engine.run({path: self.build_command(path) for path in file_keys})
+            probed = {}
+            for path, (returncode, stdout, stderr) in outputs.items():
+                info = self._parse_result(path, returncode, stdout, stderr)
+                results[path] = info
+                if info is not None:
+                    probed[path] = info
+                    self._memo[path] = (file_keys[path], info)
+            if probed:
+                self._cache_call('put_many', probed)
+
+        return results
+
+    def keyframes(self, video_path: str) -> List[float]:
+        """获取第一条视频流的关键帧时间索引
+
+        只读取包头（不解码），按包标志中的K识别关键帧。
+
+        Args:
+            video_path (str): 视频文件路径
+
+        Returns:
+            List[float]: 升序排列的关键帧时间（秒），失败时返回空列表
+        """
+        file_key = self._file_key(video_path)
+        memo = self._keyframe_memo.get(video_path)
+        if memo and memo[0] == file_key:
+            return memo[1]
+
+        cmd = [
+            self.ffprobe,
+            '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries', 'packet=pts_time,flags',
+            '-of', 'csv=p=0',
+            video_path
+        ]
+        self.ffprobe_calls += 1
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True)
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"获取关键帧索引失败: {os.path.basename(video_path)}, {str(e)}")
+            return []
+        if result.returncode != 0:
+            print(f"获取关键帧索引失败: {os.path.basename(video_path)}，错误码: {result.returncode}")
+            return []
+
+        keyframes = []
+        for line in result.stdout.splitlines():
+            pts_time, _, flags = line.partition(',')
+            if 'K' in flags and pts_time not in ('', 'N/A'):
+                keyframes.append(_to_float(pts_time))
+        keyframes.sort()
+        self._keyframe_memo[video_path] = (file_key, keyframes)
+        return keyframes
@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows没有resource模块，无法统计子进程CPU时间
+    resource = None
+
+
+def _children_cpu() -> Optional[Tuple[float, float]]:
+    """返回已结束子进程累计的 (用户态, 内核态) CPU时间"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime, usage.ru_stime
+
+
+class StageRecord:
+    def __init__(self, name: str):
+        """单个阶段的耗时和资源记录
+
+        子进程CPU时间来自 ``getrusage(RUSAGE_CHILDREN)`` 的差值，统计的是本进程内
+        该阶段期间结束的所有子进程；多个任务在同一进程中并发运行时会互相计入。
+
+        Args:
+            name (str): 阶段名称
+        """
+        self.name = name
+        self.wall_time = 0.0
+        self.child_user_time: Optional[float] = None
+        self.child_system_time: Optional[float] = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.details: Dict[str, float] = {}
+
+    def add_read(self, nbytes: int):
+        """记录读取的字节数"""
+        self.bytes_read += nbytes
+
+    def add_written(self, nbytes: int):
+        """记录写入的字节数"""
+        self.bytes_written += nbytes
+
+    def add_detail(self, key: str, value: float):
+        """累加阶段内的附加指标"""
+        self.details[key] = self.details.get(key, 0.0) + value
+
+    def to_dict(self) -> dict:
+        data = {
+            'stage': self.name,
+            'wall_time': round(self.wall_time, 6),
+            'child_user_time': self.child_user_time,
+            'child_system_time': self.child_system_time,
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+        }
+        data.update(self.details)
+        return data
+
+
+class JobMetrics:
+    def __init__(self, job: str = ''):
+        """一次合并任务的分阶段指标
+
+        Args:
+            job (str): 任务名称（通常为输出文件名）
+        """
+        self.job = job
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.stages: List[StageRecord] = []
+        self.strategies: List[str] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """记录一个阶段的墙钟时间和子进程CPU时间
+
+        用法::
+
+            with metrics.stage('merge') as record:
+                ...
+                record.add_written(os.path.getsize(output))
+        """
+        record = StageRecord(name)
+        cpu_before = _children_cpu()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.wall_time = time.perf_counter() - start
+            cpu_after = _children_cpu()
+            if cpu_before is not None and cpu_after is not None:
+                record.child_user_time = round(cpu_after[0] - cpu_before[0], 6)
+                record.child_system_time = round(cpu_after[1] - cpu_before[1], 6)
+            with self._lock:
+                self.stages.append(record)
+
+    def add_strategy(self, strategy: str):
+        """记录实际采用的合并策略（分部分合并时可能有多个）"""
+        with self._lock:
+            if strategy not in self.strategies:
+                self.strategies.append(strategy)
+
+    @property
+    def strategy(self) -> str:
+        return '+'.join(self.strategies) or 'none'
+
+    @property
+    def wall_time(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+    def stage_totals(self) -> Dict[str, dict]:
+        """按阶段名称汇总（同一阶段可能执行多次，如分部分合并）"""
+        totals: Dict[str, dict] = {}
+        for record in self.stages:
+            data = record.to_dict()
+            name = data.pop('stage')
+            total = totals.setdefault(name, {'count': 0})
+            total['count'] += 1
+            for key, value in data.items():
+                if value is None:
+                    total.setdefault(key, None)
+                else:
+                    total[key] = (total.get(key) or 0) + value
+        return totals
+
+    def to_dict(self) -> dict:
+        return {
+            'job': self.job,
+            'started': self.started,
+            'wall_time': round(self.wall_time, 6),
+            'strategy': self.strategy,
+            'stages': self.stage_totals(),
+        }
+
+    def write_jsonl(self, path: str, **extra):
+        """把本次任务的指标追加为JSON Lines中的一行"""
+        data = self.to_dict()
+        data.update(extra)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(data, ensure_ascii=False) + '\n')
+
+    def write_prometheus(self, path: str, success: bool = True):
+        """写出Prometheus node_exporter textfile格式的指标（原子替换）"""
+        job = self.job.replace('\\', '\\\\').replace('"', '\\"')
+        lines = [
+            '# HELP video_merger_job_seconds Wall time of the whole merge job.',
+            '# TYPE video_merger_job_seconds gauge',
+            f'video_merger_job_seconds{{job="{job}",strategy="{self.strategy}"}} '
+            f'{self.wall_time:.6f}',
+            '# HELP video_merger_job_success Whether the merge job succeeded.',
+            '# TYPE video_merger_job_success gauge',
+            f'video_merger_job_success{{job="{job}"}} {1 if success else 0}',
+        ]
+        metrics = (
+            ('stage_seconds', 'wall_time', 'Wall time per merge stage.'),
+            ('stage_child_user_seconds', 'child_user_time',
+             'User CPU time of child processes per stage.'),
+            ('stage_child_system_seconds', 'child_system_time',
+             'System CPU time of child processes per stage.'),
+            ('stage_bytes_read', 'bytes_read', 'Bytes read per stage.'),
+            ('stage_bytes_written', 'bytes_written', 'Bytes written per stage.'),
+        )
+        totals = self.stage_totals()
+        for metric, key, help_text in metrics:
+            lines.append(f'# HELP video_merger_{metric} {help_text}')
+            lines.append(f'# TYPE video_merger_{metric} gauge')
+            for stage, total in totals.items():
+                if total.get(key) is not None:
+                    lines.append(f'video_merger_{metric}{{job="{job}",stage="{stage}"}} '
+                                 f'{total[key]}')
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+
+
+class MergeResult:
+    def __init__(self, success: bool, outputs: List[str], metrics: JobMetrics):
+        """merge_videos的返回结果
+
+        布尔值与success一致，兼容之前直接返回bool的用法。
+
+        Args:
+            success (bool): 是否成功
+            outputs (List[str]): 生成的视频文件
+            metrics (JobMetrics): 分阶段指标
+        """
+        self.success = success
+        self.outputs = outputs
+        self.metrics = metrics
+
+    def __bool__(self) -> bool:
+        return self.success
+
+    @property
+    def strategy(self) -> str:
+        return self.metrics.strategy
+
+    def to_dict(self) -> dict:
+        data = self.metrics.to_dict()
+        data.update(success=self.success, outputs=list(self.outputs))
+        return data
+
+    def __repr__(self) -> str:
+        return (f"MergeResult(success={self.success}, strategy={self.strategy!r}, "
+                f"outputs={len(self.outputs)}, wall_time={self.metrics.wall_time:.1f}s)")
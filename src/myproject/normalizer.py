@@ -0,0 +1,316 @@
+import os
+import time
+import subprocess
+import concurrent.futures
+from typing import List, Dict, Optional
+from myproject.compatibility import Fingerprint, VIDEO_FIELDS, AUDIO_FIELDS, fingerprint
+from myproject.media_probe import MediaInfo, StreamInfo
+from myproject.encoders import EncoderCapability
+
+# 编码名称 -> FFmpeg编码器
+VIDEO_ENCODERS = {
+    'h264': 'libx264',
+    'hevc': 'libx265',
+    'mpeg4': 'mpeg4',
+    'vp9': 'libvpx-vp9',
+}
+AUDIO_ENCODERS = {
+    'aac': 'aac',
+    'mp3': 'libmp3lame',
+    'ac3': 'ac3',
+    'opus': 'libopus',
+}
+
+# ffprobe报告的profile -> 编码器的profile参数
+VIDEO_PROFILES = {
+    'Constrained Baseline': 'baseline',
+    'Baseline': 'baseline',
+    'Main': 'main',
+    'High': 'high',
+    'High 10': 'high10',
+    'High 4:2:2': 'high422',
+    'High 4:4:4 Predictive': 'high444',
+}
+AUDIO_PROFILES = {
+    'LC': 'aac_low',
+}
+
+# 片段的规范化方式
+MODE_LABELS = {
+    'encode': '已规范化',        # 重编码视频和音频
+    'audio': '已转码音频',       # 视频直接拷贝，只转码音频
+    'silence': '已添加静音音轨',  # 没有音轨，补上静音音轨
+}
+
+
+def track_timescale(time_base: str) -> Optional[str]:
+    """从时间基（如1/12800）中取出MP4轨道时间刻度"""
+    parts = time_base.split('/')
+    if len(parts) == 2 and parts[0] == '1' and parts[1].isdigit():
+        return parts[1]
+    return None
+
+
+def h264_level(level: int) -> Optional[str]:
+    """把ffprobe报告的H.264 level（如31、40）转换为编码器的 -level 参数（如3.1、4.0），未知时返回None"""
+    if level < 10:
+        return None
+    return f"{level // 10}.{level % 10}"
+
+
+def matches_reference(info: MediaInfo, reference: Optional[StreamInfo]) -> bool:
+    """重编码结果的视频 level 和参考帧数是否与参考流一致
+
+    兼容性指纹相同的H.264流，SPS（level、参考帧数）不同时拷贝拼接后部分播放器和解码器会出错，
+    重编码的片段要和直接拷贝的片段一致。
+    """
+    video = info.video
+    if reference is None or video is None:
+        return True
+    return ((h264_level(reference.level) is None or video.level == reference.level)
+            and (reference.refs <= 0 or video.refs == reference.refs))
+
+
+def video_encode_args(target: Fingerprint, encode_preset: str = 'faster', crf: int = 23,
+                      hw_encoder: Optional[EncoderCapability] = None,
+                      reference: Optional[StreamInfo] = None) -> Optional[List[str]]:
+    """构建把视频流编码为目标指纹所需的参数
+
+    hw_encoder 为能力表选出的硬件编码器时用它代替软件编码器，其自带的滤镜（如VAAPI的
+    hwupload）接在缩放滤镜之后，像素格式由编码器决定。reference 为要与之拷贝拼接的片段的
+    视频流时，libx264沿用它的 level 和参考帧数，使SPS一致。
+
+    Returns:
+        Optional[List[str]]: FFmpeg参数，目标编码没有可用编码器时返回None
+    """
+    v = dict(zip(VIDEO_FIELDS, target.video))
+    encoder = VIDEO_ENCODERS.get(v['codec_name'])
+    if encoder is None:
+        return None
+
+    width, height = v['width'], v['height']
+    sar = v['sample_aspect_ratio'].replace(':', '/')
+    filters = (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+               f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar={sar}")
+    if hw_encoder is not None and hw_encoder.hardware and hw_encoder.codec == v['codec_name']:
+        options = list(hw_encoder.options)
+        if '-vf' in options:
+            i = options.index('-vf')
+            filters += ',' + options[i + 1]
+            del options[i:i + 2]
+        args = ['-vf', filters, '-c:v', hw_encoder.encoder] + options
+        if v['frame_rate'] and v['frame_rate'] != '0/0':
+            args.extend(['-r', v['frame_rate']])
+        timescale = track_timescale(v['time_base'])
+        if timescale:
+            args.extend(['-video_track_timescale', timescale])
+        return args
+
+    args = [
+        '-vf', filters,
+        '-c:v', encoder,
+        '-pix_fmt', v['pix_fmt'],
+    ]
+    if v['frame_rate'] and v['frame_rate'] != '0/0':
+        args.extend(['-r', v['frame_rate']])
+    if encoder in ('libx264', 'libx265'):
+        args.extend(['-preset', encode_preset, '-crf', str(crf)])
+    profile = VIDEO_PROFILES.get(v['profile'])
+    if profile and encoder == 'libx264':
+        args.extend(['-profile:v', profile])
+    if reference is not None and encoder == 'libx264':
+        level = h264_level(reference.level)
+        if level:
+            args.extend(['-level:v', level])
+        if reference.refs > 0:
+            args.extend(['-x264-params', f"ref={reference.refs}"])
+    timescale = track_timescale(v['time_base'])
+    if timescale:
+        args.extend(['-video_track_timescale', timescale])
+    return args
+
+
+def audio_encode_args(target: Fingerprint) -> Optional[List[str]]:
+    """构建把音频流编码为目标指纹所需的参数
+
+    Returns:
+        Optional[List[str]]: FFmpeg参数，目标没有音轨时返回['-an']，没有可用编码器时返回None
+    """
+    if target.audio is None:
+        return ['-an']
+    a = dict(zip(AUDIO_FIELDS, target.audio))
+    encoder = AUDIO_ENCODERS.get(a['codec_name'])
+    if encoder is None:
+        return None
+    args = ['-c:a', encoder, '-ar', str(a['sample_rate']), '-ac', str(a['channels']),
+            '-b:a', '192k']
+    profile = AUDIO_PROFILES.get(a['profile'])
+    if profile and encoder == 'aac':
+        args.extend(['-profile:a', profile])
+    return args
+
+
+def silent_audio_input(target: Fingerprint, duration: float) -> List[str]:
+    """构建与目标音频采样率、声道布局一致的静音输入（lavfi anullsrc），时长与片段相同"""
+    a = dict(zip(AUDIO_FIELDS, target.audio))
+    layout = a['channel_layout']
+    if not layout or layout == 'unknown':
+        layout = {1: 'mono', 2: 'stereo'}.get(a['channels'], f"{a['channels']}c")
+    return ['-f', 'lavfi', '-t', f"{duration:.6f}",
+            '-i', f"anullsrc=channel_layout={layout}:sample_rate={a['sample_rate']}"]
+
+
+def h264_target(reference: Fingerprint,
+                audio_reference: Optional[Fingerprint] = None) -> Fingerprint:
+    """以参考指纹的分辨率、帧率等为基础，构造统一的H.264/AAC编码目标
+
+    Args:
+        reference (Fingerprint): 提供视频参数的参考指纹
+        audio_reference (Fingerprint, optional): 提供音频参数的参考指纹，默认与reference相同
+
+    Returns:
+        Fingerprint: 编码目标
+    """
+    v = dict(zip(VIDEO_FIELDS, reference.video))
+    v.update(codec_name='h264', profile='High', pix_fmt='yuv420p')
+    audio = (audio_reference or reference).audio
+    if audio is not None:
+        a = dict(zip(AUDIO_FIELDS, audio))
+        a.update(codec_name='aac', profile='LC')
+        audio = tuple(a[f] for f in AUDIO_FIELDS)
+    return Fingerprint(video=tuple(v[f] for f in VIDEO_FIELDS), audio=audio)
+
+
+def build_encode_command(input_args: List[str], dst: str, target: Fingerprint, threads: int,
+                         encode_preset: str = 'faster', crf: int = 23, copy_video: bool = False,
+                         silence: Optional[float] = None,
+                         hw_encoder: Optional[EncoderCapability] = None,
+                         reference: Optional[StreamInfo] = None) -> Optional[List[str]]:
+    """构建把输入编码为目标指纹的FFmpeg命令
+
+    Args:
+        input_args (List[str]): 输入参数，如 ['-i', 'a.mkv'] 或concat列表输入
+        dst (str): 输出文件路径
+        target (Fingerprint): 目标兼容性指纹
+        threads (int): FFmpeg线程数
+        encode_preset (str): FFmpeg编码速度预设
+        crf (int): 视频质量参数
+        copy_video (bool): 输入的视频流已与目标一致，直接拷贝视频、只转码音频
+        silence (float, optional): 输入没有音轨时给出片段时长，生成同样时长、与目标音频参数一致的静音音轨
+        hw_encoder (EncoderCapability, optional): 代替软件编码器使用的硬件编码器
+        reference (StreamInfo, optional): 输出要与之拷贝拼接的视频流，沿用其 level 和参考帧数
+
+    Returns:
+        Optional[List[str]]: FFmpeg命令，无法编码为目标格式时返回None
+    """
+    if copy_video:
+        video_args = ['-c:v', 'copy']
+    else:
+        video_args = video_encode_args(target, encode_preset, crf, hw_encoder, reference)
+    audio_args = audio_encode_args(target)
+    if video_args is None or audio_args is None:
+        return None
+    if silence is not None and target.audio is not None:
+        input_args = input_args + silent_audio_input(target, silence)
+        maps = ['-map', '0:v:0', '-map', '1:a:0', '-shortest']
+    else:
+        maps = ['-map', '0:v:0', '-map', '0:a:0?']
+    return [
+        'ffmpeg', '-y', '-nostdin',
+        '-v', 'error',
+    ] + input_args + maps + [
+        '-threads', str(threads),
+    ] + video_args + audio_args + [
+        '-max_muxing_queue_size', '1024',
+        dst,
+    ]
+
+
+class ClipNormalizer:
+    def __init__(self, work_dir: str, max_jobs: int = 2, threads_per_job: int = 2,
+                 encode_preset: str = 'faster', crf: int = 23):
+        """将不兼容的片段重编码为目标格式
+
+        每个片段由独立的FFmpeg进程处理，多个进程并行运行。
+
+        Args:
+            work_dir (str): 存放规范化片段的工作目录
+            max_jobs (int): 同时运行的FFmpeg进程数
+            threads_per_job (int): 每个FFmpeg进程的线程数
+            encode_preset (str): FFmpeg编码速度预设
+            crf (int): 视频质量参数
+        """
+        self.work_dir = work_dir
+        self.max_jobs = max(1, max_jobs)
+        self.threads_per_job = max(1, threads_per_job)
+        self.encode_preset = encode_preset
+        self.crf = crf
+        # 最近一次normalize中各片段的处理方式（'encode'、'audio'或'silence'）和耗时
+        self.modes: Dict[str, str] = {}
+        self.timings: Dict[str, float] = {}
+
+    def build_command(self, src: str, dst: str, target: Fingerprint, copy_video: bool = False,
+                      silence: Optional[float] = None,
+                      reference: Optional[StreamInfo] = None) -> Optional[List[str]]:
+        """构建单个片段的规范化命令，无法编码为目标格式时返回None"""
+        return build_encode_command(['-i', src], dst, target, self.threads_per_job,
+                                    self.encode_preset, self.crf, copy_video, silence,
+                                    reference=reference)
+
+    def _normalize_one(self, index: int, src: str, target: Fingerprint,
+                       source: Optional[MediaInfo] = None,
+                       reference: Optional[StreamInfo] = None) -> Optional[str]:
+        stem = os.path.splitext(os.path.basename(src))[0]
+        dst = os.path.join(self.work_dir, f"{index:05d}_{stem}.mp4")
+        fp = fingerprint(source) if source is not None else None
+        copy_video = fp is not None and fp.video is not None and fp.video == target.video
+        silence = None
+        if fp is not None and fp.audio is None and target.audio is not None and source.duration:
+            silence = source.duration
+        mode = 'encode' if not copy_video else 'silence' if silence is not None else 'audio'
+        cmd = self.build_command(src, dst, target, copy_video, silence, reference)
+        if cmd is None:
+            print(f"无法规范化 {os.path.basename(src)}：目标格式没有可用的编码器")
+            return None
+
+        start = time.perf_counter()
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        self.modes[src] = mode
+        self.timings[src] = time.perf_counter() - start
+        if result.returncode != 0 or not os.path.exists(dst):
+            print(f"规范化失败 {os.path.basename(src)}，错误码: {result.returncode}")
+            print(f"错误信息: {result.stderr.strip()}")
+            return None
+        print(f"{MODE_LABELS[mode]}: {os.path.basename(src)}")
+        return dst
+
+    def normalize(self, clips: List[str], target: Fingerprint,
+                  sources: Optional[Dict[str, MediaInfo]] = None,
+                  reference: Optional[StreamInfo] = None) -> Dict[str, Optional[str]]:
+        """并行规范化多个片段
+
+        根据 sources 中片段自身的探测结果：视频流已与目标一致的片段只转码音频、视频直接拷贝；
+        没有音轨的片段补上与目标参数一致的静音音轨（anullsrc）。两者都远快于重编码视频。
+
+        Args:
+            clips (List[str]): 需要规范化的片段路径
+            target (Fingerprint): 目标兼容性指纹
+            sources (Dict[str, MediaInfo], optional): 片段路径 -> 片段自身的探测结果
+            reference (StreamInfo, optional): 多数类的视频流，重编码视频时沿用其 level 和参考帧数
+
+        Returns:
+            Dict[str, Optional[str]]: 原路径 -> 规范化后的路径，失败为None
+        """
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.modes = {}
+        self.timings = {}
+        print(f"\n使用 {self.max_jobs} 个FFmpeg进程（每个 {self.threads_per_job} 线程）"
+              f"规范化 {len(clips)} 个片段...")
+        results: Dict[str, Optional[str]] = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_jobs) as executor:
+            futures = {executor.submit(self._normalize_one, i, clip, target,
+                                       (sources or {}).get(clip), reference): clip
+                       for i, clip in enumerate(clips)}
+            for future in concurrent.futures.as_completed(futures):
+                results[futures[future]] = future.result()
+        return results
@@ -0,0 +1,34 @@
+from typing import List, Tuple
+
+
+def partition_contiguous(durations: List[float], parts: int) -> List[Tuple[int, int]]:
+    """把有序的片段划分为时长尽量均衡的若干个连续区间
+
+    片段顺序保持不变，每个切分点选在累计时长最接近 k/parts 总时长的片段边界上。
+
+    Args:
+        durations (List[float]): 按顺序排列的片段时长
+        parts (int): 期望的分组数，实际分组数不会超过片段数
+
+    Returns:
+        List[Tuple[int, int]]: 每组的 [start, end) 下标区间
+    """
+    count = len(durations)
+    parts = max(1, min(parts, count))
+    if count == 0:
+        return []
+
+    total = sum(durations)
+    prefix = [0.0]
+    for duration in durations:
+        prefix.append(prefix[-1] + duration)
+
+    bounds = [0]
+    for k in range(1, parts):
+        target = total * k / parts
+        # 为后面的分组至少保留一个片段，且切分点严格递增
+        lo, hi = bounds[-1] + 1, count - (parts - k)
+        best = min(range(lo, hi + 1), key=lambda i: abs(prefix[i] - target))
+        bounds.append(best)
+    bounds.append(count)
+    return [(bounds[i], bounds[i + 1]) for i in range(parts)]
@@ -0,0 +1,488 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from fractions import Fraction
+from typing import List, Dict, Iterable, Optional, NamedTuple, Sequence
+from myproject.media_probe import MediaInfo
+from myproject.compatibility import CompatibilityReport, build_report
+from myproject.normalizer import video_encode_args, audio_encode_args
+from myproject.partition import partition_contiguous
+from myproject.remux import plan_remux, remuxed_info, target_timescale
+from myproject.timestamps import analyze_timestamps
+from myproject.encoders import EncoderRegistry, EncoderCapability, default_registry
+from myproject.probe_cache import default_cache_dir
+
+# 按质量从低到高排列的x264预设
+PRESETS = ('ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower',
+           'veryslow')
+
+# 没有校准数据时使用的保守估计：720p下libx264各预设的帧率和磁盘吞吐量
+DEFAULT_PRESET_FPS = {
+    'ultrafast': 400.0, 'superfast': 300.0, 'veryfast': 220.0, 'faster': 160.0, 'fast': 120.0,
+    'medium': 90.0, 'slow': 50.0, 'slower': 25.0, 'veryslow': 10.0,
+}
+DEFAULT_DISK_THROUGHPUT = 100 * 1024 * 1024
+
+# 只转码音频（视频直接拷贝）时相对实时的速度，AAC编码通常在几百倍实时以上
+AUDIO_TRANSCODE_SPEED = 200.0
+
+# 并行分组编码时每增加一个libx264进程带来的吞吐量增益（相对单进程），快速预设下线程扩展性差，
+# 多进程能利用更多核心，但仍受内存带宽限制；硬件编码器受限于编码单元，不计增益
+PARALLEL_ENCODE_GAIN = 0.35
+
+
+def _frame_rate(info: MediaInfo) -> float:
+    video = info.video
+    try:
+        rate = float(Fraction(video.frame_rate)) if video and video.frame_rate else 0.0
+    except (ValueError, ZeroDivisionError):
+        rate = 0.0
+    return rate if rate > 0 else 25.0
+
+
+def _pixels(info: MediaInfo) -> int:
+    video = info.video
+    if video and video.width and video.height:
+        return max(video.width * video.height, 1)
+    return 1280 * 720
+
+
+class HostCalibration:
+    VERSION = 1
+
+    def __init__(self, path: Optional[str] = None, registry: Optional[EncoderRegistry] = None,
+                 presets: tuple = ('ultrafast', 'veryfast', 'faster', 'medium', 'slow'),
+                 disk_sample_bytes: int = 64 * 1024 * 1024):
+        """按主机持久化的成本模型校准数据
+
+        记录libx264各预设的实测编码帧率（lavfi测试源，分辨率同EncoderRegistry的试编码）和
+        各磁盘的顺序写吞吐量。硬件编码器的帧率直接取自EncoderRegistry。没有测量过的预设
+        按已测量预设相对默认表的平均比例推算，完全没有数据时使用保守的默认值。
+
+        Args:
+            path (str, optional): 校准数据路径，默认为缓存目录下的 calibration.json
+            registry (EncoderRegistry, optional): 编码器能力表，默认使用共享能力表
+            presets (tuple): 校准时测量的预设
+            disk_sample_bytes (int): 磁盘测速写入的字节数
+        """
+        self.path = path or os.path.join(default_cache_dir(), 'calibration.json')
+        self.registry = registry or default_registry()
+        self.presets = presets
+        self.disk_sample_bytes = disk_sample_bytes
+        self.preset_fps: Dict[str, float] = {}
+        self.disk_throughput: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _host_key(self) -> dict:
+        key = self.registry.host_key()
+        key['calibration'] = self.VERSION
+        return key
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get('key') == self._host_key():
+            self.preset_fps = data.get('preset_fps', {})
+            self.disk_throughput = data.get('disk_throughput', {})
+
+    def _save(self):
+        data = {'key': self._host_key(), 'updated': time.time(),
+                'preset_fps': self.preset_fps, 'disk_throughput': self.disk_throughput}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"保存校准数据失败: {str(e)}")
+
+    @property
+    def calibrated(self) -> bool:
+        return bool(self.preset_fps)
+
+    def calibrate_encoders(self):
+        """对libx264的各个预设试编码并记录帧率"""
+        print("校准编码速度...")
+        for preset in self.presets:
+            capability = self.registry.trial('none', 'libx264', 'h264', [], preset)
+            if capability.available:
+                self.preset_fps[preset] = capability.fps
+                print(f"  libx264 {preset}: {capability.fps:.0f} fps")
+        with self._lock:
+            self._save()
+
+    def calibrate(self, directories: Iterable[str] = ()):
+        """测量编码速度和各目录所在磁盘的吞吐量（每个磁盘只测一次）
+
+        测量需要试编码并写入 disk_sample_bytes 字节，只应由用户显式触发
+        （批量命令行 ``--calibrate``），规划时只读取已保存的数据。
+        """
+        self.calibrate_encoders()
+        devices = set()
+        for directory in directories:
+            try:
+                device = os.stat(directory).st_dev
+            except OSError as e:
+                print(f"无法测量磁盘吞吐量 {directory}: {str(e)}")
+                continue
+            if device not in devices:
+                devices.add(device)
+                throughput = self.calibrate_disk(directory)
+                print(f"  {directory}: {throughput/1024/1024:.0f} MB/s")
+
+    def calibrate_disk(self, directory: str) -> float:
+        """在目录所在磁盘上顺序写入并同步一个临时文件，记录写吞吐量（字节/秒）"""
+        chunk = os.urandom(1024 * 1024)
+        start = time.perf_counter()
+        fd, path = tempfile.mkstemp(prefix='.calibrate_', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for _ in range(max(1, self.disk_sample_bytes // len(chunk))):
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            elapsed = time.perf_counter() - start
+        finally:
+            os.remove(path)
+        throughput = self.disk_sample_bytes / elapsed if elapsed > 0 else DEFAULT_DISK_THROUGHPUT
+        with self._lock:
+            self.disk_throughput[str(os.stat(directory).st_dev)] = throughput
+            self._save()
+        return throughput
+
+    def disk(self, directory: str, measure: bool = False) -> float:
+        """返回目录所在磁盘的吞吐量（字节/秒），未测量过时使用默认值（measure为True时先测量）"""
+        try:
+            key = str(os.stat(directory).st_dev)
+        except OSError:
+            return DEFAULT_DISK_THROUGHPUT
+        if key not in self.disk_throughput and measure:
+            try:
+                return self.calibrate_disk(directory)
+            except OSError:
+                return DEFAULT_DISK_THROUGHPUT
+        return self.disk_throughput.get(key, DEFAULT_DISK_THROUGHPUT)
+
+    def encode_fps(self, preset: str, pixels: int,
+                   encoder: Optional[EncoderCapability] = None) -> float:
+        """估算给定分辨率下的编码帧率
+
+        Args:
+            preset (str): libx264预设（硬件编码器忽略）
+            pixels (int): 每帧像素数
+            encoder (EncoderCapability, optional): 硬件编码器，None表示libx264
+
+        Returns:
+            float: 估计帧率
+        """
+        if encoder is not None and encoder.hardware:
+            fps = encoder.fps
+        elif preset in self.preset_fps:
+            fps = self.preset_fps[preset]
+        else:
+            fps = DEFAULT_PRESET_FPS.get(preset, DEFAULT_PRESET_FPS['faster'])
+            # 用已测量预设与默认表之比缩放默认值
+            ratios = [self.preset_fps[p] / DEFAULT_PRESET_FPS[p] for p in self.preset_fps
+                      if p in DEFAULT_PRESET_FPS]
+            if ratios:
+                fps *= sum(ratios) / len(ratios)
+        return max(fps * self.registry.trial_pixels / max(pixels, 1), 0.1)
+
+    def encode_time(self, infos: Iterable[Optional[MediaInfo]], preset: str,
+                    encoder: Optional[EncoderCapability] = None, processes: int = 1) -> float:
+        """估算重编码这些片段的视频所需的秒数（无法探测的片段忽略）
+
+        processes 大于1时按并行分组编码估计：片段按时长均衡切成连续分组，各进程平分
+        总吞吐量，耗时取决于最长的分组。
+        """
+        infos = [info for info in infos if info]
+        seconds = [info.duration * _frame_rate(info)
+                   / self.encode_fps(preset, _pixels(info), encoder) for info in infos]
+        processes = min(processes, len(infos))
+        if processes <= 1:
+            return sum(seconds)
+        gain = 0.0 if encoder is not None and encoder.hardware else PARALLEL_ENCODE_GAIN
+        ranges = partition_contiguous([info.duration for info in infos], processes)
+        longest = max(sum(seconds[start:end]) for start, end in ranges)
+        return longest * len(ranges) / (1 + gain * (len(ranges) - 1))
+
+
+class StrategyEstimate(NamedTuple):
+    """一种合并策略的成本估计"""
+    strategy: str
+    encode_preset: Optional[str]
+    wall_time: float
+    output_size: int
+    correct: bool
+    reason: str = ''
+
+
+class MergePlan:
+    def __init__(self, output_name: str, video_files: List[str], strategy: str,
+                 encode_preset: str = 'faster', crf: int = 23, use_hw_accel: bool = False,
+                 encoder: str = 'libx264', outliers: Optional[List[str]] = None,
+                 estimates: Optional[List[StrategyEstimate]] = None,
+                 calibrated: bool = False, validate_junctions: bool = False,
+                 encode_processes: int = 1):
+        """合并计划：选定的策略和各策略的估计，可序列化后交给 VideoMerger.execute_plan 执行
+
+        Args:
+            output_name (str): 输出文件名（不包含扩展名）
+            video_files (List[str]): 要合并的视频文件（相对于输入目录）
+            strategy (str): 'copy'、'selective' 或 'encode'
+            encode_preset (str): 需要编码时使用的预设
+            crf (int): 视频质量参数
+            use_hw_accel (bool): 是否使用硬件编码器
+            encoder (str): 预计使用的编码器
+            outliers (List[str], optional): selective策略中需要重编码的片段
+            estimates (List[StrategyEstimate], optional): 各策略的估计
+            calibrated (bool): 估计是否基于本机校准数据
+            validate_junctions (bool): 规划时发现了异常拼接点，执行时需要预检并修复拼接点
+            encode_processes (int): 全部重编码时并行运行的FFmpeg进程数（估计时已计入）
+        """
+        self.output_name = output_name
+        self.video_files = video_files
+        self.strategy = strategy
+        self.encode_preset = encode_preset
+        self.crf = crf
+        self.use_hw_accel = use_hw_accel
+        self.encoder = encoder
+        self.outliers = outliers or []
+        self.estimates = estimates or []
+        self.calibrated = calibrated
+        self.validate_junctions = validate_junctions
+        self.encode_processes = encode_processes
+
+    @property
+    def chosen(self) -> Optional[StrategyEstimate]:
+        return next((e for e in self.estimates
+                     if e.strategy == self.strategy
+                     and (self.strategy != 'encode' or e.encode_preset == self.encode_preset)),
+                    None)
+
+    def merge_options(self) -> dict:
+        """转换为 merge_videos 的参数
+
+        copy和selective都按selective模式执行：合并时仍会基于（已缓存的）探测结果
+        确认兼容性，文件在计划之后发生变化也不会产生损坏的输出。
+        """
+        return {
+            'video_files': list(self.video_files),
+            'force_encode': self.strategy == 'encode',
+            'normalize_mode': 'selective',
+            'encode_preset': self.encode_preset,
+            'crf': self.crf,
+            'use_hw_accel': self.use_hw_accel,
+            'validate_junctions': self.validate_junctions,
+            'encode_processes': self.encode_processes,
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            'output_name': self.output_name,
+            'video_files': self.video_files,
+            'strategy': self.strategy,
+            'encode_preset': self.encode_preset,
+            'crf': self.crf,
+            'use_hw_accel': self.use_hw_accel,
+            'encoder': self.encoder,
+            'outliers': self.outliers,
+            'calibrated': self.calibrated,
+            'validate_junctions': self.validate_junctions,
+            'encode_processes': self.encode_processes,
+            'estimates': [e._asdict() for e in self.estimates],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'MergePlan':
+        return cls(data['output_name'], data['video_files'], data['strategy'],
+                   data.get('encode_preset', 'faster'), data.get('crf', 23),
+                   data.get('use_hw_accel', False), data.get('encoder', 'libx264'),
+                   data.get('outliers'), [StrategyEstimate(**e) for e in data.get('estimates', [])],
+                   data.get('calibrated', False), data.get('validate_junctions', False),
+                   data.get('encode_processes', 1))
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> 'MergePlan':
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def print_summary(self):
+        """打印各策略的估计和选定的策略"""
+        note = "" if self.calibrated else "（未校准，使用默认估计；可先运行 --calibrate）"
+        print(f"\n合并计划 {self.output_name}：{len(self.video_files)} 个片段{note}")
+        for e in self.estimates:
+            name = e.strategy + (f"/{e.encode_preset}" if e.encode_preset else "")
+            mark = "*" if e is self.chosen else " "
+            if e.correct:
+                print(f" {mark} {name:<20} 约 {e.wall_time/60:7.2f}分钟  "
+                      f"输出约 {e.output_size/1024/1024:9.1f} MB")
+            else:
+                print(f"   {name:<20} 不可用：{e.reason}")
+        print(f"选定策略: {self.strategy}" + (f"（预设 {self.encode_preset}，{self.encoder}）"
+                                          if self.strategy != 'copy' else ""))
+
+
+class MergePlanner:
+    def __init__(self, calibration: Optional[HostCalibration] = None, calibrate: bool = False):
+        """根据探测结果和本机校准数据估计各合并策略的耗时和输出大小
+
+        规划本身只读取已保存的校准数据，没有数据时使用默认估计；校准由
+        HostCalibration.calibrate（批量命令行 ``--calibrate``）显式进行。
+
+        Args:
+            calibration (HostCalibration, optional): 校准数据，默认使用缓存目录中的数据
+            calibrate (bool): 缺少校准数据时是否在规划时先测量（试编码并写入约64MB测速文件）
+        """
+        self.calibration = calibration or HostCalibration()
+        self.calibrate = calibrate
+
+    def plan(self, output_name: str, video_files: List[str],
+             media_info: Dict[str, Optional[MediaInfo]], output_dir: str = '.',
+             encode_preset: str = 'faster', crf: int = 23, use_hw_accel: bool = True,
+             force_encode: bool = False, deadline: Optional[float] = None,
+             junction_offenders: Optional[List[str]] = None,
+             encode_processes: int = 1) -> MergePlan:
+        """为一组片段生成合并计划
+
+        选择规则：在结果正确的策略中选估计耗时最短的一个（copy < selective < encode 通常如此）。
+        必须编码时默认使用 ``encode_preset``；给出 ``deadline`` 时改为选择估计耗时不超过
+        期限的质量最高的预设。
+
+        Args:
+            output_name (str): 输出文件名
+            video_files (List[str]): 片段文件名，与media_info的值一一对应
+            media_info (Dict[str, Optional[MediaInfo]]): 探测结果
+            output_dir (str): 输出目录（用于磁盘吞吐量）
+            encode_preset (str): 默认编码预设
+            crf (int): 视频质量参数
+            use_hw_accel (bool): 是否允许硬件编码器
+            force_encode (bool): 只考虑全部重编码
+            deadline (float, optional): 期望的最长耗时（秒）
+            junction_offenders (List[str], optional): 拼接点预检发现的异常片段，拷贝拼接不再视为正确，
+                                                      选择性规范化时与不兼容片段一起重编码
+            encode_processes (int): 全部重编码时并行运行的FFmpeg进程数，与 merge_videos 的同名参数一致
+
+        Returns:
+            MergePlan: 合并计划
+        """
+        cal = self.calibration
+        if self.calibrate and not cal.calibrated:
+            cal.calibrate_encoders()
+        disk = cal.disk(output_dir, measure=self.calibrate)
+        infos = list(media_info.values())
+        # 容器混用时合并前先把非MP4片段转封装（读写各一遍），兼容性按转封装后的结果判断
+        remux_targets = set(plan_remux(media_info))
+        prep_time = 2 * sum(media_info[path].size for path in remux_targets) / disk
+        if remux_targets:
+            timescale = target_timescale(media_info)
+            infos = [remuxed_info(info, timescale) if path in remux_targets else info
+                     for path, info in media_info.items()]
+        # 合并默认先修复音视频时间戳不一致的片段：视频拷贝（读写各一遍），部分片段还要转码音频
+        for info in infos:
+            fix = analyze_timestamps(info) if info is not None else None
+            if fix is not None:
+                prep_time += 2 * info.size / disk
+                if fix.kind == 'audio':
+                    prep_time += info.duration / AUDIO_TRANSCODE_SPEED
+        names = dict(zip(video_files, infos))
+        report = build_report(names)
+        hw = cal.registry.best('h264') if use_hw_accel else None
+        hw = hw if hw is not None and hw.hardware else None
+
+        total_size = sum(info.size for info in infos if info)
+        total_duration = sum(info.duration for info in infos if info)
+        bytes_per_second = total_size / total_duration if total_duration > 0 else 0.0
+        copy_time = 2 * total_size / disk + prep_time  # 读取一遍并写出一遍
+
+        def encode_time(files: List[str], preset: str, encoder: Optional[EncoderCapability] = None,
+                        processes: int = 1) -> float:
+            return cal.encode_time((names.get(name) for name in files), preset, encoder, processes)
+
+        estimates = []
+        unknown = report.unknown
+        offenders = [f for f in (junction_offenders or []) if f in names]
+        outliers = report.outliers + [f for f in offenders if f not in report.outliers]
+        if unknown:
+            reason = f"{len(unknown)} 个片段无法探测"
+            estimates.append(StrategyEstimate('copy', None, 0.0, 0, False, reason))
+            estimates.append(StrategyEstimate('selective', None, 0.0, 0, False, reason))
+        else:
+            reason = ''
+            if not report.compatible:
+                reason = f"流参数不一致（{len(report.classes)} 个兼容类）"
+            elif offenders:
+                reason = f"{len(offenders)} 个片段的拼接点时间戳异常"
+            estimates.append(StrategyEstimate(
+                'copy', None, copy_time, total_size, not reason and not force_encode, reason))
+            estimates.append(self._estimate_selective(report, names, encode_preset, encode_time,
+                                                      copy_time, force_encode, offenders))
+
+        # 并行分组编码先写出各分组，再拷贝拼接（读写各一遍）
+        parallel = encode_processes > 1 and len(video_files) > 1
+        write_time = (3 if parallel else 1) * total_size / disk
+        for preset in PRESETS:
+            seconds = encode_time(video_files, preset, hw, encode_processes) + write_time
+            estimates.append(StrategyEstimate(
+                'encode', preset, seconds, int(total_duration * bytes_per_second), not unknown,
+                f"{len(unknown)} 个片段无法探测" if unknown else ''))
+
+        # 选择：在正确的copy/selective和选定预设的encode中取估计耗时最短的
+        preset = encode_preset
+        encode_estimates = {e.encode_preset: e for e in estimates if e.strategy == 'encode'}
+        if deadline is not None:
+            fitting = [p for p in PRESETS if encode_estimates[p].wall_time <= deadline]
+            preset = fitting[-1] if fitting else PRESETS[0]
+        candidates = [e for e in estimates if e.correct and e.strategy != 'encode']
+        candidates.append(encode_estimates[preset])
+        chosen = min(candidates, key=lambda e: e.wall_time)
+        selective = chosen.strategy == 'selective'
+        return MergePlan(output_name, list(video_files), chosen.strategy, preset, crf,
+                         hw is not None, hw.encoder if hw else 'libx264',
+                         outliers if selective else [], estimates, cal.calibrated,
+                         bool(offenders) and selective, encode_processes)
+
+    @staticmethod
+    def _estimate_selective(report: CompatibilityReport, names: Dict[str, Optional[MediaInfo]],
+                            preset: str, encode_time, copy_time: float, force_encode: bool,
+                            offenders: Sequence[str] = ()) -> StrategyEstimate:
+        """估计只重编码少数片段的成本（规范化使用libx264，不使用硬件编码器）
+
+        拼接点异常的片段（offenders）即使流参数兼容也要完整重编码。
+        """
+        if force_encode:
+            return StrategyEstimate('selective', preset, 0.0, 0, False, "已要求全部重编码")
+        if report.compatible and not offenders:
+            return StrategyEstimate('selective', preset, 0.0, 0, False, "所有片段已兼容，无需规范化")
+        if report.majority is None:
+            return StrategyEstimate('selective', preset, 0.0, 0, False, "没有多数兼容类")
+        target = report.majority.fingerprint
+        audio_only = set(report.audio_only_outliers) - set(offenders)
+        outliers = report.outliers + [f for f in offenders if f not in report.outliers]
+        video_outliers = [f for f in outliers if f not in audio_only]
+        if ((video_outliers and video_encode_args(target) is None)
+                or audio_encode_args(target) is None):
+            return StrategyEstimate('selective', preset, 0.0, 0, False,
+                                    f"多数格式没有可用的编码器（{target.describe()}）")
+
+        majority_files = report.majority.files
+        majority_size = sum(names[f].size for f in majority_files)
+        majority_duration = sum(names[f].duration for f in majority_files)
+        rate = majority_size / majority_duration if majority_duration > 0 else 0.0
+        outlier_duration = sum(names[f].duration for f in outliers)
+        # 只有音频不同的片段直接拷贝视频，音频转码远快于实时
+        audio_time = sum(names[f].duration for f in audio_only) / AUDIO_TRANSCODE_SPEED
+        seconds = encode_time(video_outliers, preset) + audio_time + copy_time
+        return StrategyEstimate('selective', preset, seconds,
+                                int(majority_size + outlier_duration * rate), True)
@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import List, Dict, Optional, Tuple, Iterable
+from myproject.media_probe import MediaInfo, MEDIA_INFO_VERSION
+
+# 文件身份：(绝对路径, 大小, 修改时间ns, inode)
+FileIdentity = Tuple[str, int, int, int]
+
+
+def default_cache_dir() -> str:
+    """返回本项目的缓存目录（遵循XDG_CACHE_HOME）"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'myproject')
+
+
+def file_identity(path: str) -> Optional[FileIdentity]:
+    """获取文件身份，文件不存在时返回None"""
+    abs_path = os.path.abspath(path)
+    try:
+        st = os.stat(abs_path)
+    except OSError:
+        return None
+    return abs_path, st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def sampled_hash(path: str, sample_size: int = 64 * 1024) -> str:
+    """计算文件的抽样内容哈希
+
+    只读取文件头、中、尾各 ``sample_size`` 字节并混入文件大小，
+    对于数GB的视频也只需几次随机读。
+
+    Args:
+        path (str): 文件路径
+        sample_size (int): 每个抽样块的字节数
+
+    Returns:
+        str: 十六进制哈希值
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, 'rb') as f:
+        if size <= sample_size * 3:
+            digest.update(f.read())
+        else:
+            for offset in (0, size // 2, size - sample_size):
+                f.seek(offset)
+                digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+
+class ProbeCache:
+    SCHEMA_VERSION = MEDIA_INFO_VERSION
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = 50000,
+                 max_bytes: int = 64 * 1024 * 1024, hash_content: bool = False):
+        """初始化基于SQLite的探测结果缓存
+
+        缓存以 (绝对路径, 大小, 修改时间, inode) 作为文件身份，任一项变化即视为失效。
+
+        Args:
+            db_path (str, optional): 数据库文件路径，默认为 ~/.cache/myproject/probe_cache.sqlite3
+            max_entries (int): 最大缓存条目数，超出后按最近最少使用淘汰
+            max_bytes (int): 缓存数据总字节数上限，超出后按最近最少使用淘汰
+            hash_content (bool): 是否额外校验抽样内容哈希（适用于修改时间不可靠的文件系统）
+        """
+        self.db_path = db_path or os.path.join(default_cache_dir(), 'probe_cache.sqlite3')
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hash_content = hash_content
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """延迟打开数据库连接并创建表结构"""
+        if self._conn is None:
+            if self.db_path != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version != self.SCHEMA_VERSION:
+                # 结构版本变化时直接丢弃旧缓存
+                conn.execute('DROP TABLE IF EXISTS probes')
+                conn.execute(f'PRAGMA user_version={self.SCHEMA_VERSION}')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS probes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    content_hash TEXT,
+                    info TEXT NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_probes_last_access ON probes(last_access)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get(self, path: str) -> Optional[MediaInfo]:
+        """查询单个文件的缓存结果"""
+        return self.get_many([path]).get(path)
+
+    def get_many(self, paths: Iterable[str]) -> Dict[str, MediaInfo]:
+        """批量查询缓存
+
+        Args:
+            paths (Iterable[str]): 文件路径列表
+
+        Returns:
+            Dict[str, MediaInfo]: 命中的 路径 -> 媒体信息（键为调用方传入的路径）
+        """
+        identities = {}
+        for path in paths:
+            identity = file_identity(path)
+            if identity is not None:
+                identities[identity[0]] = (path, identity)
+        if not identities:
+            return {}
+
+        rows = []
+        with self._lock:
+            conn = self._connect()
+            keys = list(identities)
+            # SQLite默认最多999个绑定参数，分批查询
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows.extend(conn.execute(
+                    f'SELECT path, size, mtime_ns, inode, content_hash, info FROM probes '
+                    f'WHERE path IN ({placeholders})', chunk).fetchall())
+
+        hits: Dict[str, MediaInfo] = {}
+        stale: List[str] = []
+        for abs_path, size, mtime_ns, inode, content_hash, info in rows:
+            path, identity = identities[abs_path]
+            if identity != (abs_path, size, mtime_ns, inode):
+                stale.append(abs_path)
+                continue
+            if self.hash_content and content_hash and content_hash != sampled_hash(abs_path):
+                stale.append(abs_path)
+                continue
+            hits[path] = MediaInfo.from_dict(json.loads(info))._replace(path=path)
+
+        with self._lock:
+            conn = self._connect()
+            if stale:
+                conn.executemany('DELETE FROM probes WHERE path = ?', [(p,) for p in stale])
+            if hits:
+                now = time.time()
+                conn.executemany('UPDATE probes SET last_access = ? WHERE path = ?',
+                                 [(now, os.path.abspath(p)) for p in hits])
+            conn.commit()
+        return hits
+
+    def get_directory(self, directory: str) -> Dict[str, MediaInfo]:
+        """批量查询某个目录下所有已缓存的文件
+
+        Args:
+            directory (str): 目录路径
+
+        Returns:
+            Dict[str, MediaInfo]: 绝对路径 -> 媒体信息，仅包含仍然有效的条目
+        """
+        prefix = os.path.join(os.path.abspath(directory), '')
+        with self._lock:
+            conn = self._connect()
+            paths = [row[0] for row in conn.execute(
+                'SELECT path FROM probes WHERE substr(path, 1, ?) = ?', (len(prefix), prefix))]
+        return self.get_many(paths)
+
+    def put(self, path: str, info: MediaInfo):
+        """写入单个文件的探测结果"""
+        self.put_many({path: info})
+
+    def put_many(self, results: Dict[str, MediaInfo]):
+        """批量写入探测结果，并按需淘汰旧条目
+
+        Args:
+            results (Dict[str, MediaInfo]): 路径 -> 媒体信息
+        """
+        now = time.time()
+        rows = []
+        for path, info in results.items():
+            if info is None:
+                continue
+            identity = file_identity(path)
+            if identity is None:
+                continue
+            content_hash = sampled_hash(identity[0]) if self.hash_content else None
+            rows.append(identity + (content_hash, json.dumps(info.to_dict()), now))
+        if not rows:
+            return
+
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                'INSERT OR REPLACE INTO probes '
+                '(path, size, mtime_ns, inode, content_hash, info, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            self._evict(conn)
+            conn.commit()
+
+    def invalidate(self, path: str):
+        """删除单个文件的缓存"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute('DELETE FROM probes WHERE path = ?', (os.path.abspath(path),))
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        """按最近最少使用淘汰超出条目数或容量上限的条目"""
+        count, total = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(length(info)), 0) FROM probes').fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        excess = max(count - self.max_entries, 0)
+        if excess:
+            conn.execute('DELETE FROM probes WHERE path IN '
+                         '(SELECT path FROM probes ORDER BY last_access ASC LIMIT ?)', (excess,))
+            total = conn.execute('SELECT COALESCE(SUM(length(info)), 0) FROM probes').fetchone()[0]
+
+        if total > self.max_bytes:
+            # 从最旧的条目开始删除，直到总量回到上限以内
+            to_free = total - self.max_bytes
+            victims = []
+            for path, length in conn.execute(
+                    'SELECT path, length(info) FROM probes ORDER BY last_access ASC'):
+                victims.append((path,))
+                to_free -= length
+                if to_free <= 0:
+                    break
+            conn.executemany('DELETE FROM probes WHERE path = ?', victims)
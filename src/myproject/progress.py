@@ -0,0 +1,182 @@
+import time
+import threading
+import subprocess
+from collections import deque
+from typing import List, Dict, Optional, NamedTuple, Callable, Iterable
+
+
+class ProgressEvent(NamedTuple):
+    """FFmpeg进度事件（对应 -progress 输出中的一个块）"""
+    job: str
+    out_time: float
+    speed: Optional[float]
+    fps: Optional[float]
+    bitrate: Optional[float]
+    total_size: int
+    elapsed: float
+    percent: Optional[float]
+    eta: Optional[float]
+    throughput: float
+    finished: bool
+
+
+ProgressCallback = Callable[[ProgressEvent], None]
+
+
+def _parse_number(value: str, suffix: str = '') -> Optional[float]:
+    """解析形如 '1.5x'、'1234.5kbits/s' 的数值，N/A 返回None"""
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class ProgressParser:
+    def __init__(self, job: str = '', expected_duration: float = 0.0):
+        """把 ``-progress`` 输出的 key=value 行解析为 ProgressEvent
+
+        Args:
+            job (str): 任务名称，随事件一起传递，便于区分并发任务
+            expected_duration (float): 预计输出时长（秒），用于计算百分比和剩余时间
+        """
+        self.job = job
+        self.expected_duration = expected_duration
+        self.started = time.monotonic()
+        self._fields: Dict[str, str] = {}
+
+    def feed(self, line: str) -> Optional[ProgressEvent]:
+        """输入一行，遇到块结束（progress=...）时返回事件"""
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            return None
+        if key != 'progress':
+            self._fields[key] = value
+            return None
+
+        fields, self._fields = self._fields, {}
+        return self._build_event(fields, finished=(value == 'end'))
+
+    def _build_event(self, fields: Dict[str, str], finished: bool) -> ProgressEvent:
+        elapsed = time.monotonic() - self.started
+        # out_time_ms 实际单位也是微秒，优先使用 out_time_us
+        out_us = _parse_number(fields.get('out_time_us', fields.get('out_time_ms', '')))
+        out_time = max(out_us / 1000000, 0.0) if out_us is not None else 0.0
+        total_size = int(_parse_number(fields.get('total_size', '')) or 0)
+
+        percent = eta = None
+        if self.expected_duration > 0:
+            percent = min(out_time / self.expected_duration * 100, 100.0)
+            if out_time > 0 and elapsed > 0:
+                # 以实测处理速率估算剩余时间，比FFmpeg报告的瞬时速度更平稳
+                rate = out_time / elapsed
+                eta = max(self.expected_duration - out_time, 0.0) / rate
+        if finished:
+            percent, eta = (100.0 if self.expected_duration > 0 else None), 0.0
+
+        return ProgressEvent(
+            job=self.job,
+            out_time=out_time,
+            speed=_parse_number(fields.get('speed', ''), 'x'),
+            fps=_parse_number(fields.get('fps', '')),
+            bitrate=_parse_number(fields.get('bitrate', ''), 'kbits/s'),
+            total_size=total_size,
+            elapsed=elapsed,
+            percent=percent,
+            eta=eta,
+            throughput=total_size / elapsed if elapsed > 0 else 0.0,
+            finished=finished,
+        )
+
+
+class FFmpegResult(NamedTuple):
+    """FFmpeg运行结果"""
+    returncode: int
+    stderr_tail: List[str]
+
+
+def with_progress_output(cmd: List[str]) -> List[str]:
+    """在输出文件之前插入把进度写到标准输出的参数"""
+    if '-progress' in cmd:
+        return list(cmd)
+    return cmd[:-1] + ['-progress', 'pipe:1', '-nostats'] + cmd[-1:]
+
+
+def run_ffmpeg(cmd: List[str], job: str = '', expected_duration: float = 0.0,
+               callbacks: Iterable[ProgressCallback] = (), stderr_lines: int = 50) -> FFmpegResult:
+    """运行FFmpeg，把进度解析为事件并分发给回调
+
+    进度信息通过专用的标准输出管道传递（``-progress pipe:1``），日志走标准错误，
+    两者分别由阻塞读取的线程处理，不会空转占用CPU。
+
+    Args:
+        cmd (List[str]): FFmpeg命令，最后一个参数为输出文件
+        job (str): 任务名称
+        expected_duration (float): 预计输出时长（秒）
+        callbacks (Iterable[ProgressCallback]): 进度回调
+        stderr_lines (int): 保留的标准错误末尾行数
+
+    Returns:
+        FFmpegResult: 退出码和标准错误末尾若干行
+    """
+    callbacks = list(callbacks)
+    parser = ProgressParser(job, expected_duration)
+    tail = deque(maxlen=stderr_lines)
+
+    process = subprocess.Popen(
+        with_progress_output(cmd),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        errors='replace',
+    )
+
+    def drain_stderr():
+        for line in process.stderr:
+            line = line.rstrip()
+            if line:
+                tail.append(line)
+
+    stderr_thread = threading.Thread(target=drain_stderr, daemon=True)
+    stderr_thread.start()
+
+    for line in process.stdout:
+        event = parser.feed(line)
+        if event is None:
+            continue
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"进度回调出错: {str(e)}")
+
+    returncode = process.wait()
+    stderr_thread.join()
+    return FFmpegResult(returncode, list(tail))
+
+
+class ConsoleProgressPrinter:
+    def __init__(self, prefix_job: bool = False):
+        """在终端打印进度的默认回调
+
+        Args:
+            prefix_job (bool): 是否在进度前显示任务名称（并发任务时使用）
+        """
+        self.prefix_job = prefix_job
+        self._lock = threading.Lock()
+
+    def __call__(self, event: ProgressEvent):
+        prefix = f"[{event.job}] " if self.prefix_job and event.job else ""
+        if event.percent is not None:
+            line = f"\r{prefix}合并进度: {event.percent:.1f}% ({event.out_time/60:.1f}分钟)"
+        else:
+            line = f"\r{prefix}合并进度: {event.out_time/60:.1f}分钟"
+        if event.speed is not None:
+            line += f" 速度: {event.speed:.2f}x"
+        if event.eta is not None and not event.finished:
+            line += f" 剩余: {event.eta/60:.1f}分钟"
+        with self._lock:
+            print(line, end='\n' if event.finished or self.prefix_job else '', flush=True)
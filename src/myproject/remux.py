@@ -0,0 +1,141 @@
+import os
+import time
+import subprocess
+import concurrent.futures
+from collections import Counter
+from typing import List, Dict, Optional
+from myproject.media_probe import MediaInfo
+from myproject.normalizer import track_timescale
+
+# 可以直接拷贝进MP4容器的编码
+MP4_VIDEO_CODECS = ('h264', 'hevc', 'mpeg4', 'av1', 'vp9')
+MP4_AUDIO_CODECS = ('aac', 'mp3', 'ac3', 'eac3', 'opus', 'alac')
+
+
+def is_mp4(info: MediaInfo) -> bool:
+    """文件是否为MP4/MOV容器（ffprobe报告为 mov,mp4,m4a,...）"""
+    return 'mp4' in info.format_name.split(',')
+
+
+def can_remux(info: MediaInfo) -> bool:
+    """文件的音视频流是否都可以不重编码直接放进MP4容器"""
+    video, audio = info.video, info.audio
+    return (video is not None and video.codec_name in MP4_VIDEO_CODECS
+            and (audio is None or audio.codec_name in MP4_AUDIO_CODECS))
+
+
+def plan_remux(infos: Dict[str, Optional[MediaInfo]]) -> List[str]:
+    """容器混用时返回需要转封装为MP4的文件（非MP4容器的文件），容器一致时返回空列表
+
+    拷贝拼接时concat按第一个文件确定流参数，MKV/AVI/TS中的H.264（Annex-B或不同的extradata）
+    和ADTS封装的AAC与MP4片段混在一起时经常失败；容器一致时则不需要处理。
+    """
+    known = {path: info for path, info in infos.items() if info is not None}
+    mp4 = [path for path, info in known.items() if is_mp4(info)]
+    if not mp4 or len(mp4) == len(known):
+        return []
+    return [path for path, info in known.items() if not is_mp4(info)]
+
+
+def target_timescale(infos: Dict[str, Optional[MediaInfo]]) -> Optional[str]:
+    """MP4片段中最常见的视频轨道时间刻度，转封装后的片段使用同样的刻度以便直接拼接"""
+    counts = Counter(info.video.time_base for info in infos.values()
+                     if info is not None and is_mp4(info) and info.video is not None
+                     and info.video.time_base)
+    if not counts:
+        return None
+    return track_timescale(counts.most_common(1)[0][0])
+
+
+def remuxed_info(info: MediaInfo, timescale: Optional[str]) -> MediaInfo:
+    """预测转封装后的探测结果：容器变为MP4，视频时间基变为给定的轨道时间刻度，其余不变"""
+    streams = tuple(
+        stream._replace(time_base=f"1/{timescale}")
+        if timescale and stream.codec_type == 'video' else stream
+        for stream in info.streams)
+    return info._replace(format_name='mov,mp4,m4a,3gp,3g2,mj2', streams=streams)
+
+
+def build_remux_command(src: str, dst: str, info: MediaInfo,
+                        timescale: Optional[str] = None) -> List[str]:
+    """构建不重编码、把片段转封装为MP4的FFmpeg命令
+
+    MP4封装器会把Annex-B格式的H.264/HEVC转为MP4格式；ADTS头的AAC需要 aac_adtstoasc。
+    时间戳从0开始（AVI等缺少时间戳时重新生成），与其他片段拼接时不会出现间隙。
+
+    Args:
+        src (str): 源文件路径
+        dst (str): 输出MP4路径
+        info (MediaInfo): 源文件的探测结果
+        timescale (str, optional): 视频轨道时间刻度，与其他MP4片段一致
+    """
+    cmd = [
+        'ffmpeg', '-y', '-nostdin',
+        '-v', 'error',
+        '-fflags', '+genpts',
+        '-i', src,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-c', 'copy',
+    ]
+    if info.audio is not None and info.audio.codec_name == 'aac':
+        cmd.extend(['-bsf:a', 'aac_adtstoasc'])
+    if timescale:
+        cmd.extend(['-video_track_timescale', timescale])
+    cmd.extend(['-avoid_negative_ts', 'make_zero', dst])
+    return cmd
+
+
+class ContainerRemuxer:
+    def __init__(self, work_dir: str, max_jobs: int = 4):
+        """把非MP4容器的片段并行转封装为MP4，音视频流直接拷贝
+
+        转封装只读写一遍文件、不解码，速度接近磁盘读写速度。
+
+        Args:
+            work_dir (str): 存放转封装片段的工作目录
+            max_jobs (int): 同时运行的FFmpeg进程数
+        """
+        self.work_dir = work_dir
+        self.max_jobs = max(1, max_jobs)
+        # 最近一次remux中各片段的耗时
+        self.timings: Dict[str, float] = {}
+
+    def _remux_one(self, index: int, src: str, info: MediaInfo,
+                   timescale: Optional[str]) -> Optional[str]:
+        stem = os.path.splitext(os.path.basename(src))[0]
+        dst = os.path.join(self.work_dir, f"{index:05d}_{stem}.mp4")
+        if not can_remux(info):
+            print(f"无法转封装 {os.path.basename(src)}：编码不能直接放进MP4容器")
+            return None
+
+        start = time.perf_counter()
+        result = subprocess.run(build_remux_command(src, dst, info, timescale),
+                                capture_output=True, text=True)
+        self.timings[src] = time.perf_counter() - start
+        if result.returncode != 0 or not os.path.exists(dst):
+            print(f"转封装失败 {os.path.basename(src)}，错误码: {result.returncode}")
+            print(f"错误信息: {result.stderr.strip()}")
+            return None
+        return dst
+
+    def remux(self, clips: Dict[str, MediaInfo],
+              timescale: Optional[str] = None) -> Dict[str, Optional[str]]:
+        """并行转封装多个片段
+
+        Args:
+            clips (Dict[str, MediaInfo]): 片段路径 -> 探测结果
+            timescale (str, optional): 视频轨道时间刻度
+
+        Returns:
+            Dict[str, Optional[str]]: 原路径 -> 转封装后的路径，失败为None
+        """
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.timings = {}
+        print(f"\n使用 {self.max_jobs} 个FFmpeg进程转封装 {len(clips)} 个片段为MP4...")
+        results: Dict[str, Optional[str]] = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_jobs) as executor:
+            futures = {executor.submit(self._remux_one, i, path, info, timescale): path
+                       for i, (path, info) in enumerate(clips.items())}
+            for future in concurrent.futures.as_completed(futures):
+                results[futures[future]] = future.result()
+        return results
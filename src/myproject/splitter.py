@@ -0,0 +1,141 @@
+import os
+import math
+import bisect
+import subprocess
+from typing import List, Optional, NamedTuple
+from myproject.media_probe import MediaProbe
+from myproject.layout import movflags
+
+
+class SplitPart(NamedTuple):
+    """分割得到的一个部分"""
+    path: str
+    start: float
+    duration: float
+
+
+def plan_split_points(keyframes: List[float], total_duration: float, total_size: int = 0,
+                      max_duration: Optional[float] = None,
+                      max_size: Optional[int] = None) -> List[float]:
+    """根据最大时长/最大体积计算对齐到关键帧的分割点
+
+    从前往后逐个确定分割点：把剩余部分按上限所需的最小部分数均分，理想分割点吸附到最近的关键帧；
+    吸附后超过上限时改用上限内最后一个关键帧，直到剩余部分不超过上限。只有两个关键帧之间的
+    间隔本身超过上限时，该部分才会超过上限。
+
+    Args:
+        keyframes (List[float]): 升序关键帧时间
+        total_duration (float): 总时长（秒）
+        total_size (int): 总字节数
+        max_duration (float, optional): 每部分最大时长（秒）
+        max_size (int, optional): 每部分最大字节数（按平均码率估算）
+
+    Returns:
+        List[float]: 分割点（不含0和结尾），不需要分割时为空列表
+    """
+    if total_duration <= 0:
+        return []
+    limit = max_duration or total_duration
+    if max_size and total_size:
+        # 按平均码率把体积上限换算为时长上限
+        limit = min(limit, total_duration * max_size / total_size)
+    if total_duration <= limit:
+        return []
+
+    candidates = [k for k in keyframes if 0 < k < total_duration]
+    points = []
+    previous = 0.0
+    while total_duration - previous > limit:
+        remaining = total_duration - previous
+        ideal = previous + remaining / math.ceil(remaining / limit)
+        if not candidates:
+            point = ideal
+        else:
+            i = bisect.bisect_left(candidates, ideal)
+            nearby = [c for c in candidates[max(0, i - 1):i + 1] if c > previous]
+            point = min(nearby, key=lambda c: abs(c - ideal)) if nearby else None
+            if point is None or point - previous > limit:
+                # 上限内最后一个关键帧；上限内没有关键帧时只能用之后的第一个
+                j = bisect.bisect_right(candidates, previous + limit) - 1
+                if j >= 0 and candidates[j] > previous:
+                    point = candidates[j]
+                else:
+                    k = bisect.bisect_right(candidates, previous)
+                    if k >= len(candidates):
+                        break
+                    point = candidates[k]
+        points.append(point)
+        previous = point
+    return points
+
+
+class VideoSplitter:
+    def __init__(self, media_probe: Optional[MediaProbe] = None):
+        """一次读取即可把视频按关键帧切成任意数量部分的分割器
+
+        Args:
+            media_probe (MediaProbe, optional): 用于获取时长和关键帧索引的探测器
+        """
+        self.media_probe = media_probe or MediaProbe()
+
+    def split(self, video_path: str, output_prefix: str, max_duration: Optional[float] = None,
+              max_size: Optional[int] = None, layout: str = 'faststart') -> List[SplitPart]:
+        """按最大时长或最大体积分割视频
+
+        使用FFmpeg的segment复用器一次性输出所有部分，输入只读取一遍，
+        分割点预先吸附到关键帧，保证直接拷贝时切点准确。
+
+        Args:
+            video_path (str): 待分割的视频
+            output_prefix (str): 输出路径前缀，部分文件命名为 {prefix}_part1.mp4、_part2.mp4 ...
+            max_duration (float, optional): 每部分最大时长（秒）
+            max_size (int, optional): 每部分最大字节数
+            layout (str): 各部分的MP4布局（见 myproject.layout）
+
+        Returns:
+            List[SplitPart]: 各部分及其实际时长，无需分割或失败时返回空列表
+        """
+        info = self.media_probe.probe(video_path)
+        if info is None:
+            return []
+        total_size = info.size or os.path.getsize(video_path)
+        points = plan_split_points(self.media_probe.keyframes(video_path), info.duration,
+                                   total_size, max_duration, max_size)
+        if not points:
+            return []
+
+        # 关键帧时间以6位小数输出，减去1毫秒避免舍入误差导致切到下一个关键帧
+        segment_times = ','.join(f"{max(point - 0.001, 0):.6f}" for point in points)
+        cmd = [
+            'ffmpeg',
+            '-y',
+            '-v', 'error',
+            '-i', video_path,
+            '-map', '0',
+            '-c', 'copy',
+            '-f', 'segment',
+            '-segment_times', segment_times,
+            '-segment_start_number', '1',
+            '-reset_timestamps', '1',
+            '-segment_format', 'mp4',
+        ]
+        flags = movflags(layout)
+        if flags:
+            cmd += ['-segment_format_options', f'movflags={flags}']
+        cmd.append(f"{output_prefix}_part%d.mp4")
+        print(f"\n正在一次性分割为 {len(points) + 1} 个部分...")
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"分割失败，FFmpeg返回错误码: {result.returncode}")
+            print(f"错误信息: {result.stderr.strip()}")
+            return []
+
+        parts = []
+        start = 0.0
+        for i in range(1, len(points) + 2):
+            path = f"{output_prefix}_part{i}.mp4"
+            part_info = self.media_probe.probe(path) if os.path.exists(path) else None
+            duration = part_info.duration if part_info else 0.0
+            parts.append(SplitPart(path, start, duration))
+            start += duration
+        return parts
@@ -0,0 +1,148 @@
+import os
+import time
+import subprocess
+import concurrent.futures
+from typing import List, Dict, Optional, NamedTuple, Tuple
+from myproject.media_probe import MediaInfo
+from myproject.compatibility import fingerprint
+from myproject.normalizer import audio_encode_args, track_timescale
+
+
+class TimestampFix(NamedTuple):
+    """单个片段的时间戳问题和修复方式"""
+    kind: str                # 'shift'：只需流拷贝并把时间戳平移到0；'audio'：视频拷贝，音频补齐/裁剪后重编码
+    start_offset: float      # 音频开始时间 - 视频开始时间（秒，正数为音频晚于视频）
+    end_offset: float        # 音频结束时间 - 视频结束时间（流时长未知时为0）
+    start_time: float        # 最早的流开始时间（负数通常来自编辑列表）
+
+    def describe(self) -> str:
+        if self.kind == 'shift':
+            return f"开始时间为负（{self.start_time:.3f}秒），平移时间戳"
+        order = '晚' if self.start_offset >= 0 else '早'
+        return (f"音频比视频{order}开始 {abs(self.start_offset):.3f}秒，"
+                f"结束相差 {self.end_offset:+.3f}秒，补齐/裁剪音频")
+
+
+def analyze_timestamps(info: MediaInfo, tolerance: float = 0.1) -> Optional[TimestampFix]:
+    """比较片段各路流第一个和最后一个时间戳，判断是否需要修复
+
+    - 音频开始或结束时间与视频相差超过 tolerance：拼接后这段差值会累积为音画不同步，
+      需要把音频补静音或裁剪到与视频相同的时间范围（只重编码音频）
+    - 音视频对齐但开始时间为负（编辑列表）：流拷贝并把时间戳平移到0即可
+
+    Args:
+        info (MediaInfo): 片段的探测结果
+        tolerance (float): 允许的偏差（秒），AAC编码器延迟等几十毫秒的偏差不处理
+
+    Returns:
+        Optional[TimestampFix]: 需要修复时返回修复方式，否则返回None
+    """
+    video, audio = info.video, info.audio
+    if video is None:
+        return None
+    if audio is None:
+        if video.start_time < -tolerance:
+            return TimestampFix('shift', 0.0, 0.0, video.start_time)
+        return None
+
+    start_offset = audio.start_time - video.start_time
+    end_offset = 0.0
+    if audio.duration > 0 and video.duration > 0:
+        end_offset = (audio.start_time + audio.duration) - (video.start_time + video.duration)
+    start_time = min(video.start_time, audio.start_time)
+    if abs(start_offset) > tolerance or abs(end_offset) > tolerance:
+        return TimestampFix('audio', round(start_offset, 6), round(end_offset, 6), start_time)
+    if start_time < -tolerance:
+        return TimestampFix('shift', round(start_offset, 6), round(end_offset, 6), start_time)
+    return None
+
+
+def build_fix_command(src: str, dst: str, info: MediaInfo,
+                      fix: TimestampFix) -> Optional[List[str]]:
+    """构建修复片段时间戳的FFmpeg命令，视频流总是直接拷贝
+
+    音频修复使用 aresample 的 first_pts 在开头补静音或裁掉多余部分，使音频从视频的第一帧开始，
+    再用 apad/atrim 补齐或裁剪到视频结束；音频按片段原有的编码参数重编码，修复后的片段
+    与修复前属于同一兼容类。
+
+    Returns:
+        Optional[List[str]]: FFmpeg命令，音频编码没有可用编码器时返回None
+    """
+    video, audio = info.video, info.audio
+    cmd = [
+        'ffmpeg', '-y', '-nostdin',
+        '-v', 'error',
+        '-i', src,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-c:v', 'copy',
+    ]
+    if fix.kind == 'audio':
+        audio_args = audio_encode_args(fingerprint(info))
+        if audio_args is None:
+            return None
+        # FFmpeg输出时间戳会减去输入中最早的开始时间
+        video_start = video.start_time - fix.start_time
+        video_end = video_start + (video.duration if video.duration > 0 else info.duration)
+        first_pts = round(video_start * audio.sample_rate)
+        cmd.extend(['-af',
+                    f"aresample=async=1:first_pts={first_pts},apad,atrim=end={video_end:.6f}"])
+        cmd.extend(audio_args)
+    else:
+        cmd.extend(['-c:a', 'copy'])
+    timescale = track_timescale(video.time_base)
+    if timescale:
+        cmd.extend(['-video_track_timescale', timescale])
+    cmd.extend(['-avoid_negative_ts', 'make_zero', dst])
+    return cmd
+
+
+class TimestampRepairer:
+    def __init__(self, work_dir: str, max_jobs: int = 4):
+        """并行修复片段的时间戳，视频流直接拷贝，速度接近转封装
+
+        Args:
+            work_dir (str): 存放修复后片段的工作目录
+            max_jobs (int): 同时运行的FFmpeg进程数
+        """
+        self.work_dir = work_dir
+        self.max_jobs = max(1, max_jobs)
+        # 最近一次repair中各片段的耗时
+        self.timings: Dict[str, float] = {}
+
+    def _repair_one(self, index: int, src: str, info: MediaInfo,
+                    fix: TimestampFix) -> Optional[str]:
+        stem = os.path.splitext(os.path.basename(src))[0]
+        dst = os.path.join(self.work_dir, f"{index:05d}_{stem}.mp4")
+        cmd = build_fix_command(src, dst, info, fix)
+        if cmd is None:
+            print(f"无法修复 {os.path.basename(src)} 的时间戳：音频编码没有可用的编码器")
+            return None
+
+        start = time.perf_counter()
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        self.timings[src] = time.perf_counter() - start
+        if result.returncode != 0 or not os.path.exists(dst):
+            print(f"时间戳修复失败 {os.path.basename(src)}，错误码: {result.returncode}")
+            print(f"错误信息: {result.stderr.strip()}")
+            return None
+        print(f"已修复时间戳: {os.path.basename(src)}（{fix.describe()}）")
+        return dst
+
+    def repair(self, clips: Dict[str, Tuple[MediaInfo, TimestampFix]]) -> Dict[str, Optional[str]]:
+        """并行修复多个片段
+
+        Args:
+            clips (Dict[str, Tuple[MediaInfo, TimestampFix]]): 片段路径 -> (探测结果, 修复方式)
+
+        Returns:
+            Dict[str, Optional[str]]: 原路径 -> 修复后的路径，失败为None
+        """
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.timings = {}
+        results: Dict[str, Optional[str]] = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_jobs) as executor:
+            futures = {executor.submit(self._repair_one, i, path, info, fix): path
+                       for i, (path, (info, fix)) in enumerate(clips.items())}
+            for future in concurrent.futures.as_completed(futures):
+                results[futures[future]] = future.result()
+        return results
@@ -0,0 +1,222 @@
+import os
+import time
+import subprocess
+import concurrent.futures
+from typing import List, Dict, Optional, NamedTuple, Sequence, Tuple
+from myproject.media_probe import MediaInfo
+from myproject.compatibility import fingerprint
+from myproject.normalizer import build_encode_command
+
+# 自动识别片头/片尾的方式
+TRIM_DETECT_MODES = ('auto', 'intro', 'outro')
+
+# 裁剪后短于该时长（秒）的片段部分直接丢弃
+MIN_SEGMENT = 0.05
+# 裁剪点与关键帧相差不超过该值（秒）时视为就在关键帧上
+KEYFRAME_TOLERANCE = 0.001
+
+
+class TrimSpec(NamedTuple):
+    """单个片段的裁剪方式（秒）"""
+    head: float = 0.0                          # 去掉开头的时长（片头）
+    tail: float = 0.0                          # 去掉结尾的时长（片尾）
+    cut: Optional[Tuple[float, float]] = None  # 去掉中间的一段（如冷开场之后的片头）
+
+    @property
+    def empty(self) -> bool:
+        return self.head <= 0 and self.tail <= 0 and not self.cut
+
+    def segments(self, duration: float) -> List[Tuple[float, float]]:
+        """返回裁剪后保留的时间段 [(开始, 结束), ...]"""
+        start = max(0.0, self.head)
+        end = duration - max(0.0, self.tail)
+        if end - start < MIN_SEGMENT:
+            return []
+        if not self.cut:
+            return [(start, end)]
+        cut_start, cut_end = max(self.cut[0], start), min(self.cut[1], end)
+        if cut_end <= cut_start:
+            return [(start, end)]
+        return [(s, e) for s, e in ((start, cut_start), (cut_end, end)) if e - s >= MIN_SEGMENT]
+
+    def describe(self) -> str:
+        parts = []
+        if self.head > 0:
+            parts.append(f"去掉开头 {self.head:.2f}秒")
+        if self.cut:
+            parts.append(f"去掉 {self.cut[0]:.2f}-{self.cut[1]:.2f}秒")
+        if self.tail > 0:
+            parts.append(f"去掉结尾 {self.tail:.2f}秒")
+        return '，'.join(parts) or "不裁剪"
+
+
+class ConcatEntry(NamedTuple):
+    """concat列表中的一项：整个文件，或用 inpoint/outpoint 截取的一段"""
+    path: str
+    inpoint: Optional[float] = None
+    outpoint: Optional[float] = None
+    encode: bool = False  # 帧精确裁剪时需要重编码的开头不完整GOP（inpoint到下一个关键帧）
+
+    @property
+    def duration(self) -> Optional[float]:
+        """截取的时长，没有outpoint时未知"""
+        if self.outpoint is None:
+            return None
+        return self.outpoint - (self.inpoint or 0.0)
+
+
+def snap_to_keyframe(t: float, keyframes: Sequence[float], before: Optional[float] = None) -> float:
+    """返回离 t 最近的关键帧（只考虑早于 before 的关键帧），没有关键帧时返回 t"""
+    candidates = [k for k in keyframes if before is None or k < before]
+    if not candidates:
+        return t
+    return min(candidates, key=lambda k: abs(k - t))
+
+
+def next_keyframe(t: float, keyframes: Sequence[float]) -> Optional[float]:
+    """返回不早于 t 的第一个关键帧"""
+    return next((k for k in keyframes if k >= t - KEYFRAME_TOLERANCE), None)
+
+
+def plan_entries(path: str, spec: TrimSpec, duration: float, keyframes: Sequence[float],
+                 accurate: bool = False) -> List[ConcatEntry]:
+    """把片段的裁剪方式转换为concat列表项，不重编码
+
+    拷贝模式下concat解复用器只能从关键帧开始输出完整的画面，因此每段保留内容的起点对齐到
+    最近的关键帧（可能多保留或多裁掉不到一个GOP）；结束点不需要关键帧，按原值截取。
+    accurate 为 True 时起点不对齐，而是把起点到下一个关键帧之间的不完整GOP标记为需要重编码，
+    其余部分仍从关键帧开始直接拷贝。
+
+    Args:
+        path (str): 片段路径
+        spec (TrimSpec): 裁剪方式
+        duration (float): 片段时长
+        keyframes (Sequence[float]): 片段的关键帧时间（升序）
+        accurate (bool): 是否帧精确裁剪
+
+    Returns:
+        List[ConcatEntry]: 按顺序排列的列表项
+    """
+    entries = []
+    for start, end in spec.segments(duration):
+        if start <= 0:
+            entries.append(ConcatEntry(path, None, end))
+        elif not accurate:
+            entries.append(ConcatEntry(path, snap_to_keyframe(start, keyframes, before=end), end))
+        else:
+            keyframe = next_keyframe(start, keyframes)
+            if keyframe is None or keyframe >= end - MIN_SEGMENT:
+                entries.append(ConcatEntry(path, start, end, encode=True))
+                continue
+            if keyframe - start > KEYFRAME_TOLERANCE:
+                entries.append(ConcatEntry(path, start, keyframe, encode=True))
+            entries.append(ConcatEntry(path, keyframe, end))
+    return entries
+
+
+def concat_list(entries: Sequence[ConcatEntry]) -> str:
+    """生成带 inpoint/outpoint 的concat列表内容"""
+    lines = ["ffconcat version 1.0"]
+    for entry in entries:
+        # 使用绝对路径，单引号需要转义
+        quoted = os.path.abspath(entry.path).replace("'", "'\\''")
+        lines.append(f"file '{quoted}'")
+        if entry.inpoint is not None:
+            lines.append(f"inpoint {entry.inpoint:.6f}")
+        if entry.outpoint is not None:
+            lines.append(f"outpoint {entry.outpoint:.6f}")
+    return '\n'.join(lines) + '\n'
+
+
+def build_gop_command(entry: ConcatEntry, dst: str, info: MediaInfo, threads: int = 2,
+                      encode_preset: str = 'faster', crf: int = 23) -> Optional[List[str]]:
+    """构建把 inpoint 到下一个关键帧之间的部分按片段原有参数重编码的FFmpeg命令
+
+    输入端定位（-ss 在 -i 之前）在重编码时是帧精确的；输出与片段属于同一兼容类，并沿用片段的
+    H.264 level 和参考帧数，可以和片段其余直接拷贝的部分拼接。
+
+    Returns:
+        Optional[List[str]]: FFmpeg命令，片段的编码没有可用编码器时返回None
+    """
+    input_args = ['-ss', f"{entry.inpoint:.6f}", '-t', f"{entry.duration:.6f}", '-i', entry.path]
+    return build_encode_command(input_args, dst, fingerprint(info), threads, encode_preset, crf,
+                                reference=info.video)
+
+
+class GopEncoder:
+    def __init__(self, work_dir: str, max_jobs: int = 2, threads_per_job: int = 2,
+                 encode_preset: str = 'faster', crf: int = 23):
+        """帧精确裁剪：并行重编码各段开头的不完整GOP，每段只有零点几秒到几秒
+
+        Args:
+            work_dir (str): 存放重编码结果的工作目录
+            max_jobs (int): 同时运行的FFmpeg进程数
+            threads_per_job (int): 每个FFmpeg进程的线程数
+            encode_preset (str): FFmpeg编码速度预设
+            crf (int): 视频质量参数
+        """
+        self.work_dir = work_dir
+        self.max_jobs = max(1, max_jobs)
+        self.threads_per_job = max(1, threads_per_job)
+        self.encode_preset = encode_preset
+        self.crf = crf
+        # 最近一次encode的总耗时
+        self.encode_time = 0.0
+
+    def _encode_one(self, index: int, entry: ConcatEntry, info: MediaInfo) -> Optional[str]:
+        name = os.path.splitext(os.path.basename(entry.path))[0]
+        dst = os.path.join(self.work_dir, f"{index:05d}_{name}_gop.mp4")
+        cmd = build_gop_command(entry, dst, info, self.threads_per_job, self.encode_preset,
+                                self.crf)
+        if cmd is None:
+            print(f"无法帧精确裁剪 {os.path.basename(entry.path)}：没有可用的编码器")
+            return None
+
+        start = time.perf_counter()
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        self.encode_time += time.perf_counter() - start
+        if result.returncode != 0 or not os.path.exists(dst):
+            print(f"重编码 {os.path.basename(entry.path)} 开头的GOP失败，错误码: {result.returncode}")
+            print(f"错误信息: {result.stderr.strip()}")
+            return None
+        return dst
+
+    def encode(self, entries: Sequence[ConcatEntry], media_info: Dict[str, MediaInfo],
+               keyframes: Dict[str, Sequence[float]]) -> List[ConcatEntry]:
+        """重编码标记为 encode 的列表项，替换为重编码后的文件
+
+        重编码失败时该项改为从下一个关键帧开始直接拷贝（去掉不完整的GOP）；outpoint 之前
+        没有关键帧时去掉该项。不能保留原 inpoint：拷贝时concat会从它之前的关键帧开始输出，
+        本应裁掉的内容又会出现。
+
+        Args:
+            entries (Sequence[ConcatEntry]): plan_entries 生成的列表项
+            media_info (Dict[str, MediaInfo]): 片段路径 -> 探测结果
+            keyframes (Dict[str, Sequence[float]]): 片段路径 -> 关键帧时间（升序）
+
+        Returns:
+            List[ConcatEntry]: 不再包含需要重编码的列表项
+        """
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.encode_time = 0.0
+        jobs = [(i, entry, media_info.get(entry.path))
+                for i, entry in enumerate(entries) if entry.encode]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_jobs) as executor:
+            results = executor.map(lambda args: self._encode_one(*args) if args[2] else None, jobs)
+            encoded = dict(zip([i for i, _, _ in jobs], results))
+
+        results = []
+        for i, entry in enumerate(entries):
+            if not entry.encode:
+                results.append(entry)
+            elif encoded.get(i):
+                results.append(ConcatEntry(encoded[i]))
+            else:
+                # 不完整GOP之后紧接着的拷贝部分正是从下一个关键帧开始，此时下面的条件不成立，该项被去掉
+                keyframe = next_keyframe(entry.inpoint, keyframes.get(entry.path, ()))
+                if keyframe is not None and entry.outpoint - keyframe >= MIN_SEGMENT:
+                    results.append(ConcatEntry(entry.path, keyframe, entry.outpoint))
+                else:
+                    name = os.path.basename(entry.path)
+                    print(f"{name} 的 {entry.inpoint:.2f}-{entry.outpoint:.2f}秒在一个GOP内且无法重编码，已去掉")
+        return results
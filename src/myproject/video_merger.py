@@ -1,23 +1,118 @@
 import os
 import re
-import subprocess
+import math
+import time
+import shutil
+import tempfile
 import concurrent.futures
-import platform
-from typing import List, Tuple, Dict, Optional
+from collections import Counter
+from typing import Any, List, Tuple, Dict, NamedTuple, Optional
+from myproject.media_probe import MediaProbe, MediaInfo, StreamInfo
+from myproject.probe_cache import ProbeCache
+from myproject.compatibility import (CompatibilityReport, Fingerprint, build_report, fingerprint,
+                                     fingerprint_diff)
+from myproject.normalizer import (ClipNormalizer, build_encode_command, h264_target,
+                                  matches_reference)
+from myproject.remux import ContainerRemuxer, plan_remux, target_timescale
+from myproject.junctions import JunctionCheck, JunctionValidator, offending_clips
+from myproject.timestamps import TimestampRepairer, analyze_timestamps
+from myproject.trim import (TRIM_DETECT_MODES, ConcatEntry, GopEncoder, TrimSpec, concat_list,
+                            plan_entries)
+from myproject.intro import IntroDetector
+from myproject.partition import partition_contiguous
+from myproject.splitter import VideoSplitter, SplitPart
+from myproject.progress import ConsoleProgressPrinter, ProgressCallback, run_ffmpeg
+from myproject.metrics import JobMetrics, MergeResult
+from myproject.encoders import EncoderCapability, default_registry
+from myproject.manifest import MergeManifest, ClipRecord, manifest_path
+from myproject.journal import JobJournal, journal_path, job_key
+from myproject.planner import MergePlan, MergePlanner, HostCalibration
 from myproject.subtitle_generator import SubtitleGenerator
+from myproject.discovery import VIDEO_EXTENSIONS, discover_videos, natural_key
+from myproject.layout import layout_args, movflags, rewrite_factor
+
+# 文件数量超过该值时不再逐个打印文件信息，只输出汇总
+FILE_LIST_PRINT_LIMIT = 50
+# 影响输出的合并选项，变化后任务日志中的中间结果不再可用
+JOURNAL_OPTIONS = ('force_encode', 'auto_split', 'encode_preset', 'use_hw_accel', 'crf',
+                   'simple_mode', 'normalize_mode', 'encode_processes', 'split_max_duration',
+                   'split_max_size', 'split_from_sources', 'keep_full', 'incremental',
+                   'validate_junctions', 'repair_timestamps', 'trim', 'trim_accurate')
+
+
+class MergeOptions(NamedTuple):
+    """merge_videos 的合并选项（含义见 merge_videos），在内部各合并步骤之间整体传递"""
+    force_encode: bool = False
+    auto_split: bool = True
+    generate_subtitles: bool = False
+    encode_preset: str = 'faster'
+    use_hw_accel: bool = True
+    crf: int = 23
+    simple_mode: bool = False
+    normalize_mode: str = 'selective'
+    encode_processes: int = 1
+    split_max_duration: Optional[float] = 7200
+    split_max_size: Optional[int] = None
+    split_from_sources: bool = False
+    keep_full: bool = True
+    incremental: bool = False
+    resume: bool = True
+    tree_threshold: Optional[int] = 1000
+    tree_batch_size: int = 200
+    validate_junctions: bool = False
+    repair_timestamps: bool = True
+    trim: Any = None
+    trim_accurate: bool = False
+
 
 class VideoMerger:
-    def __init__(self, input_dir=".", output_dir=".", max_workers=None):
+    def __init__(self, input_dir=".", output_dir=".", max_workers=None, probe_cache=True,
+                 show_progress=True, encoder_registry=None, cpu_threads=None, recursive=False,
+                 include=None, exclude=None, output_layout='faststart',
+                 intermediate_layout='fragmented'):
         """初始化视频合并器
         
         Args:
             input_dir (str): 输入视频文件夹路径
             output_dir (str): 输出合并视频的文件夹路径
             max_workers (int, optional): 并行处理的最大工作线程数，默认为None（使用系统CPU核心数）
+            probe_cache (bool|str|ProbeCache): 持久化探测缓存。True使用默认缓存位置，
+                                               字符串为数据库路径，False/None禁用缓存
+            show_progress (bool): 是否在终端打印合并进度；也可通过add_progress_callback注册自定义回调
+            encoder_registry (EncoderRegistry, optional): 编码器能力表，默认使用按主机持久化的共享能力表
+            cpu_threads (int, optional): 本任务的编码线程总预算（规范化和并行分组编码在其中分配），
+                                         默认为系统CPU核心数；批量调度时用于限制单个任务
+            recursive (bool): 是否同时扫描输入目录的子目录（跳过隐藏目录），片段按相对路径自然排序
+            include (List[str], optional): 只合并匹配这些通配符的文件（匹配相对路径或文件名）
+            exclude (List[str], optional): 排除匹配这些通配符的文件
+            output_layout (str): 最终输出的MP4布局：faststart（默认，moov前置，需要把整个文件重写一遍）、
+                                 fragmented（分片MP4）或 plain（moov在末尾，不重写）
+            intermediate_layout (str): 只由本工具再次读取的中间文件（将被分割的合并结果、完整版、
+                                       分层合并的中间文件）的布局，默认fragmented，避免faststart重写
         """
         self.input_dir = input_dir
         self.output_dir = output_dir
         self.max_workers = max_workers or min(os.cpu_count() or 4, 8)  # 限制最大线程数为8
+        self.cpu_threads = cpu_threads or os.cpu_count() or 4
+        self.recursive = recursive
+        self.include = list(include) if include else None
+        self.exclude = list(exclude) if exclude else None
+        movflags(output_layout)
+        movflags(intermediate_layout)
+        self.output_layout = output_layout
+        self.intermediate_layout = intermediate_layout
+        if probe_cache is True:
+            probe_cache = ProbeCache()
+        elif isinstance(probe_cache, str):
+            probe_cache = ProbeCache(probe_cache)
+        self.media_probe = MediaProbe(cache=probe_cache or None)
+        self.progress_callbacks: List[ProgressCallback] = []
+        if show_progress:
+            self.progress_callbacks.append(ConsoleProgressPrinter())
+        self.encoder_registry = encoder_registry or default_registry()
+        self.metrics = JobMetrics()
+        self._outputs: List[str] = []
+        self._journal: Optional[JobJournal] = None
         os.makedirs(output_dir, exist_ok=True)
     
     def natural_sort_key(self, s):
@@ -26,32 +121,46 @@ class VideoMerger:
         将字符串中的数字部分转换为整数，以实现自然排序
         例如：video1.mp4 < video2.mp4 < video10.mp4
         """
-        return [int(text) if text.isdigit() else text.lower()
-                for text in re.split('([0-9]+)', s)]
+        return natural_key(s)
     
-    def get_video_files(self, extensions=('.mp4', '.avi', '.mkv', '.mov'), exclude_output=None):
+    def get_video_files(self, extensions=VIDEO_EXTENSIONS, exclude_output=None):
         """获取指定目录下的所有视频文件
-        
+
+        使用 os.scandir 流式扫描，排序键在扫描时一次计算好；recursive/include/exclude
+        见构造函数。大目录扫描时间较长时按间隔打印进度摘要，而不是逐个列出文件。
+
         Args:
             extensions (tuple): 支持的视频文件扩展名
             exclude_output (str, optional): 要排除的输出文件名（不包含扩展名）
             
         Returns:
-            list: 排序后的视频文件列表
+            list: 排序后的视频文件列表（相对于输入目录的路径）
         """
-        # 构建排除列表
-        exclude_files = []
+        # 构建排除规则：输出文件本身、临时文件、完整版和各分割部分
+        exclude_pattern = None
         if exclude_output:
-            for ext in extensions:
-                exclude_files.append(f"{exclude_output}{ext}")
-                exclude_files.append(f"{exclude_output}_temp{ext}")
-                
-        video_files = [
-            f for f in os.listdir(self.input_dir)
-            if f.lower().endswith(extensions) and (not exclude_output or f not in exclude_files)
-        ]
-        # 使用自然排序算法对文件名进行排序
-        return sorted(video_files, key=self.natural_sort_key)
+            exclude_pattern = re.compile(
+                re.escape(exclude_output) + r'(_temp|_full|_part\d+)?'
+                + '(' + '|'.join(re.escape(ext) for ext in extensions) + ')$')
+
+        return discover_videos(self.input_dir, extensions, recursive=self.recursive,
+                               include=self.include, exclude=self.exclude,
+                               exclude_pattern=exclude_pattern, show_progress=True)
+
+    def get_media_info(self, video_files: List[str]) -> Dict[str, Optional[MediaInfo]]:
+        """一次性探测所有视频文件的媒体信息
+
+        每个文件只运行一次ffprobe，结果在同一个合并器实例内复用，
+        check_video_info、check_codecs_compatibility 等方法都基于该结果。
+
+        Args:
+            video_files (List[str]): 视频文件列表（相对于输入目录）
+
+        Returns:
+            Dict[str, Optional[MediaInfo]]: 完整路径到媒体信息的映射，顺序与输入一致
+        """
+        full_paths = [os.path.join(self.input_dir, video) for video in video_files]
+        return self.media_probe.probe_many(full_paths)
 
     def get_video_duration(self, video_path: str) -> float:
         """获取视频时长
@@ -62,38 +171,12 @@ class VideoMerger:
         Returns:
             float: 视频时长（秒）
         """
-        cmd = [
-            'ffprobe',
-            '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            video_path
-        ]
-        try:
-            # 不使用check=True，以便我们可以自己处理错误
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"获取视频时长失败：ffprobe返回错误码 {result.returncode}")
-                print(f"错误信息: {result.stderr.strip()}")
-                # 检查文件是否存在
-                if not os.path.exists(video_path):
-                    print(f"文件不存在: {video_path}")
-                elif os.path.getsize(video_path) == 0:
-                    print(f"文件大小为0: {video_path}")
-                return 0.0
-            
-            duration_str = result.stdout.strip()
-            if not duration_str or duration_str == 'N/A':
-                print(f"无法获取视频时长，ffprobe返回: {duration_str}")
-                return 0.0
-                
-            return float(duration_str)
-        except ValueError as e:
-            print(f"解析视频时长失败：{str(e)}，ffprobe返回: {result.stdout.strip()}")
-            return 0.0
-        except Exception as e:
-            print(f"获取视频时长时发生未知错误：{str(e)}")
+        info = self.media_probe.probe(video_path)
+        if info is None:
             return 0.0
+        if info.duration <= 0:
+            print(f"无法获取视频时长: {os.path.basename(video_path)}")
+        return info.duration
 
     def check_video_info(self, video_files: List[str]) -> List[Tuple[str, float]]:
         """并行检查所有视频文件的信息
@@ -104,36 +187,33 @@ class VideoMerger:
         Returns:
             List[Tuple[str, float]]: 包含视频文件路径和时长的列表
         """
+        print("\n并行检查视频文件信息...")
+
+        # 结果已按原始顺序排列
+        media_info = self.get_media_info(video_files)
+        engine = self.media_probe.engine
+        if engine.last_peak_concurrency:
+            print(f"探测峰值并发数: {engine.last_peak_concurrency}，"
+                  f"收敛并发数: {engine.last_final_concurrency}")
+
+        # 文件很多时不逐个打印，只输出汇总和前几个失败的文件
+        verbose = len(media_info) <= FILE_LIST_PRINT_LIMIT
         video_info = []
         total_duration = 0
+        failed = 0
+        for path, info in media_info.items():
+            duration = info.duration if info else 0.0
+            if info is None:
+                failed += 1
+                if verbose or failed <= FILE_LIST_PRINT_LIMIT // 5:
+                    print(f"{os.path.basename(path)}: 处理失败")
+            elif verbose:
+                print(f"{os.path.basename(path)}: {duration/60:.2f}分钟")
+            total_duration += duration
+            video_info.append((path, duration))
 
-        print("\n并行检查视频文件信息...")
-        print(f"使用 {self.max_workers} 个工作线程")
-        
-        # 创建完整路径列表
-        full_paths = [os.path.join(self.input_dir, video) for video in video_files]
-        
-        # 使用线程池并行获取视频时长
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # 提交所有任务并获取future对象
-            future_to_video = {executor.submit(self.get_video_duration, path): (path, os.path.basename(path)) 
-                              for path in full_paths}
-            
-            # 处理完成的任务
-            for future in concurrent.futures.as_completed(future_to_video):
-                path, video_name = future_to_video[future]
-                try:
-                    duration = future.result()
-                    total_duration += duration
-                    video_info.append((path, duration))
-                    print(f"{video_name}: {duration/60:.2f}分钟")
-                except Exception as e:
-                    print(f"{video_name}: 处理失败 - {str(e)}")
-                    video_info.append((path, 0.0))
-        
-        # 按原始顺序排序结果
-        video_info.sort(key=lambda x: full_paths.index(x[0]))
-        
+        if not verbose:
+            print(f"共{len(video_info)}个视频文件，{failed}个处理失败")
         print(f"\n所有视频总时长: {total_duration/60:.2f}分钟")
         return video_info
     
@@ -142,7 +222,7 @@ class VideoMerger:
         
         Args:
             video_files (list): 要合并的视频文件列表
-            list_file (str): 生成的列表文件名
+            list_file (str): 生成的列表文件名（相对于输入目录），也可以是绝对路径
             
         Returns:
             str: 列表文件的路径
@@ -150,8 +230,9 @@ class VideoMerger:
         list_path = os.path.join(self.input_dir, list_file)
         with open(list_path, 'w', encoding='utf-8') as f:
             for video in video_files:
-                # 使用完整路径，避免空格等特殊字符问题
-                full_path = os.path.join(self.input_dir, video)
+                # 使用绝对路径，避免空格等特殊字符和列表文件位置的问题；单引号需要转义
+                full_path = os.path.abspath(os.path.join(self.input_dir, video))
+                full_path = full_path.replace("'", "'\\''")
                 f.write(f"file '{full_path}'\n")
         return list_path
     
@@ -164,135 +245,61 @@ class VideoMerger:
         Returns:
             Tuple[str, str]: (视频编码格式, 音频编码格式)
         """
-        # 检查文件是否存在和有效
-        if not os.path.exists(video_path):
-            print(f"文件不存在: {video_path}")
+        info = self.media_probe.probe(video_path)
+        if info is None:
             return '', ''
-        elif os.path.getsize(video_path) == 0:
-            print(f"文件大小为0: {video_path}")
-            return '', ''
-        elif os.path.getsize(video_path) < 1024:  # 小于1KB的文件可能不是有效视频
-            print(f"文件过小，可能不是有效视频: {video_path} ({os.path.getsize(video_path)} 字节)")
-            return '', ''
-            
-        # 获取视频编码
-        cmd = [
-            'ffprobe',
-            '-v', 'error',
-            '-select_streams', 'v:0',
-            '-show_entries', 'stream=codec_name',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            video_path
-        ]
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"获取视频编码失败: {os.path.basename(video_path)}，错误码: {result.returncode}")
-                print(f"错误信息: {result.stderr.strip()}")
-                return '', ''
-                
-            video_codec = result.stdout.strip()
-            if not video_codec or video_codec == 'N/A':
-                print(f"无法获取视频编码: {os.path.basename(video_path)}，ffprobe返回: '{video_codec}'")
-                return '', ''
-            
-            # 获取音频编码
-            cmd[4] = 'a:0'
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"获取音频编码失败: {os.path.basename(video_path)}，错误码: {result.returncode}")
-                print(f"错误信息: {result.stderr.strip()}")
-                return video_codec, ''
-                
-            audio_codec = result.stdout.strip()
-            if not audio_codec or audio_codec == 'N/A':
-                print(f"无法获取音频编码或视频没有音轨: {os.path.basename(video_path)}")
-                audio_codec = ''
-            
-            print(f"检测到编码: {os.path.basename(video_path)} - 视频: {video_codec}, 音频: {audio_codec or '无音轨'}")
-            return video_codec, audio_codec
-        except ValueError as e:
-            print(f"解析编码信息时发生错误: {os.path.basename(video_path)}, {str(e)}")
-            return '', ''
-        except subprocess.SubprocessError as e:
-            print(f"执行ffprobe命令失败: {os.path.basename(video_path)}, {str(e)}")
-            return '', ''
-        except Exception as e:
-            print(f"获取编码信息时发生未知错误: {os.path.basename(video_path)}, {str(e)}")
+        if not info.video_codec:
+            print(f"无法获取视频编码: {os.path.basename(video_path)}")
             return '', ''
+        if not info.audio_codec:
+            print(f"无法获取音频编码或视频没有音轨: {os.path.basename(video_path)}")
+        return info.video_codec, info.audio_codec
+
+    def get_compatibility_report(self, video_files: List[str]) -> CompatibilityReport:
+        """按完整流参数（编码、profile、分辨率、像素格式、SAR、帧率、时间基、
+        采样率、声道）将视频分成兼容类
+
+        Args:
+            video_files (List[str]): 视频文件列表
+
+        Returns:
+            CompatibilityReport: 兼容性报告，键为video_files中的文件名
+        """
+        media_info = self.get_media_info(video_files)
+        return build_report(dict(zip(video_files, media_info.values())))
 
     def check_codecs_compatibility(self, video_files: List[str]) -> bool:
-        """并行检查所有视频的编码格式是否兼容
+        """检查所有视频的流参数是否完全兼容，可以直接拷贝拼接
 
         Args:
             video_files (List[str]): 视频文件列表
 
         Returns:
-            bool: 如果所有视频编码格式相同返回True，否则返回False
+            bool: 如果所有视频属于同一个兼容类返回True，否则返回False
         """
         if not video_files:
             print("没有视频文件，无法检查编码兼容性")
             return False
             
-        print("\n并行检查视频编码兼容性...")
+        print("\n检查视频编码兼容性...")
         print(f"共有 {len(video_files)} 个视频文件需要检查")
-        print(f"使用 {self.max_workers} 个工作线程")
-        
-        # 获取第一个视频的编码作为基准
-        first_video = os.path.join(self.input_dir, video_files[0])
-        base_video_codec, base_audio_codec = self.get_video_codec(first_video)
-        
-        if not base_video_codec:
-            print(f"无法获取基准视频的编码信息: {video_files[0]}")
-            return False
-            
-        print(f"基准编码格式 - 视频: {base_video_codec}, 音频: {base_audio_codec or '无音轨'}")
-        
-        # 如果只有一个视频文件，直接返回兼容
-        if len(video_files) == 1:
-            return True
-        
-        # 并行检查其余视频的编码
-        incompatible_videos = []
-        remaining_videos = video_files[1:]
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # 创建视频路径和名称的映射
-            video_paths = {os.path.join(self.input_dir, video): video for video in remaining_videos}
-            
-            # 提交所有任务
-            future_to_video = {executor.submit(self.get_video_codec, path): (path, name) 
-                              for path, name in video_paths.items()}
-            
-            # 处理完成的任务
-            for future in concurrent.futures.as_completed(future_to_video):
-                path, video_name = future_to_video[future]
-                try:
-                    video_codec, audio_codec = future.result()
-                    
-                    if not video_codec:
-                        print(f"警告: 无法获取视频编码 {video_name}，将视为不兼容")
-                        incompatible_videos.append((video_name, '未知', '未知'))
-                        continue
-                    
-                    if video_codec != base_video_codec or audio_codec != base_audio_codec:
-                        incompatible_videos.append((video_name, video_codec, audio_codec))
-                        
-                except Exception as e:
-                    print(f"检查编码失败 {video_name}: {str(e)}")
-                    incompatible_videos.append((video_name, '未知', '未知'))
-        
-        if incompatible_videos:
-            print("\n检测到编码不兼容的视频:")
-            for video, v_codec, a_codec in incompatible_videos:
-                print(f"  - {video}: 视频编码={v_codec}, 音频编码={a_codec or '无音轨'}")
-            print("\n由于编码不兼容，将使用重编码模式合并视频（速度较慢但兼容性更好）")
+
+        # 复用check_video_info已经得到的探测结果，不会重复调用ffprobe
+        report = self.get_compatibility_report(video_files)
+        report.print_summary()
+
+        if not report.compatible:
+            if report.video_compatible:
+                print("\n视频流参数一致，只有音频不同，将直接拷贝视频、只转码音频")
+            else:
+                print("\n由于流参数不兼容，将使用重编码模式合并视频（速度较慢但兼容性更好）")
             return False
         
-        print("\n所有视频编码格式兼容，将使用快速合并模式（直接拷贝，速度更快）")
+        print("\n所有视频流参数兼容，将使用快速合并模式（直接拷贝，速度更快）")
         return True
 
-    def split_videos_by_duration(self, video_info: List[Tuple[str, float]], target_duration: float) -> Tuple[List[str], List[str]]:
+    def split_videos_by_duration(self, video_info: List[Tuple[str, float]],
+                                 target_duration: float) -> Tuple[List[str], List[str]]:
         """根据目标时长将视频文件分成两组
 
         Args:
@@ -338,14 +345,71 @@ class VideoMerger:
         )
         return generator.generate_subtitle(video_path, output_format)
 
-    def merge_videos(self, output_name, video_files=None, force_encode=False, auto_split=True, generate_subtitles=False, encode_preset='faster', use_hw_accel=True, crf=23, simple_mode=False):
+    def plan(self, output_name: str, video_files: Optional[List[str]] = None,
+             encode_preset: str = 'faster', crf: int = 23, use_hw_accel: bool = True,
+             force_encode: bool = False, deadline: Optional[float] = None,
+             planner: Optional[MergePlanner] = None, validate_junctions: bool = False,
+             encode_processes: int = 1) -> MergePlan:
+        """估计各合并策略的耗时和输出大小，选出结果正确且最快的策略，不执行合并
+
+        Args:
+            output_name (str): 输出文件名（不包含扩展名）
+            video_files (List[str], optional): 指定要合并的视频文件列表
+            encode_preset (str): 需要编码时使用的预设
+            crf (int): 视频质量参数
+            use_hw_accel (bool): 是否允许硬件编码器
+            force_encode (bool): 只考虑全部重编码
+            deadline (float, optional): 期望的最长耗时（秒），给出时选择能在期限内完成的质量最高的预设
+            planner (MergePlanner, optional): 自定义规划器（如使用其他校准数据）
+            validate_junctions (bool): 先预检所有拼接点，拼接点异常的片段计入需要规范化的片段，
+                                       执行计划时合并前会再次预检并修复
+            encode_processes (int): 全部重编码时并行运行的FFmpeg进程数，计入估计并写入计划
+
+        Returns:
+            MergePlan: 可序列化的合并计划，用 execute_plan 执行
+        """
+        if video_files is None:
+            video_files = self.get_video_files(exclude_output=output_name)
+        offenders = None
+        if validate_junctions and not force_encode:
+            names = {os.path.join(self.input_dir, video): video for video in video_files}
+            checks = self.validate_junctions(video_files)
+            offenders = [names[path] for path in offending_clips(checks)]
+        planner = planner or MergePlanner(HostCalibration(registry=self.encoder_registry))
+        return planner.plan(output_name, video_files, self.get_media_info(video_files),
+                            self.output_dir, encode_preset, crf, use_hw_accel, force_encode,
+                            deadline, offenders, encode_processes)
+
+    def execute_plan(self, plan: MergePlan, **kwargs) -> MergeResult:
+        """按合并计划执行合并
+
+        Args:
+            plan (MergePlan): plan() 生成（或从JSON读取）的合并计划
+            **kwargs: merge_videos 的其他参数（如分割、字幕选项），计划中的策略参数优先
+
+        Returns:
+            MergeResult: 合并结果
+        """
+        options = dict(kwargs)
+        options.update(plan.merge_options())
+        return self.merge_videos(plan.output_name, **options)
+
+    def merge_videos(self, output_name, video_files=None, force_encode=False, auto_split=True,
+                     generate_subtitles=False, encode_preset='faster', use_hw_accel=True, crf=23,
+                     simple_mode=False, normalize_mode='selective', encode_processes=1,
+                     split_max_duration=7200, split_max_size=None, split_from_sources=False,
+                     keep_full=True, metrics_jsonl=None, metrics_prometheus=None, incremental=False,
+                     resume=True, tree_threshold=1000, tree_batch_size=200,
+                     validate_junctions=False, repair_timestamps=True, trim=None,
+                     trim_accurate=False):
         """合并视频文件
         
         Args:
             output_name (str): 输出文件名（不包含扩展名）
             video_files (list, optional): 指定要合并的视频文件列表
-            force_encode (bool): 是否强制重新编码以确保时间同步
-            auto_split (bool): 当视频总时长超过120分钟时是否自动分割
+            force_encode (bool): 是否强制重新编码全部片段；音画同步问题通常由 repair_timestamps 以接近
+                                 转封装的速度修复，不需要全部重编码
+            auto_split (bool): 当视频超过分割上限时是否自动分割
             generate_subtitles (bool): 是否为合并后的视频生成字幕
             encode_preset (str): FFmpeg编码速度预设，可选值：
                                  ultrafast (最快，质量最低)
@@ -360,357 +424,1480 @@ class VideoMerger:
             use_hw_accel (bool): 是否使用硬件加速（如果可用）
             crf (int): 视频质量参数，范围0-51，值越小质量越高，默认23
             simple_mode (bool): 简单模式，跳过编码检查直接使用copy模式，速度最快但可能不适用于所有视频
+            normalize_mode (str): 流参数不兼容时的处理方式：
+                                  selective (默认，只把少数不兼容片段重编码为多数格式，再直接拷贝拼接)
+                                  full (重编码全部片段)
+            encode_processes (int): 必须重编码时并行运行的FFmpeg进程数，大于1时把片段按时长
+                                    均衡分组，各组独立编码后再直接拷贝拼接
+            split_max_duration (float): 自动分割时每部分的最大时长（秒），默认7200（120分钟）
+            split_max_size (int, optional): 自动分割时每部分的最大字节数
+            split_from_sources (bool): 在片段边界上选择分割点，直接由源片段并行合并出各部分，
+                                       不再先写出完整的中间文件
+            keep_full (bool): split_from_sources时是否额外拼接出完整版
+            metrics_jsonl (str, optional): 把本次任务的分阶段指标追加写入该JSON Lines文件
+            metrics_prometheus (str, optional): 把本次任务的指标写为Prometheus textfile
+            incremental (bool): 增量模式。根据输出旁的清单判断当前片段列表是否为上次合并的
+                                严格扩展，是则只把新增片段直接拷贝追加到上次的合并结果之后；
+                                清单缺失、片段变化或新片段流参数不兼容时回退为完整合并
+            resume (bool): 使用输出目录中的任务日志，上次运行中断时复用已完成阶段的产物
+                           （合并结果、完整版、分割部分、字幕等），从第一个未完成的阶段继续
+            tree_threshold (int, optional): 片段数超过该值时使用分层合并：先把每 tree_batch_size 个
+                                            片段并行拷贝拼接为中间文件，再逐层拼接中间文件；
+                                            每批可单独重试和续跑。None表示总是单次合并
+            tree_batch_size (int): 分层合并时每批的片段数
+            validate_junctions (bool): 拷贝拼接前预检每个拼接点（各读取前后几秒，并行检查时间戳跳变和
+                                       音画偏移），只把拼接点异常的片段重编码为多数格式后再拼接
+            repair_timestamps (bool): 拷贝拼接前比较每个片段各路流的开始和结束时间，音频晚于/早于视频
+                                      或开始时间为负的片段先修复：视频直接拷贝，只平移时间戳或
+                                      补齐/裁剪并重编码音频
+            trim (optional): 裁剪各片段的片头/片尾，在concat列表中用 inpoint/outpoint 截取，不重编码：
+                             TrimSpec (所有片段使用相同的固定时长)
+                             Dict[str, TrimSpec] (按视频文件分别指定)
+                             'auto'/'intro'/'outro' (通过音频指纹识别重复出现的片头和/或片尾)
+                             拷贝模式下每段保留内容的起点对齐到最近的关键帧
+            trim_accurate (bool): 帧精确裁剪，起点不对齐关键帧，只重编码起点所在的不完整GOP
             
         Returns:
-            bool: 合并是否成功
+            MergeResult: 合并结果，包含生成的文件、采用的策略和分阶段指标；
+                         其布尔值表示合并是否成功
         """
-        # 清理可能存在的旧文件
+        self.metrics = JobMetrics(output_name)
+        self._outputs = []
+        self._journal = None
+        options = MergeOptions(
+            force_encode=force_encode, auto_split=auto_split, generate_subtitles=generate_subtitles,
+            encode_preset=encode_preset, use_hw_accel=use_hw_accel, crf=crf,
+            simple_mode=simple_mode, normalize_mode=normalize_mode,
+            encode_processes=encode_processes, split_max_duration=split_max_duration,
+            split_max_size=split_max_size, split_from_sources=split_from_sources,
+            keep_full=keep_full, incremental=incremental, resume=resume,
+            tree_threshold=tree_threshold, tree_batch_size=tree_batch_size,
+            validate_junctions=validate_junctions, repair_timestamps=repair_timestamps, trim=trim,
+            trim_accurate=trim_accurate)
+        success = self._merge_videos(output_name, video_files, options)
+        if success and self._journal is not None:
+            self._journal.finish()
+        self.metrics.finished = time.time()
+        result = MergeResult(bool(success), list(self._outputs) if success else [], self.metrics)
+
+        if metrics_jsonl:
+            self.metrics.write_jsonl(metrics_jsonl, success=result.success, outputs=result.outputs)
+        if metrics_prometheus:
+            self.metrics.write_prometheus(metrics_prometheus, success=result.success)
+        return result
+
+    def _merge_videos(self, output_name: str, video_files: Optional[List[str]],
+                      options: MergeOptions) -> bool:
+        """merge_videos的实际实现，选项含义见merge_videos"""
+        if video_files is None:
+            # 获取视频文件时排除输出文件
+            with self.metrics.stage('scan'):
+                video_files = self.get_video_files(exclude_output=output_name)
+
+        # 裁剪后的片段无法追加到上次的合并结果之后，裁剪时总是完整合并
+        append_plan = None
+        split_from_sources = options.auto_split and options.split_from_sources
+        if options.incremental and video_files and not options.trim and not split_from_sources:
+            append_plan = self._plan_incremental(output_name, video_files)
+            if append_plan is not None and not append_plan[1]:
+                manifest = MergeManifest.load(manifest_path(self.output_dir, output_name))
+                self._outputs.extend(os.path.join(self.output_dir, name)
+                                     for name in manifest.outputs)
+                self.metrics.add_strategy('up_to_date')
+                print("\n没有新增片段，合并结果已是最新")
+                return True
+
+        # 任务日志：上次运行中断时，从第一个未完成的阶段继续
+        self._journal = None
+        if options.resume and video_files:
+            key_options = {name: getattr(options, name) for name in JOURNAL_OPTIONS}
+            self._journal = JobJournal(journal_path(self.output_dir, output_name),
+                                       job_key(video_files, self.input_dir, key_options))
+        split_done = self._resume_stage('split')
+        final_done = self._resume_stage('final') if split_done is None else None
+        full_done = (self._resume_stage('full')
+                     if split_done is None and final_done is None else None)
+        merge_done = (self._resume_stage('merge')
+                      if split_done is None and final_done is None and full_done is None else None)
+
+        # 清理可能存在的旧文件（保留作为增量追加基础的上次合并结果和可以续用的中间结果）
         output_path = os.path.join(self.output_dir, f"{output_name}.mp4")
         temp_output_path = os.path.join(self.output_dir, f"{output_name}_temp.mp4")
         list_file_path = os.path.join(self.input_dir, "filelist.txt")
-        
+        keep = set()
+        if append_plan is not None:
+            keep.add(append_plan[0])
+        if merge_done is not None:
+            keep.add(temp_output_path)
+        if final_done is not None:
+            keep.add(output_path)
+
         for path in [output_path, temp_output_path, list_file_path]:
+            if path in keep:
+                continue
             if os.path.exists(path):
                 try:
                     os.remove(path)
                     print(f"已删除旧文件: {os.path.basename(path)}")
                 except Exception as e:
                     print(f"无法删除文件 {os.path.basename(path)}: {str(e)}")
-        
-        if video_files is None:
-            # 获取视频文件时排除输出文件
-            video_files = self.get_video_files(exclude_output=output_name)
-        
+
         if not video_files:
             print("没有找到可合并的视频文件")
             return False
 
-        # 首先将所有视频合并成一个完整文件
-        temp_output = f"{output_name}_temp"
-        merge_success = self._merge_video_group(temp_output, video_files, force_encode, encode_preset, use_hw_accel, crf, simple_mode)
-        if not merge_success:
-            print("视频合并失败，无法继续处理")
-            return False
-            
-        # 获取合并后视频的完整路径
-        temp_video_path = os.path.join(self.output_dir, f"{temp_output}.mp4")
-        
-        # 检查文件是否存在
-        if not os.path.exists(temp_video_path):
-            print(f"合并后的临时文件不存在: {temp_video_path}")
-            return False
-            
-        # 检查合并后的视频时长
-        total_duration = self.get_video_duration(temp_video_path)
-        if total_duration <= 0:
-            print("合并后的视频时长为0或无法获取，可能合并失败")
-            if os.path.exists(temp_video_path):
-                os.remove(temp_video_path)
-            return False
-        
-        # 如果启用自动分割且时长超过120分钟，则将视频分割成两部分
-        if auto_split and total_duration > 7200:  # 120分钟 = 7200秒
-            print("\n合并后视频总时长超过120分钟，将生成完整版和两个分割版本...")
-            
-            # 首先将临时文件重命名为完整版
-            full_output = os.path.join(self.output_dir, f"{output_name}_full.mp4")
-            os.rename(temp_video_path, full_output)
+        trims = {}
+        resumed = any(done is not None for done in (merge_done, final_done, full_done, split_done))
+        if options.trim and not resumed:
+            trims = self._resolve_trims(options.trim, video_files)
+
+        if split_from_sources:
+            split_result = self._merge_split_from_sources(output_name, video_files, options, trims)
+            if split_result is not None:
+                return split_result
+
+        full_output = os.path.join(self.output_dir, f"{output_name}_full.mp4")
+        if split_done is not None or full_done is not None:
+            print(f"\n从上次中断处继续：复用已生成的 {os.path.basename(full_output)}")
+            needs_split = True
+        elif final_done is not None:
+            print(f"\n从上次中断处继续：复用已生成的 {os.path.basename(output_path)}")
+            needs_split = False
+        else:
+            # 首先将所有视频合并成一个完整文件；预计还要分割时它只是中间文件
+            temp_output = f"{output_name}_temp"
+            expect_split = options.auto_split and self._expect_split(
+                video_files, options.split_max_duration, options.split_max_size, trims)
+            temp_layout = self.intermediate_layout if expect_split else self.output_layout
+            if merge_done is not None:
+                print(f"\n从上次中断处继续：复用已合并的 {temp_output}.mp4")
+                self.metrics.add_strategy('resumed')
+                merge_success = True
+            elif append_plan is not None:
+                merge_success = self._append_clips(temp_output, append_plan[0], append_plan[1],
+                                                   temp_layout)
+            elif options.tree_threshold and len(video_files) > options.tree_threshold:
+                merge_success = self._merge_tree(temp_output, video_files, options,
+                                                 layout=temp_layout, trims=trims)
+            else:
+                merge_success = self._merge_video_group(temp_output, video_files, options,
+                                                        layout=temp_layout, trims=trims)
+            if not merge_success:
+                print("视频合并失败，无法继续处理")
+                return False
+
+            # 获取合并后视频的完整路径
+            temp_video_path = os.path.join(self.output_dir, f"{temp_output}.mp4")
+
+            # 检查文件是否存在
+            if not os.path.exists(temp_video_path):
+                print(f"合并后的临时文件不存在: {temp_video_path}")
+                return False
+
+            # 检查合并后的视频时长
+            total_duration = self.get_video_duration(temp_video_path)
+            if total_duration <= 0:
+                print("合并后的视频时长为0或无法获取，可能合并失败")
+                if os.path.exists(temp_video_path):
+                    os.remove(temp_video_path)
+                return False
+            if merge_done is None:
+                self._journal_complete('merge', [temp_video_path])
+
+            # 如果启用自动分割且超过时长或体积上限，则按关键帧分割成若干部分
+            total_size = os.path.getsize(temp_video_path)
+            needs_split = options.auto_split and (
+                (options.split_max_duration and total_duration > options.split_max_duration)
+                or (options.split_max_size and total_size > options.split_max_size))
+            if needs_split:
+                print("\n合并后视频超过分割上限，将生成完整版和多个分割版本...")
+                # 首先将临时文件重命名为完整版
+                os.replace(temp_video_path, full_output)
+                if os.path.exists(output_path):
+                    # 增量合并前未分割的上次结果已被完整版取代
+                    os.remove(output_path)
+                self._journal_complete('full', [full_output])
+            else:
+                # 如果不需要分割，直接重命名临时文件为最终文件名；预估要分割而使用了中间文件布局时
+                # 改写为最终输出布局
+                if temp_layout != self.output_layout and self._rewrite_layout(
+                        temp_video_path, output_path, self.output_layout):
+                    os.remove(temp_video_path)
+                else:
+                    os.replace(temp_video_path, output_path)
+                self._journal_complete('final', [output_path])
+
+        if needs_split:
+            total_duration = self.get_video_duration(full_output)
+            total_size = os.path.getsize(full_output)
             print(f"\n完整版已保存：{os.path.basename(full_output)} ({total_duration/60:.2f}分钟)")
-            
-            # 计算分割点（视频总时长的一半）
-            split_point = total_duration / 2
-            
-            # 使用ffmpeg分割视频
-            first_output = f"{output_name}_part1.mp4"
-            second_output = f"{output_name}_part2.mp4"
-            
-            # 分割第一部分（从开始到中点）
-            cmd1 = [
-                'ffmpeg',
-                '-i', full_output,
-                '-t', str(split_point),
-                '-c', 'copy',
-                os.path.join(self.output_dir, first_output)
-            ]
-            
-            # 分割第二部分（从中点到结束）
-            cmd2 = [
-                'ffmpeg',
-                '-i', full_output,
-                '-ss', str(split_point),
-                '-c', 'copy',
-                os.path.join(self.output_dir, second_output)
-            ]
-            
-            print("\n正在生成第一部分视频...")
-            subprocess.run(cmd1, check=True)
-            
-            print("\n正在生成第二部分视频...")
-            subprocess.run(cmd2, check=True)
-            
-            print(f"\n视频处理完成！生成了以下文件：")
-            print(f"完整版：{os.path.basename(full_output)} ({total_duration/60:.2f}分钟)")
-            print(f"第一部分：{first_output} ({split_point/60:.2f}分钟)")
-            print(f"第二部分：{second_output} ({(total_duration-split_point)/60:.2f}分钟)")
 
-            # 为所有视频生成字幕
-            if generate_subtitles:
-                print("\n开始生成字幕文件...")
-                # 为完整版生成字幕
-                subtitle_path = self.generate_subtitle(full_output)
-                if subtitle_path:
-                    print(f"完整版字幕已生成：{os.path.basename(subtitle_path)}")
+            if split_done is not None:
+                parts = [SplitPart(*part) for part in split_done['parts']]
+            else:
+                # 一次读取完成全部分割，分割点对齐关键帧
+                with self.metrics.stage('split') as record:
+                    splitter = VideoSplitter(self.media_probe)
+                    parts = splitter.split(full_output, os.path.join(self.output_dir, output_name),
+                                           max_duration=options.split_max_duration,
+                                           max_size=options.split_max_size,
+                                           layout=self.output_layout)
+                    if parts:
+                        record.add_read(total_size)
+                        record.add_written(sum(os.path.getsize(part.path) for part in parts
+                                               if os.path.exists(part.path)))
+                if parts:
+                    self._journal_complete('split', [full_output] + [part.path for part in parts],
+                                           parts=[list(part) for part in parts])
+                else:
+                    print("分割失败，仅保留完整版")
+            self._outputs.append(full_output)
+            self._outputs.extend(part.path for part in parts)
 
-                # 为第一部分生成字幕
-                first_output_path = os.path.join(self.output_dir, first_output)
-                subtitle_path = self.generate_subtitle(first_output_path)
-                if subtitle_path:
-                    print(f"第一部分字幕已生成：{os.path.basename(subtitle_path)}")
+            print("\n视频处理完成！生成了以下文件：")
+            print(f"完整版：{os.path.basename(full_output)} ({total_duration/60:.2f}分钟)")
+            for i, part in enumerate(parts, 1):
+                print(f"第{i}部分：{os.path.basename(part.path)} ({part.duration/60:.2f}分钟，"
+                      f"起点 {part.start/60:.2f}分钟)")
 
-                # 为第二部分生成字幕
-                second_output_path = os.path.join(self.output_dir, second_output)
-                subtitle_path = self.generate_subtitle(second_output_path)
-                if subtitle_path:
-                    print(f"第二部分字幕已生成：{os.path.basename(subtitle_path)}")
+            # 为所有视频生成字幕
+            if options.generate_subtitles:
+                self._generate_subtitles([full_output] + [part.path for part in parts])
+            merged_output = full_output
         else:
-            # 如果不需要分割，直接重命名临时文件为最终文件名
-            final_output = os.path.join(self.output_dir, f"{output_name}.mp4")
-            os.rename(temp_video_path, final_output)
+            total_duration = self.get_video_duration(output_path)
+            self._outputs.append(output_path)
             print(f"\n视频合并完成！总时长：{total_duration/60:.2f}分钟")
 
             # 为合并后的视频生成字幕
-            if generate_subtitles:
-                print("\n开始生成字幕文件...")
-                subtitle_path = self.generate_subtitle(final_output)
+            if options.generate_subtitles:
+                self._generate_subtitles([output_path])
+            merged_output = output_path
+
+        self._write_manifest(output_name, merged_output, video_files)
+        return True
+
+    def _clip_records(self, video_files: List[str]) -> Optional[List[ClipRecord]]:
+        """为片段生成清单记录，有文件无法探测时返回None"""
+        records = []
+        for video, info in zip(video_files, self.get_media_info(video_files).values()):
+            if info is None:
+                return None
+            records.append(ClipRecord(video, info.size, info.duration, fingerprint(info)))
+        return records
+
+    def _write_manifest(self, output_name: str, merged_output: str, video_files: List[str]):
+        """在输出旁写入合并清单，供之后的增量合并使用"""
+        records = self._clip_records(video_files)
+        info = self.media_probe.probe(merged_output)
+        if records is None or info is None:
+            return
+        manifest = MergeManifest(
+            os.path.basename(merged_output), records, info.size, info.duration, fingerprint(info),
+            [os.path.basename(path) for path in self._outputs])
+        try:
+            manifest.save(manifest_path(self.output_dir, output_name))
+        except OSError as e:
+            print(f"写入合并清单失败: {str(e)}")
+
+    def _plan_incremental(self, output_name: str,
+                          video_files: List[str]) -> Optional[Tuple[str, List[str]]]:
+        """判断能否把新增片段追加到上次的合并结果之后
+
+        Returns:
+            Optional[Tuple[str, List[str]]]: (上次的合并文件, 新增片段)，新增片段为空表示已是最新；
+                                             不能增量合并时返回None
+        """
+        manifest = MergeManifest.load(manifest_path(self.output_dir, output_name))
+        if manifest is None:
+            print("\n没有可用的合并清单，执行完整合并")
+            return None
+
+        base = os.path.join(self.output_dir, manifest.output)
+        if not os.path.exists(base) or os.path.getsize(base) != manifest.output_size:
+            print(f"\n上次的合并结果 {manifest.output} 不存在或已被修改，执行完整合并")
+            return None
+
+        records = self._clip_records(video_files)
+        prefix = manifest.prefix_length(records) if records is not None else None
+        if prefix is None:
+            print("\n片段列表不是上次合并的扩展（有片段被删除、替换或插入），执行完整合并")
+            return None
+
+        new_files = video_files[prefix:]
+        for record in records[prefix:]:
+            if record.fingerprint != manifest.output_fingerprint:
+                diffs = fingerprint_diff(manifest.output_fingerprint, record.fingerprint)
+                print(f"\n新增片段 {record.name} 与上次的合并结果不兼容（{', '.join(diffs)}），"
+                      f"执行完整合并")
+                return None
+
+        if new_files:
+            print(f"\n增量合并: 在 {manifest.output}（{len(manifest.clips)} 个片段）之后追加 "
+                  f"{len(new_files)} 个新片段")
+        return base, new_files
+
+    def _append_clips(self, output_name: str, base: str, new_files: List[str],
+                      layout: Optional[str] = None) -> bool:
+        """把新增片段直接拷贝追加到上次的合并结果之后，输出为 output_name.mp4"""
+        output_path = os.path.join(self.output_dir, f"{output_name}.mp4")
+        paths = [base] + [os.path.join(self.input_dir, video) for video in new_files]
+        durations = [self.get_video_duration(path) for path in paths]
+        list_file = self.create_merge_list(
+            paths, os.path.join(self.output_dir, f".{output_name}_append.txt"))
+        self.metrics.add_strategy('incremental')
+        try:
+            with self.metrics.stage('merge') as record:
+                cmd = self._build_copy_command(list_file, output_path, layout)
+                success = self._run_ffmpeg(cmd, sum(durations), output_name)
+                record.add_read(sum(os.path.getsize(path) for path in paths))
+                if os.path.exists(output_path):
+                    self._record_output(record, output_path, layout)
+                record.add_detail('appended_clips', len(new_files))
+        finally:
+            if os.path.exists(list_file):
+                os.remove(list_file)
+        if not success and os.path.exists(output_path):
+            os.remove(output_path)
+        return success
+
+    def _merge_split_from_sources(self, output_name: str, video_files: List[str],
+                                  options: MergeOptions,
+                                  trims: Optional[Dict[str, TrimSpec]] = None) -> Optional[bool]:
+        """在片段边界上分组，直接从源片段并行合并出各部分
+
+        分组前先对全体片段统一处理兼容性（见 _prepare_split_sources），各部分使用同一个目标格式，
+        因此可以直接拼接出完整版。设置了体积上限时按估计的字节数均衡分组，合并后检查各部分的实际
+        体积，超过上限时删除各部分，由调用方改为合并后按关键帧分割。
+
+        Args:
+            output_name (str): 输出文件名（不包含扩展名）
+            video_files (List[str]): 要合并的视频文件列表
+            options (MergeOptions): 合并选项
+            trims (Dict[str, TrimSpec], optional): 视频文件 -> 裁剪方式
+
+        Returns:
+            Optional[bool]: 不需要分割（或各部分超过体积上限）时返回None（由调用方按普通流程合并），
+                            否则返回是否成功
+        """
+        video_info = self.check_video_info(video_files)
+        trims = trims or {}
+        # 按裁剪后的时长分组，体积按保留比例估算
+        durations = [sum(end - start for start, end in trims[video].segments(duration))
+                     if video in trims else duration
+                     for video, (_, duration) in zip(video_files, video_info)]
+        sizes = [os.path.getsize(path) * (kept / duration if duration > 0 else 1.0)
+                 if os.path.exists(path) else 0.0
+                 for (path, duration), kept in zip(video_info, durations)]
+        total_duration = sum(durations)
+
+        limits = [(values, limit) for values, limit in ((durations, options.split_max_duration),
+                                                        (sizes, options.split_max_size)) if limit]
+        parts = max([1] + [math.ceil(sum(values) / limit) for values, limit in limits])
+        if parts <= 1 or len(video_files) < 2:
+            return None
+
+        # 按最紧的上限均衡分组，估计值仍超过任一上限时增加分组数
+        def over_limit(ranges: List[Tuple[int, int]]) -> bool:
+            return any(sum(values[start:end]) > limit
+                       for values, limit in limits for start, end in ranges)
+
+        weights = max(limits, key=lambda item: sum(item[0]) / item[1])[0]
+        ranges = partition_contiguous(weights, parts)
+        while len(ranges) < len(video_files) and over_limit(ranges):
+            parts += 1
+            ranges = partition_contiguous(weights, parts)
+
+        split_name = f"{output_name}_split"
+        files, part_options, target = self._prepare_split_sources(split_name, video_files, options)
+        # 片段可能已被替换，裁剪方式按位置对应原始片段
+        part_trims = {path: trims[video] for video, path in zip(video_files, files)
+                      if video in trims}
+
+        print(f"\n总时长 {total_duration/60:.2f}分钟，将在片段边界上分成 {len(ranges)} 个部分，"
+              "直接由源片段合并:")
+        for i, (start, end) in enumerate(ranges, 1):
+            print(f"第{i}部分：片段 {start + 1}-{end}，{sum(durations[start:end])/60:.2f}分钟，"
+                  f"约 {sum(sizes[start:end]) / 1024 / 1024:.0f}MB")
+
+        def merge_part(index: int, start: int, end: int) -> bool:
+            part_name = f"{output_name}_part{index}"
+            if self._resume_stage(f"merge:{part_name}") is not None:
+                print(f"从上次中断处继续：复用已合并的 {part_name}.mp4")
+                return True
+            if (target is None and part_options.tree_threshold
+                    and end - start > part_options.tree_threshold):
+                success = self._merge_tree(part_name, files[start:end], part_options,
+                                           trims=part_trims)
+            else:
+                success = self._merge_video_group(part_name, files[start:end], part_options,
+                                                  trims=part_trims, target=target)
+            if success:
+                part_path = os.path.join(self.output_dir, f"{part_name}.mp4")
+                self._journal_complete(f"merge:{part_name}", [part_path])
+            return success
+
+        # 重编码的部分各自已使用全部编码线程预算，依次运行；拷贝拼接的部分按工作线程数并行
+        workers = 1 if part_options.force_encode else min(len(ranges), self.max_workers)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            jobs = [(i, start, end) for i, (start, end) in enumerate(ranges, 1)]
+            results = list(executor.map(lambda args: merge_part(*args), jobs))
+        part_paths = [os.path.join(self.output_dir, f"{output_name}_part{i}.mp4")
+                      for i in range(1, len(ranges) + 1)]
+        if not all(results):
+            print("部分视频合并失败")
+            return False
+        shutil.rmtree(self._work_dir(split_name), ignore_errors=True)
+
+        if options.split_max_size:
+            oversized = [path for path in part_paths
+                         if os.path.getsize(path) > options.split_max_size]
+            if oversized:
+                print(f"{'、'.join(os.path.basename(path) for path in oversized)} 超过体积上限，"
+                      "改为合并后按关键帧分割")
+                self._remove_files(part_paths)
+                return None
+
+        outputs = list(part_paths)
+        if options.keep_full:
+            full_output = os.path.join(self.output_dir, f"{output_name}_full.mp4")
+            part_report = build_report(self.media_probe.probe_many(part_paths))
+            if part_report.compatible:
+                print("\n拼接完整版...")
+                list_file = self.create_merge_list(
+                    part_paths, os.path.join(self.output_dir, f".{output_name}_full.txt"))
+                try:
+                    with self.metrics.stage('merge_full') as record:
+                        cmd = self._build_copy_command(list_file, full_output,
+                                                       self.intermediate_layout)
+                        full_ok = self._run_ffmpeg(cmd, total_duration, f"{output_name}_full")
+                        if full_ok:
+                            record.add_read(sum(os.path.getsize(p) for p in part_paths))
+                            self._record_output(record, full_output, self.intermediate_layout)
+                    if full_ok:
+                        outputs.insert(0, full_output)
+                    else:
+                        print("完整版拼接失败")
+                finally:
+                    os.remove(list_file)
+            else:
+                print("各部分的流参数不一致，无法直接拼接完整版")
+
+        self._outputs.extend(outputs)
+        print("\n视频处理完成！生成了以下文件：")
+        for path in outputs:
+            print(f"{os.path.basename(path)} ({self.get_video_duration(path)/60:.2f}分钟)")
+
+        if options.generate_subtitles:
+            self._generate_subtitles(outputs)
+        return True
+
+    def _prepare_split_sources(self, name: str, video_files: List[str], options: MergeOptions
+                               ) -> Tuple[List[str], MergeOptions, Optional[Fingerprint]]:
+        """分部分合并前对全体片段统一处理兼容性，保证各部分的输出可以直接拼接
+
+        与分层合并一样先对全体片段转封装、修复时间戳、按全体的多数类做选择性规范化并预检拼接点，
+        各部分只需直接拷贝拼接；必须重编码时按全体片段的多数类确定同一个编码目标，各部分都编码为
+        该目标，而不是各自选择多数类。
+
+        Args:
+            name (str): 工作目录名
+            video_files (List[str]): 全部视频文件列表
+            options (MergeOptions): 合并选项
+
+        Returns:
+            Tuple[List[str], MergeOptions, Optional[Fingerprint]]: 各部分使用的文件列表、合并选项和
+            编码目标（直接拷贝拼接时为None）
+        """
+        if options.simple_mode:
+            return video_files, options, None
+        copy_options = options._replace(simple_mode=True, force_encode=False,
+                                        validate_junctions=False, repair_timestamps=False)
+        encode_options = options._replace(force_encode=True, validate_junctions=False,
+                                          repair_timestamps=False)
+        if not options.force_encode:
+            remuxed = self._remux_containers(name, video_files)
+            if remuxed is not None and options.repair_timestamps:
+                remuxed = self._repair_timestamps(name, remuxed)
+            with self.metrics.stage('compatibility'):
+                compatible = remuxed is not None and self.check_codecs_compatibility(remuxed)
+            current = remuxed or video_files
+            if not compatible and remuxed is not None:
+                report = self.get_compatibility_report(current)
+                if report.majority is not None and (options.normalize_mode == 'selective'
+                                                    or report.video_compatible):
+                    normalized = self._selective_normalize(name, current, report,
+                                                           options.encode_preset, options.crf)
+                    compatible = normalized is not None
+                    current = normalized or current
+            if compatible and options.validate_junctions:
+                repaired = self._repair_junctions(name, current, options.encode_preset,
+                                                  options.crf)
+                compatible = repaired is not None
+                current = repaired or current
+            if compatible:
+                return current, copy_options, None
+
+        target = self._encode_target(video_files)
+        if target is not None:
+            print(f"\n各部分统一编码为: {target.describe()}")
+        return video_files, encode_options, target
+
+    def _resume_stage(self, stage: str) -> Optional[dict]:
+        """任务日志中该阶段已完成且产物有效时返回其附加信息"""
+        return self._journal.resume(stage) if self._journal is not None else None
+
+    def _journal_complete(self, stage: str, artifacts: List[str] = (), **data):
+        """在任务日志中记录阶段完成"""
+        if self._journal is not None:
+            self._journal.complete(stage, artifacts, **data)
+
+    def _generate_subtitles(self, video_paths: List[str]):
+        """为多个视频生成字幕，并记录到subtitles阶段；上次已生成的字幕直接复用"""
+        print("\n开始生成字幕文件...")
+        with self.metrics.stage('subtitles') as record:
+            for path in video_paths:
+                stage = f"subtitles:{os.path.basename(path)}"
+                if self._resume_stage(stage) is not None:
+                    print(f"字幕已存在：{os.path.basename(path)}")
+                    continue
+                subtitle_path = self.generate_subtitle(path)
                 if subtitle_path:
+                    record.add_read(os.path.getsize(path))
+                    self._journal_complete(stage, [subtitle_path])
                     print(f"字幕已生成：{os.path.basename(subtitle_path)}")
 
+    def _hw_encoder(self) -> Optional[EncoderCapability]:
+        """从编码器能力表中选择实测最快且可用的H.264编码器
+
+        能力表按主机持久化，只在首次使用或FFmpeg变化时试编码检测，
+        之后的合并不再启动检测进程。
+
+        Returns:
+            Optional[EncoderCapability]: 最快的硬件编码器，最快的是软件编码时返回None
+        """
+        with self.metrics.stage('hw_detect'):
+            try:
+                encoder = self.encoder_registry.best('h264')
+            except Exception as e:
+                print(f"检测硬件加速时出错: {str(e)}")
+                print("将使用软件编码")
+                return None
+
+        if encoder is None or not encoder.hardware:
+            print("没有比软件编码更快的可用硬件加速，将使用软件编码")
+            return None
+        print(f"检测到可用的硬件加速: {encoder.hw_type}（{encoder.encoder}，试编码 {encoder.fps:.0f} fps）")
+        return encoder
+
     def _detect_hw_acceleration(self) -> Tuple[str, List[str]]:
-        """检测系统可用的硬件加速选项
-        
+        """返回能力表选出的硬件加速
+
         Returns:
-            Tuple[str, List[str]]: (加速类型, 编码器选项列表)
+            Tuple[str, List[str]]: (加速类型, 编码器选项列表)，最快的是软件编码时返回("none", [])
+        """
+        encoder = self._hw_encoder()
+        if encoder is None:
+            return "none", []
+        return encoder.hw_type, encoder.encode_args()
+    
+    def _build_encode_command(self, list_file: str, output_path: str, encode_preset: str = 'faster',
+                              use_hw_accel: bool = True, crf: int = 23,
+                              threads: Optional[int] = None,
+                              layout: Optional[str] = None) -> List[str]:
+        """构建基于concat列表的重编码命令，layout 默认为最终输出布局"""
+        # 检测硬件加速选项
+        hw_type, hw_options = "none", []
+        if use_hw_accel:
+            hw_type, hw_options = self._detect_hw_acceleration()
+
+        # 基础命令
+        cmd = [
+            'ffmpeg',
+            '-y',  # 自动覆盖输出文件
+            '-nostats',  # 不显示详细统计信息
+            '-f', 'concat',
+            '-safe', '0',
+            '-i', list_file,
+            '-threads', str(threads or self.max_workers),  # 使用多线程
+            '-max_muxing_queue_size', '1024',  # 增加复用队列大小，避免某些错误
+        ]
+
+        # 添加视频编码选项
+        if hw_type != "none":
+            # 使用硬件加速
+            cmd.extend(hw_options)
+            print(f"使用硬件加速: {hw_type}")
+        else:
+            # 使用软件编码
+            cmd.extend([
+                '-c:v', 'libx264',
+                '-preset', encode_preset,
+                '-crf', str(crf),
+            ])
+            print(f"使用软件编码预设: {encode_preset}, 质量: CRF {crf}")
+
+        # 音频编码选项
+        cmd.extend([
+            '-c:a', 'aac',
+            '-b:a', '192k',  # 音频比特率
+        ])
+
+        # MP4布局（faststart便于网络播放，但需要重写整个文件）
+        cmd.extend(layout_args(layout or self.output_layout))
+
+        # 输出文件
+        cmd.append(output_path)
+        return cmd
+
+    def _build_copy_command(self, list_file: str, output_path: str,
+                            layout: Optional[str] = None) -> List[str]:
+        """构建基于concat列表的直接拷贝命令，layout 默认为最终输出布局"""
+        return [
+            'ffmpeg',
+            '-y',  # 自动覆盖输出文件
+            '-f', 'concat',
+            '-safe', '0',
+            '-i', list_file,
+            '-c', 'copy',
+            '-max_muxing_queue_size', '1024',  # 增加复用队列大小，避免某些错误
+            *layout_args(layout or self.output_layout),
+            output_path
+        ]
+
+    def _expect_split(self, video_files: List[str], split_max_duration: Optional[float],
+                      split_max_size: Optional[int],
+                      trims: Optional[Dict[str, TrimSpec]] = None) -> bool:
+        """根据探测结果（通常已缓存）预估合并结果是否超过分割上限
+
+        裁剪片头/片尾的片段按保留部分的时长计算，体积按保留比例估算。
+        """
+        if not split_max_duration and not split_max_size:
+            return False
+        trims = trims or {}
+        media_info = self.get_media_info(video_files)
+        total_duration = total_size = 0.0
+        for video in video_files:
+            info = media_info.get(os.path.join(self.input_dir, video))
+            if info is None:
+                continue
+            duration = info.duration
+            if video in trims:
+                duration = sum(end - start for start, end in trims[video].segments(info.duration))
+            total_duration += duration
+            total_size += info.size * (duration / info.duration if info.duration > 0 else 1.0)
+        return bool((split_max_duration and total_duration > split_max_duration)
+                    or (split_max_size and total_size > split_max_size))
+
+    def _rewrite_layout(self, src: str, dst: str, layout: str) -> bool:
+        """把已合并的文件流拷贝为另一种MP4布局（预估需要分割但实际不需要时使用）"""
+        cmd = ['ffmpeg', '-y', '-v', 'error', '-i', src, '-map', '0', '-c', 'copy',
+               *layout_args(layout), dst]
+        with self.metrics.stage('relayout') as record:
+            success = self._run_ffmpeg(cmd, self.get_video_duration(src), os.path.basename(dst))
+            if success:
+                record.add_read(os.path.getsize(src))
+                self._record_output(record, dst, layout)
+        return success
+
+    def _record_output(self, record, output_path: str, layout: Optional[str]):
+        """记录输出写入量，faststart 的整文件重写也计入读写字节数"""
+        size = os.path.getsize(output_path)
+        extra = size * (rewrite_factor(layout or self.output_layout) - 1)
+        record.add_written(size + extra)
+        if extra:
+            record.add_read(extra)
+            record.add_detail('faststart_rewrite_bytes', extra)
+
+    def add_progress_callback(self, callback: ProgressCallback):
+        """注册进度回调，每个FFmpeg进度块都会以ProgressEvent调用一次
+
+        Args:
+            callback (ProgressCallback): 接收ProgressEvent的可调用对象
+        """
+        self.progress_callbacks.append(callback)
+
+    def remove_progress_callback(self, callback: ProgressCallback):
+        """移除已注册的进度回调"""
+        if callback in self.progress_callbacks:
+            self.progress_callbacks.remove(callback)
+
+    def _run_ffmpeg(self, cmd: List[str], expected_duration: float, job: str = '') -> bool:
+        """运行FFmpeg并把进度事件分发给已注册的回调
+
+        Args:
+            cmd (List[str]): FFmpeg命令
+            expected_duration (float): 预计输出时长（秒），用于计算进度
+            job (str): 任务名称，随进度事件传递
+
+        Returns:
+            bool: FFmpeg是否成功退出
         """
-        system = platform.system()
-        hw_type = "none"
-        hw_options = []
-        
         try:
-            # 检查可用的硬件加速器
-            cmd = ['ffmpeg', '-hide_banner', '-encoders']
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            encoders_output = result.stdout
-            
-            # 根据操作系统选择合适的硬件加速
-            if system == "Darwin":  # macOS
-                if "videotoolbox" in encoders_output:
-                    hw_type = "videotoolbox"
-                    hw_options = [
-                        '-c:v', 'h264_videotoolbox',
-                        '-allow_sw', '1',  # 如果硬件加速失败，允许回退到软件编码
-                        '-b:v', '0'  # 使用CRF模式控制质量
-                    ]
-            elif system == "Windows":
-                if "nvenc" in encoders_output:  # NVIDIA GPU
-                    hw_type = "nvenc"
-                    hw_options = [
-                        '-c:v', 'h264_nvenc',
-                        '-preset', 'p4',  # NVENC预设，p1(最快)到p7(最高质量)
-                        '-tune', 'hq'
-                    ]
-                elif "qsv" in encoders_output:  # Intel Quick Sync
-                    hw_type = "qsv"
-                    hw_options = [
-                        '-c:v', 'h264_qsv',
-                        '-preset', 'faster'
-                    ]
-                elif "amf" in encoders_output:  # AMD GPU
-                    hw_type = "amf"
-                    hw_options = [
-                        '-c:v', 'h264_amf',
-                        '-quality', 'speed'
-                    ]
-            elif system == "Linux":
-                if "nvenc" in encoders_output:  # NVIDIA GPU
-                    hw_type = "nvenc"
-                    hw_options = [
-                        '-c:v', 'h264_nvenc',
-                        '-preset', 'p4',
-                        '-tune', 'hq'
-                    ]
-                elif "vaapi" in encoders_output:  # VAAPI
-                    hw_type = "vaapi"
-                    hw_options = [
-                        '-vaapi_device', '/dev/dri/renderD128',
-                        '-vf', 'format=nv12,hwupload',
-                        '-c:v', 'h264_vaapi'
-                    ]
-                elif "qsv" in encoders_output:  # Intel Quick Sync
-                    hw_type = "qsv"
-                    hw_options = [
-                        '-c:v', 'h264_qsv',
-                        '-preset', 'faster'
-                    ]
-            
-            if hw_type != "none":
-                print(f"检测到可用的硬件加速: {hw_type}")
-            else:
-                print("未检测到支持的硬件加速，将使用软件编码")
-                
+            result = run_ffmpeg(cmd, job, expected_duration, self.progress_callbacks)
         except Exception as e:
-            print(f"检测硬件加速时出错: {str(e)}")
-            print("将使用软件编码")
-            hw_type = "none"
-            hw_options = []
-            
-        return hw_type, hw_options
-    
-    def _merge_video_group(self, output_name: str, video_files: List[str], force_encode: bool, encode_preset: str = 'faster', use_hw_accel: bool = True, crf: int = 23, simple_mode: bool = False):
+            print(f"FFmpeg运行出错：{str(e)}")
+            return False
+
+        if result.returncode == 0:
+            return True
+        print(f"\nFFmpeg返回错误码: {result.returncode}")
+        for line in result.stderr_tail:
+            print(line)
+        return False
+
+    def _work_dir(self, output_name: str) -> str:
+        """返回存放中间文件的工作目录"""
+        return os.path.join(self.output_dir, f".{output_name}_work")
+
+    def validate_junctions(self, video_files: List[str],
+                           window: float = 2.0) -> List[JunctionCheck]:
+        """预检拷贝拼接时每个拼接点的时间戳：并行读取每个拼接点前后 window 秒（不写出文件），
+        检查时间戳跳变和音画偏移
+
+        Args:
+            video_files (List[str]): 按拼接顺序排列的视频文件
+            window (float): 拼接点两侧各读取的时长（秒）
+
+        Returns:
+            List[JunctionCheck]: 各拼接点的检查结果
+        """
+        media_info = self.get_media_info(video_files)
+        paths = [os.path.join(self.input_dir, video) for video in video_files]
+        work_dir = tempfile.mkdtemp(prefix='.junctions_', dir=self.output_dir)
+        validator = JunctionValidator(work_dir, window, max_jobs=self.max_workers)
+        with self.metrics.stage('junctions') as record:
+            try:
+                checks = validator.validate(paths, media_info)
+            finally:
+                shutil.rmtree(validator.work_dir, ignore_errors=True)
+            bad = [check for check in checks if not check.ok]
+            record.add_detail('junctions', len(checks))
+            record.add_detail('bad_junctions', len(bad))
+        print(f"\n拼接点预检：{len(checks)} 个拼接点，{len(bad)} 个异常")
+        for check in bad:
+            print(f"  {os.path.basename(check.left)} -> {os.path.basename(check.right)}: "
+                  f"{check.reason}")
+        return checks
+
+    def _repair_junctions(self, output_name: str, video_files: List[str],
+                          encode_preset: str = 'faster', crf: int = 23) -> Optional[List[str]]:
+        """预检拼接点，把拼接点异常的片段重编码为多数格式（重新生成时间戳）
+
+        Returns:
+            Optional[List[str]]: 替换后的文件列表（没有异常时为原列表），无法修复时返回None
+        """
+        offenders = offending_clips(self.validate_junctions(video_files))
+        if not offenders:
+            return video_files
+        report = self.get_compatibility_report(video_files)
+        if report.majority is None:
+            return None
+        target = report.majority.fingerprint
+        print(f"重编码拼接点异常的 {len(offenders)} 个片段为 {target.describe()}")
+
+        work_dir = os.path.join(self._work_dir(output_name), 'junctions')
+        max_jobs = min(len(offenders), max(1, self.cpu_threads // 2))
+        normalizer = ClipNormalizer(work_dir, max_jobs=max_jobs,
+                                    threads_per_job=max(1, self.cpu_threads // max_jobs),
+                                    encode_preset=encode_preset, crf=crf)
+        reference = self._majority_stream(report)
+        with self.metrics.stage('junction_repair') as record:
+            normalized = normalizer.normalize(offenders, target, reference=reference)
+            replacements = {}
+            for path in offenders:
+                new_path = normalized.get(path)
+                info = self.media_probe.probe(new_path) if new_path else None
+                if (info is None or fingerprint(info) != target
+                        or not matches_reference(info, reference)):
+                    print(f"片段 {os.path.basename(path)} 重编码后仍与目标格式不一致")
+                    return None
+                replacements[path] = new_path
+            record.add_written(sum(os.path.getsize(p) for p in replacements.values()))
+            record.add_detail('clips', len(replacements))
+        self.metrics.add_strategy('junction_repair')
+        return [replacements.get(os.path.join(self.input_dir, video), video)
+                for video in video_files]
+
+    def _remux_containers(self, output_name: str, video_files: List[str]) -> Optional[List[str]]:
+        """容器混用时把非MP4片段并行转封装为MP4（音视频流直接拷贝），使后续仍能拷贝拼接
+
+        转封装后的片段使用MP4片段中最常见的视频时间刻度，兼容性检查不会因为容器的
+        时间基不同而要求重编码。上次已转封装的片段直接复用。
+
+        Args:
+            output_name (str): 输出文件名（用于确定工作目录）
+            video_files (List[str]): 视频文件列表
+
+        Returns:
+            Optional[List[str]]: 替换后的文件列表（不需要转封装时为原列表），任何片段转封装失败时返回None
+        """
+        media_info = self.get_media_info(video_files)
+        targets = plan_remux(media_info)
+        if not targets:
+            return video_files
+
+        resumed = self._resume_stage(f"remux:{output_name}")
+        if resumed is not None:
+            print("\n从上次中断处继续：复用已转封装的片段")
+            return resumed['files']
+
+        print(f"\n检测到容器混用：{len(targets)}/{len(video_files)} 个片段不是MP4容器，转封装后拷贝拼接")
+        with self.metrics.stage('remux') as record:
+            remuxer = ContainerRemuxer(os.path.join(self._work_dir(output_name), 'remux'),
+                                       max_jobs=min(len(targets), self.max_workers))
+            remuxed = remuxer.remux({path: media_info[path] for path in targets},
+                                    target_timescale(media_info))
+            if any(remuxed[path] is None for path in targets):
+                print("部分片段转封装失败")
+                return None
+            record.add_read(sum(media_info[path].size for path in targets))
+            record.add_written(sum(os.path.getsize(remuxed[path]) for path in targets))
+            record.add_detail('clips', len(targets))
+            record.add_detail('remux_time', round(sum(remuxer.timings.values()), 6))
+        self.metrics.add_strategy('remux')
+
+        files = [remuxed.get(os.path.join(self.input_dir, video), video) for video in video_files]
+        self._journal_complete(f"remux:{output_name}", [remuxed[path] for path in targets],
+                               files=files)
+        return files
+
+    def _repair_timestamps(self, output_name: str, video_files: List[str]) -> List[str]:
+        """修复音视频开始/结束时间不一致或开始时间为负的片段，返回替换后的文件列表
+
+        视频流直接拷贝，只平移时间戳或补齐/裁剪并重编码音频；修复后仍属于原兼容类。
+        修复失败的片段保留原文件。上次已修复的片段直接复用。
+        """
+        media_info = self.get_media_info(video_files)
+        fixes = {}
+        for path, info in media_info.items():
+            fix = analyze_timestamps(info) if info is not None else None
+            if fix is not None:
+                fixes[path] = (info, fix)
+        if not fixes:
+            return video_files
+
+        resumed = self._resume_stage(f"timestamps:{output_name}")
+        if resumed is not None:
+            print("\n从上次中断处继续：复用已修复时间戳的片段")
+            return resumed['files']
+
+        audio_fixes = sum(1 for _, fix in fixes.values() if fix.kind == 'audio')
+        print(f"\n时间戳修复：{len(fixes)} 个片段的音视频时间戳不一致"
+              f"（{audio_fixes} 个需要补齐/裁剪音频，{len(fixes) - audio_fixes} 个只需平移时间戳）")
+        with self.metrics.stage('timestamps') as record:
+            repairer = TimestampRepairer(os.path.join(self._work_dir(output_name), 'timestamps'),
+                                         max_jobs=min(len(fixes), self.max_workers))
+            repaired = repairer.repair(fixes)
+            replacements = {}
+            for path, (info, fix) in fixes.items():
+                new_path = repaired.get(path)
+                new_info = self.media_probe.probe(new_path) if new_path else None
+                if new_info is None or fingerprint(new_info) != fingerprint(info):
+                    print(f"片段 {os.path.basename(path)} 的时间戳未能修复，使用原文件")
+                    continue
+                replacements[path] = new_path
+            record.add_read(sum(fixes[path][0].size for path in replacements))
+            record.add_written(sum(os.path.getsize(p) for p in replacements.values()))
+            record.add_detail('clips', len(replacements))
+            record.add_detail('audio_fixes', sum(1 for path in replacements
+                                                 if fixes[path][1].kind == 'audio'))
+            record.add_detail('repair_time', round(sum(repairer.timings.values()), 6))
+        if not replacements:
+            return video_files
+        self.metrics.add_strategy('timestamp_repair')
+
+        files = [replacements.get(os.path.join(self.input_dir, video), video)
+                 for video in video_files]
+        self._journal_complete(f"timestamps:{output_name}", list(replacements.values()),
+                               files=files)
+        return files
+
+    def detect_trims(self, video_files: List[str], intro: bool = True, outro: bool = True,
+                     search: float = 240.0) -> Dict[str, TrimSpec]:
+        """通过音频指纹找出各片段中重复出现的片头/片尾，生成裁剪方式
+
+        只解码每个片段开头和结尾 search 秒的低采样率音频，片段之间对齐能量包络的指纹；
+        至少在两个片段中出现、时长不短于10秒的内容才视为片头/片尾。
+
+        Args:
+            video_files (List[str]): 视频文件列表
+            intro (bool): 是否识别片头
+            outro (bool): 是否识别片尾
+            search (float): 在片段开头/结尾搜索的时长（秒）
+
+        Returns:
+            Dict[str, TrimSpec]: 视频文件 -> 裁剪方式，只包含需要裁剪的片段
+        """
+        media_info = self.get_media_info(video_files)
+        durations = {}
+        for video in video_files:
+            info = media_info.get(os.path.join(self.input_dir, video))
+            if info is not None and info.audio is not None and info.duration > 0:
+                durations[os.path.join(self.input_dir, video)] = info.duration
+        with self.metrics.stage('trim_detect') as record:
+            detector = IntroDetector(search, max_jobs=self.max_workers)
+            detected = detector.detect(durations, intro, outro)
+            record.add_detail('clips', len(durations))
+            record.add_detail('trimmed_clips', len(detected))
+        print(f"\n片头/片尾识别：{len(detected)}/{len(video_files)} 个片段需要裁剪")
+        specs = {}
+        for video in video_files:
+            spec = detected.get(os.path.join(self.input_dir, video))
+            if spec is not None:
+                specs[video] = spec
+                if len(video_files) <= FILE_LIST_PRINT_LIMIT:
+                    print(f"  {video}: {spec.describe()}")
+        return specs
+
+    def _resolve_trims(self, trim, video_files: List[str]) -> Dict[str, TrimSpec]:
+        """把 merge_videos 的 trim 参数转换为 视频文件 -> 裁剪方式"""
+        if not trim:
+            return {}
+        if isinstance(trim, str):
+            if trim not in TRIM_DETECT_MODES:
+                raise ValueError(f"未知的裁剪方式: {trim}，可选值: {', '.join(TRIM_DETECT_MODES)}")
+            return self.detect_trims(video_files, intro=trim != 'outro', outro=trim != 'intro')
+        if isinstance(trim, TrimSpec):
+            return {video: trim for video in video_files} if not trim.empty else {}
+        return {video: TrimSpec(*spec) for video, spec in trim.items()
+                if video in video_files and not TrimSpec(*spec).empty}
+
+    def _trim_entries(self, output_name: str, video_files: List[str], merge_files: List[str],
+                      trims: Dict[str, TrimSpec], accurate: bool = False,
+                      encode_preset: str = 'faster',
+                      crf: int = 23) -> Tuple[List[ConcatEntry], float]:
+        """按各片段的裁剪方式生成带 inpoint/outpoint 的concat列表项
+
+        每段保留内容的起点对齐到最近的关键帧，拼接时直接拷贝，不需要重编码；accurate 时起点
+        不对齐，只把起点到下一个关键帧之间的不完整GOP重编码。
+
+        Args:
+            output_name (str): 输出文件名（用于确定工作目录）
+            video_files (List[str]): 原始视频文件列表（trims的键）
+            merge_files (List[str]): 与video_files对应、实际参与拼接的文件（可能已转封装或规范化）
+            trims (Dict[str, TrimSpec]): 视频文件 -> 裁剪方式
+            accurate (bool): 是否帧精确裁剪
+            encode_preset (str): 重编码GOP时的编码速度预设
+            crf (int): 重编码GOP时的视频质量参数
+
+        Returns:
+            Tuple[List[ConcatEntry], float]: 列表项和裁剪后的预计总时长
+        """
+        media_info = self.get_media_info(merge_files)
+        entries = []
+        keyframes = {}
+        total_duration = 0.0
+        with self.metrics.stage('trim') as record:
+            removed = 0.0
+            trimmed = 0
+            for video, merge_file in zip(video_files, merge_files):
+                path = os.path.join(self.input_dir, merge_file)
+                info = media_info.get(path)
+                spec = trims.get(video)
+                if spec is None or info is None:
+                    entries.append(ConcatEntry(path))
+                    total_duration += info.duration if info is not None else 0.0
+                    continue
+                keyframes[path] = self.media_probe.keyframes(path)
+                if not keyframes[path]:
+                    print(f"无法获取 {os.path.basename(path)} 的关键帧，裁剪起点不对齐关键帧")
+                clip_entries = plan_entries(path, spec, info.duration, keyframes[path], accurate)
+                clip_duration = sum(entry.duration for entry in clip_entries)
+                entries.extend(clip_entries)
+                total_duration += clip_duration
+                removed += info.duration - clip_duration
+                trimmed += 1
+
+            gops = [entry for entry in entries if entry.encode]
+            if gops:
+                max_jobs = min(len(gops), max(1, self.cpu_threads // 2))
+                encoder = GopEncoder(os.path.join(self._work_dir(output_name), 'trim'),
+                                     max_jobs=max_jobs,
+                                     threads_per_job=max(1, self.cpu_threads // max_jobs),
+                                     encode_preset=encode_preset, crf=crf)
+                entries = encoder.encode(entries, media_info, keyframes)
+                record.add_detail('gop_encode_time', round(encoder.encode_time, 6))
+            record.add_detail('clips', trimmed)
+            record.add_detail('removed_duration', round(removed, 3))
+            record.add_detail('reencoded_gops', len(gops))
+        self.metrics.add_strategy('trim_accurate' if gops else 'trim')
+        print(f"\n裁剪片头/片尾：{trimmed} 个片段共去掉 {removed/60:.2f}分钟"
+              + (f"，重编码 {len(gops)} 个不完整的GOP" if gops else "（起点对齐关键帧，直接拷贝）"))
+        return entries, total_duration
+
+    def _normalize_outliers(self, output_name: str, video_files: List[str],
+                            report: CompatibilityReport, encode_preset: str, crf: int,
+                            record=None) -> Optional[List[str]]:
+        """只重编码不属于多数兼容类的片段，返回可以直接拷贝拼接的文件列表
+
+        视频与多数类一致的片段只转码音频；没有音轨的片段补上静音音轨，视频直接拷贝。
+
+        Args:
+            output_name (str): 输出文件名（用于确定工作目录）
+            video_files (List[str]): 全部视频文件列表
+            report (CompatibilityReport): 兼容性报告
+            encode_preset (str): FFmpeg编码速度预设
+            crf (int): 视频质量参数
+            record (StageRecord, optional): 记录静音补齐耗时和避免的重编码耗时的阶段记录
+
+        Returns:
+            Optional[List[str]]: 替换后的文件列表，任何片段规范化失败时返回None
+        """
+        target = report.majority.fingerprint
+        outliers = report.outliers
+        silent = report.silent_outliers
+        audio_only = len(report.audio_only_outliers) - len(silent)
+        print(f"\n选择性规范化: 目标格式为多数类 - {target.describe()}")
+        notes = []
+        if audio_only:
+            notes.append(f"{audio_only} 个只需转码音频")
+        if silent:
+            notes.append(f"{len(silent)} 个没有音轨，将补上静音音轨")
+        print(f"需要处理 {len(outliers)}/{len(video_files)} 个片段"
+              + (f"，其中{'，'.join(notes)}（视频直接拷贝）" if notes else ""))
+
+        max_jobs = min(len(outliers), max(1, self.cpu_threads // 2))
+        normalizer = ClipNormalizer(
+            self._work_dir(output_name),
+            max_jobs=max_jobs,
+            threads_per_job=max(1, self.cpu_threads // max_jobs),
+            encode_preset=encode_preset,
+            crf=crf,
+        )
+        sources = {path: info for path, info in self.get_media_info(outliers).items()
+                   if info is not None}
+        reference = self._majority_stream(report)
+        normalized = normalizer.normalize([os.path.join(self.input_dir, v) for v in outliers],
+                                          target, sources, reference)
+        if record is not None:
+            self._record_normalize_savings(record, video_files, normalizer, encode_preset)
+
+        replacements = {}
+        for video in outliers:
+            src = os.path.join(self.input_dir, video)
+            new_path = normalized.get(src)
+            info = self.media_probe.probe(new_path) if new_path else None
+            if info is None or fingerprint(info) != target:
+                print(f"片段 {video} 规范化后仍与目标格式不一致")
+                return None
+            if normalizer.modes.get(src) == 'encode' and not matches_reference(info, reference):
+                print(f"片段 {video} 重编码后的 level/参考帧数与多数类不一致")
+                return None
+            replacements[video] = new_path
+
+        return [replacements.get(video, video) for video in video_files]
+
+    def _majority_stream(self, report: CompatibilityReport) -> Optional[StreamInfo]:
+        """多数类中最常见的（level, 参考帧数）对应的视频流，重编码的片段沿用这些参数"""
+        streams = [info.video for info in self.get_media_info(report.majority.files).values()
+                   if info is not None and info.video is not None]
+        if not streams:
+            return None
+        counts = Counter((stream.level, stream.refs) for stream in streams)
+        common = counts.most_common(1)[0][0]
+        return next(stream for stream in streams if (stream.level, stream.refs) == common)
+
+    def _record_normalize_savings(self, record, video_files: List[str], normalizer: ClipNormalizer,
+                                  encode_preset: str):
+        """记录补静音音轨的耗时，以及相对全部重编码估计节省的编码耗时（按本机校准的编码帧率）"""
+        silenced = [path for path, mode in normalizer.modes.items() if mode == 'silence']
+        encoded = {path for path, mode in normalizer.modes.items() if mode == 'encode'}
+        record.add_detail('silent_audio_clips', len(silenced))
+        record.add_detail('silent_audio_remux_time',
+                          round(sum(normalizer.timings[p] for p in silenced), 6))
+        calibration = HostCalibration(registry=self.encoder_registry)
+        infos = [info for path, info in self.get_media_info(video_files).items()
+                 if path not in encoded]
+        record.add_detail('avoided_encode_time',
+                          round(calibration.encode_time(infos, encode_preset), 3))
+
+    def _encode_target(self, video_files: List[str]) -> Optional[Fingerprint]:
+        """以片段多数类的分辨率、帧率、时间基（音频参数取自有音轨的最大类）构造H.264/AAC编码目标，
+        无法确定时返回None"""
+        report = self.get_compatibility_report(video_files)
+        if report.majority is None:
+            return None
+        audio_class = next((cls for cls in report.classes if cls.fingerprint.audio),
+                           report.majority)
+        return h264_target(report.majority.fingerprint, audio_class.fingerprint)
+
+    def _parallel_encode(self, output_name: str, video_files: List[str], durations: List[float],
+                         output_path: str, processes: int, encode_preset: str, crf: int,
+                         layout: Optional[str] = None, use_hw_accel: bool = True,
+                         target: Optional[Fingerprint] = None) -> bool:
+        """把片段列表按时长均衡切成若干连续分组，每组由独立的FFmpeg进程重编码，
+        最后直接拷贝拼接各分组的输出
+
+        所有分组使用相同的编码目标（多数类的分辨率、帧率、时间基，H.264/AAC）和同一个编码器
+        （与非并行重编码一样由编码器能力表选择），因此分组输出可以无损拼接。libx264在快速预设下
+        线程扩展性较差，多进程各自使用少量线程能更充分地利用多核。
+
+        Args:
+            output_name (str): 输出文件名（用于确定工作目录）
+            video_files (List[str]): 要合并的视频文件列表
+            durations (List[float]): 与video_files对应的时长
+            output_path (str): 最终输出文件路径
+            processes (int): 并行FFmpeg进程数
+            encode_preset (str): FFmpeg编码速度预设
+            crf (int): 视频质量参数
+            layout (str, optional): 最终输出的MP4布局，默认为最终输出布局
+            use_hw_accel (bool): 是否允许使用硬件编码器
+            target (Fingerprint, optional): 编码目标，默认由这些片段的多数类确定
+
+        Returns:
+            bool: 是否成功
+        """
+        target = target or self._encode_target(video_files)
+        if target is None:
+            print("无法确定编码目标，不能使用并行分组编码")
+            return False
+        hw_encoder = self._hw_encoder() if use_hw_accel else None
+
+        ranges = partition_contiguous(durations, processes)
+        threads = max(1, self.cpu_threads // len(ranges))
+        work_dir = self._work_dir(output_name)
+        os.makedirs(work_dir, exist_ok=True)
+        print(f"\n并行分组编码: {len(ranges)} 个FFmpeg进程，每个 {threads} 线程，"
+              f"编码器 {hw_encoder.encoder if hw_encoder else 'libx264'}")
+
+        def encode_chunk(index: int, start: int, end: int) -> Optional[str]:
+            list_file = self.create_merge_list(video_files[start:end],
+                                               os.path.join(work_dir, f"chunk{index}.txt"))
+            chunk_path = os.path.join(work_dir, f"chunk{index:03d}.mp4")
+            cmd = build_encode_command(['-f', 'concat', '-safe', '0', '-i', list_file], chunk_path,
+                                       target, threads, encode_preset, crf, hw_encoder=hw_encoder)
+            chunk_duration = sum(durations[start:end])
+            print(f"分组{index + 1}: 片段 {start + 1}-{end}，{chunk_duration/60:.2f}分钟")
+            if not self._run_ffmpeg(cmd, chunk_duration, f"{output_name}/chunk{index + 1}"):
+                print(f"分组{index + 1}编码失败")
+                return None
+            print(f"分组{index + 1}编码完成")
+            return chunk_path
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            chunks = list(executor.map(lambda args: encode_chunk(*args),
+                                       [(i, start, end) for i, (start, end) in enumerate(ranges)]))
+        if any(chunk is None for chunk in chunks):
+            return False
+
+        print("\n拼接编码后的分组...")
+        list_file = self.create_merge_list(chunks, os.path.join(work_dir, "chunks.txt"))
+        cmd = self._build_copy_command(list_file, output_path, layout)
+        return self._run_ffmpeg(cmd, sum(durations), output_name)
+
+    def _selective_normalize(self, output_name: str, video_files: List[str],
+                             report: CompatibilityReport, encode_preset: str,
+                             crf: int) -> Optional[List[str]]:
+        """选择性规范化并记录到任务日志，上次已规范化的片段直接复用
+
+        Returns:
+            Optional[List[str]]: 可以直接拷贝拼接的文件列表，失败时返回None
+        """
+        resumed = self._resume_stage(f"normalize:{output_name}")
+        if resumed is not None:
+            print("\n从上次中断处继续：复用已规范化的片段")
+            return resumed['files']
+        with self.metrics.stage('normalize') as record:
+            normalized_files = self._normalize_outliers(output_name, video_files, report,
+                                                        encode_preset, crf, record)
+            if normalized_files is not None:
+                replaced = [f for f in normalized_files if f not in video_files]
+                record.add_written(sum(os.path.getsize(f) for f in replaced))
+                record.add_detail('clips', len(replaced))
+                record.add_detail('audio_only_clips', len(report.audio_only_outliers))
+                self._journal_complete(f"normalize:{output_name}", replaced, files=normalized_files)
+        return normalized_files
+
+    def _merge_tree(self, output_name: str, video_files: List[str], options: MergeOptions,
+                    retries: int = 1, layout: Optional[str] = None,
+                    trims: Optional[Dict[str, TrimSpec]] = None) -> bool:
+        """分层合并大量片段
+
+        单次concat遍历几千个输入时解复用开销大，中途失败也只能整体重来。分层合并先把每
+        tree_batch_size 个片段并行拷贝拼接为中间文件（隐藏文件，每批通过 _merge_video_group 完成，
+        失败时只重试该批），再把中间文件逐层拼接，直到剩余文件不超过一批后输出到 output_name。
+        每层完成后删除上一层的中间文件。每批完成都记录到任务日志，续跑时从最高的完整层继续。
+
+        片段流参数不兼容时先按全体片段的多数类做选择性规范化，保证各批输出可以直接拼接；
+        必须全部重编码时分层没有意义，改为单次合并。
+
+        Args:
+            output_name (str): 输出文件名（不包含扩展名）
+            video_files (List[str]): 要合并的视频文件列表
+            options (MergeOptions): 合并选项，每批的文件数为 tree_batch_size；拼接点预检和时间戳修复
+                                    在分批前对全体片段做一次
+            retries (int): 每批失败后的重试次数
+            layout (str, optional): 最终输出的MP4布局；中间文件总是使用中间文件布局
+            trims (Dict[str, TrimSpec], optional): 视频文件 -> 裁剪方式，在第一层各批的concat列表中截取
+
+        Returns:
+            bool: 是否成功
+        """
+        batch_size = max(2, options.tree_batch_size)
+        tree_name = f"{output_name}_tree"
+        # 需要全部重编码时改为单次合并；各批和最后一次拼接的文件已经兼容，直接拷贝拼接
+        single_options = options._replace(validate_junctions=False, repair_timestamps=False)
+        batch_options = single_options._replace(force_encode=False, simple_mode=True)
+
+        # 预先确定各层的批次数，续跑时据此找到最高的完整层
+        level_sizes = []
+        count = len(video_files)
+        while count > batch_size:
+            count = math.ceil(count / batch_size)
+            level_sizes.append(count)
+
+        def level_paths(level: int) -> List[str]:
+            return [os.path.join(self.output_dir, f".{tree_name}{level}_{i:04d}.mp4")
+                    for i in range(1, level_sizes[level - 1] + 1)]
+
+        start_level = 0
+        for level in range(len(level_sizes), 0, -1):
+            if all(self._resume_stage(f"tree:{os.path.basename(path)}") is not None
+                   for path in level_paths(level)):
+                print(f"\n从上次中断处继续：复用第{level}层的 {level_sizes[level - 1]} 个中间文件")
+                start_level = level
+                break
+
+        if start_level:
+            current = level_paths(start_level)
+        else:
+            current = video_files
+            if not options.simple_mode:
+                with self.metrics.stage('probe'):
+                    self.check_video_info(video_files)
+                remuxed = video_files
+                if not options.force_encode:
+                    remuxed = self._remux_containers(tree_name, video_files)
+                if remuxed is not None and options.repair_timestamps and not options.force_encode:
+                    remuxed = self._repair_timestamps(tree_name, remuxed)
+                with self.metrics.stage('compatibility'):
+                    compatible = remuxed is not None and self.check_codecs_compatibility(remuxed)
+                current = remuxed or video_files
+                if options.force_encode or not compatible:
+                    report = self.get_compatibility_report(current)
+                    normalized = None
+                    if (not options.force_encode and remuxed is not None
+                            and report.majority is not None
+                            and (options.normalize_mode == 'selective' or report.video_compatible)):
+                        normalized = self._selective_normalize(tree_name, current, report,
+                                                               options.encode_preset, options.crf)
+                    if normalized is None:
+                        print("\n需要全部重编码，不使用分层合并")
+                        return self._merge_video_group(output_name, video_files, single_options,
+                                                       layout=layout, trims=trims)
+                    current = normalized
+                if options.validate_junctions:
+                    repaired = self._repair_junctions(tree_name, current, options.encode_preset,
+                                                      options.crf)
+                    if repaired is None:
+                        print("\n拼接点修复失败，需要全部重编码，不使用分层合并")
+                        return self._merge_video_group(output_name, video_files,
+                                                       single_options._replace(force_encode=True),
+                                                       layout=layout, trims=trims)
+                    current = repaired
+        self.metrics.add_strategy('tree')
+
+        # 裁剪在第一层各批中完成；批次中的文件可能已被替换，按位置对应原始片段
+        batch_trims = {}
+        if trims and not start_level:
+            batch_trims = {path: trims[video] for video, path in zip(video_files, current)
+                           if video in trims}
+
+        def merge_batch(path: str, batch: List[str]) -> bool:
+            name = os.path.splitext(os.path.basename(path))[0]
+            if self._resume_stage(f"tree:{name}.mp4") is not None:
+                return True
+            for attempt in range(retries + 1):
+                if attempt:
+                    print(f"中间文件 {name} 合并失败，重试第{attempt}次...")
+                if self._merge_video_group(name, batch, batch_options,
+                                           layout=self.intermediate_layout, trims=batch_trims):
+                    self._journal_complete(f"tree:{name}.mp4", [path])
+                    return True
+            return False
+
+        success = False
+        try:
+            for level in range(start_level + 1, len(level_sizes) + 1):
+                paths = level_paths(level)
+                batches = [current[i:i + batch_size] for i in range(0, len(current), batch_size)]
+                print(f"\n分层合并第{level}层：{len(current)} 个文件合并为 {len(paths)} 个中间文件")
+                workers = min(len(paths), self.max_workers)
+                with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(lambda args: merge_batch(*args),
+                                                zip(paths, batches)))
+                batch_trims = {}
+                if not all(results):
+                    print(f"第{level}层有 {results.count(False)} 批合并失败")
+                    return False
+                if level > 1:
+                    self._remove_files(current)
+                current = paths
+
+            print(f"\n分层合并：拼接最后 {len(current)} 个文件")
+            success = self._merge_video_group(output_name, current, batch_options, layout=layout,
+                                              trims=batch_trims)
+            return success
+        finally:
+            if success:
+                if level_sizes:
+                    self._remove_files(current)
+                shutil.rmtree(self._work_dir(tree_name), ignore_errors=True)
+
+    @staticmethod
+    def _remove_files(paths: List[str]):
+        """删除中间文件"""
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _merge_video_group(self, output_name: str, video_files: List[str], options: MergeOptions,
+                           layout: Optional[str] = None,
+                           trims: Optional[Dict[str, TrimSpec]] = None,
+                           target: Optional[Fingerprint] = None):
         """合并一组视频文件
 
         Args:
             output_name (str): 输出文件名（不包含扩展名）
             video_files (List[str]): 要合并的视频文件列表
-            force_encode (bool): 是否强制重新编码
-            encode_preset (str): FFmpeg编码速度预设
-            use_hw_accel (bool): 是否使用硬件加速
-            crf (int): 视频质量参数，范围0-51，值越小质量越高
-            simple_mode (bool): 简单模式，跳过编码检查直接使用copy模式
+            options (MergeOptions): 合并选项，这里用到编码（force_encode、encode_preset、use_hw_accel、
+                                    crf、encode_processes）、兼容性处理（simple_mode、normalize_mode、
+                                    validate_junctions、repair_timestamps）和 trim_accurate
+            layout (str, optional): 输出的MP4布局（见 myproject.layout），默认为最终输出布局
+            trims (Dict[str, TrimSpec], optional): 视频文件 -> 裁剪方式，在concat列表中用 inpoint/outpoint 截取
+            target (Fingerprint, optional): 重编码时的统一编码目标（分部分合并时由全体片段确定），
+                                            默认保持输入的分辨率等参数
         """
         print(f"找到 {len(video_files)} 个视频文件，准备合并...")
-        for i, video in enumerate(video_files, 1):
-            print(f"{i}. {video}")
+        if len(video_files) <= FILE_LIST_PRINT_LIMIT:
+            for i, video in enumerate(video_files, 1):
+                print(f"{i}. {video}")
 
         # 检查视频信息
-        video_info = self.check_video_info(video_files)
+        with self.metrics.stage('probe') as record:
+            calls_before = self.media_probe.ffprobe_calls
+            video_info = self.check_video_info(video_files)
+            record.add_detail('ffprobe_calls', self.media_probe.ffprobe_calls - calls_before)
+        # 探测结果本身由持久化缓存复用，日志只记录阶段完成
+        self._journal_complete(f"probe:{output_name}", files=len(video_info))
         expected_duration = sum(duration for _, duration in video_info)
-
-        # 创建合并列表文件
-        list_file = self.create_merge_list(video_files)
+        input_size = sum(os.path.getsize(path) for path, _ in video_info if os.path.exists(path))
         output_path = os.path.join(self.output_dir, f"{output_name}.mp4")
 
+        # 容器混用时先转封装为MP4，转封装失败时只能重编码
+        remuxed = video_files
+        if not options.simple_mode and not options.force_encode:
+            remuxed = self._remux_containers(output_name, video_files)
+            if remuxed is not None and options.repair_timestamps:
+                remuxed = self._repair_timestamps(output_name, remuxed)
+
         # 检查编码格式兼容性（除非使用简单模式）
-        codecs_compatible = True if simple_mode else self.check_codecs_compatibility(video_files)
+        with self.metrics.stage('compatibility'):
+            codecs_compatible = options.simple_mode or (
+                remuxed is not None and self.check_codecs_compatibility(remuxed))
+
+        copy_files = remuxed or video_files
+        merge_files = copy_files
+        encode = options.force_encode or not codecs_compatible
+        report = None
+        if encode and remuxed is not None and not options.force_encode:
+            report = self.get_compatibility_report(copy_files)
+        # 只有音频不同时，即使要求全部重编码也只转码音频：视频已经一致，重编码视频只会损失质量和时间
+        if report is not None and (options.normalize_mode == 'selective'
+                                   or report.video_compatible):
+            if report.majority is not None:
+                normalized_files = self._selective_normalize(output_name, copy_files, report,
+                                                             options.encode_preset, options.crf)
+                if normalized_files is not None:
+                    merge_files = normalized_files
+                    encode = False
+                else:
+                    print("\n选择性规范化失败，回退到全部重编码模式...")
+        normalized = merge_files is not copy_files
+
+        # 拷贝拼接前预检拼接点，只重编码拼接点异常的片段；修复失败时改为重编码
+        if not encode and options.validate_junctions:
+            repaired = self._repair_junctions(output_name, merge_files, options.encode_preset,
+                                              options.crf)
+            if repaired is None:
+                print("\n拼接点修复失败，改为重编码模式...")
+                merge_files = copy_files
+                encode = True
+            else:
+                merge_files = repaired
+
+        # 创建合并列表文件（放在各自的工作目录中，多个分组可以同时合并）
+        work_dir = self._work_dir(output_name)
+        os.makedirs(work_dir, exist_ok=True)
+        list_file = os.path.join(work_dir, "filelist.txt")
+        if trims:
+            # 裁剪片头/片尾：在列表中用 inpoint/outpoint 截取，拷贝和重编码模式都适用
+            entries, expected_duration = self._trim_entries(
+                output_name, video_files, merge_files, trims, options.trim_accurate,
+                options.encode_preset, options.crf)
+            with open(list_file, 'w', encoding='utf-8') as f:
+                f.write(concat_list(entries))
+        else:
+            self.create_merge_list(merge_files, list_file)
+        parallel_encode = (encode and options.encode_processes > 1 and len(video_files) > 1
+                           and not trims)
 
         # 构建FFmpeg命令
-        if force_encode or (not codecs_compatible and not simple_mode):
-            # 检测硬件加速选项
-            hw_type, hw_options = "none", []
-            if use_hw_accel:
-                hw_type, hw_options = self._detect_hw_acceleration()
-            
-            # 基础命令
-            cmd = [
-                'ffmpeg',
-                '-y',  # 自动覆盖输出文件
-                '-nostats',  # 不显示详细统计信息
-                '-f', 'concat',
-                '-safe', '0',
-                '-i', list_file,
-                '-threads', str(self.max_workers),  # 使用多线程
-                '-max_muxing_queue_size', '1024',  # 增加复用队列大小，避免某些错误
-            ]
-            
-            # 添加视频编码选项
-            if hw_type != "none":
-                # 使用硬件加速
-                cmd.extend(hw_options)
-                print(f"使用硬件加速: {hw_type}")
+        cmd = None
+        if parallel_encode:
+            self.metrics.add_strategy('parallel_encode')
+            print("\n将使用并行分组编码模式...")
+        elif encode:
+            self.metrics.add_strategy('encode')
+            if target is not None:
+                hw_encoder = self._hw_encoder() if options.use_hw_accel else None
+                cmd = build_encode_command(['-f', 'concat', '-safe', '0', '-i', list_file],
+                                           output_path, target, self.cpu_threads,
+                                           options.encode_preset, options.crf,
+                                           hw_encoder=hw_encoder)
+                cmd[-1:-1] = layout_args(layout or self.output_layout)
             else:
-                # 使用软件编码
-                cmd.extend([
-                    '-c:v', 'libx264',
-                    '-preset', encode_preset,
-                    '-crf', str(crf),
-                ])
-                print(f"使用软件编码预设: {encode_preset}, 质量: CRF {crf}")
-            
-            # 音频编码选项
-            cmd.extend([
-                '-c:a', 'aac',
-                '-b:a', '192k',  # 音频比特率
-            ])
-            
-            # 其他优化选项
-            cmd.extend([
-                '-movflags', '+faststart',  # 优化网络播放
-                '-progress', '-',  # 输出进度信息
-            ])
-            
-            # 输出文件
-            cmd.append(output_path)
-            
-            if not force_encode:
+                cmd = self._build_encode_command(list_file, output_path, options.encode_preset,
+                                                 options.use_hw_accel, options.crf, layout=layout)
+            if not options.force_encode:
                 print("\n检测到视频编码格式不一致，将使用重编码模式...")
         else:
             # 使用直接拷贝模式
-            cmd = [
-                'ffmpeg',
-                '-y',  # 自动覆盖输出文件
-                '-f', 'concat',
-                '-safe', '0',
-                '-i', list_file,
-                '-c', 'copy',
-                '-max_muxing_queue_size', '1024',  # 增加复用队列大小，避免某些错误
-                '-movflags', '+faststart',  # 优化网络播放
-                '-progress', '-',  # 输出进度信息
-                output_path
-            ]
-            print("\n检测到视频编码格式一致，将使用快速合并模式...")
+            cmd = self._build_copy_command(list_file, output_path, layout)
+            if not normalized:
+                self.metrics.add_strategy('copy')
+            else:
+                self.metrics.add_strategy('audio_transcode' if report.video_compatible
+                                          else 'selective')
+            if normalized:
+                print("\n不兼容片段已规范化，将使用快速合并模式...")
+            else:
+                print("\n检测到视频编码格式一致，将使用快速合并模式...")
 
         merge_success = False
         try:
             print("\n开始合并视频...")
-            # 将stderr重定向到STDOUT统一处理
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,  # 合并错误输出到标准输出
-                universal_newlines=True
-            )
-
-            # 优化输出读取逻辑
-            while process.poll() is None:
-                output = process.stdout.readline()
-                if not output:
-                    continue
-                
-                line = output.strip()
-                if line.startswith('out_time_ms='):
-                    time_value = line.split('=')[1]
-                    if time_value != 'N/A':
-                        try:
-                            time = int(time_value) / 1000000
-                            progress = (time / expected_duration) * 100 if expected_duration > 0 else 0
-                            print(f"\r合并进度: {progress:.1f}% ({time/60:.1f}/{expected_duration/60:.1f}分钟)", end='')
-                        except ValueError:
-                            print(f"\r合并进度: 处理中...", end='')
-                    else:
-                        print(f"\r合并进度: 初始化中...", end='')
-                elif line.startswith('speed='):
-                    speed = line.split('=')[1].strip()
-                    print(f" 速度: {speed}", end='')
-                elif line and not line.startswith('frame='):
-                    print(f"\n{line}")
-
-            # 读取剩余输出
-            remaining_output = process.stdout.read()
-            for line in remaining_output.splitlines():
-                print(line.strip())
-                
-            # 检查进程退出状态
-            if process.returncode == 0:
-                merge_success = True
+            with self.metrics.stage('merge') as record:
+                if parallel_encode:
+                    durations = [duration for _, duration in video_info]
+                    merge_success = self._parallel_encode(
+                        output_name, video_files, durations, output_path, options.encode_processes,
+                        options.encode_preset, options.crf, layout, options.use_hw_accel, target)
+                else:
+                    merge_success = self._run_ffmpeg(cmd, expected_duration, output_name)
+                record.add_read(input_size)
+                if os.path.exists(output_path):
+                    self._record_output(record, output_path, layout)
+            if merge_success:
                 print("\n视频合并成功完成！")
             else:
-                print(f"\n视频合并失败，FFmpeg返回错误码: {process.returncode}")
-
-        except Exception as e:
-            print(f"合并过程出错：{str(e)}")
+                print("\n视频合并失败")
         finally:
             # 清理临时文件
             if os.path.exists(list_file):
                 os.remove(list_file)
+            shutil.rmtree(self._work_dir(output_name), ignore_errors=True)
                 
             # 检查输出文件是否存在且大小不为0
             if os.path.exists(output_path) and os.path.getsize(output_path) > 0 and merge_success:
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+异步探测引擎测试
+"""
+
+import os
+import asyncio
+import sys
+import unittest
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.async_probe import AdaptiveLimiter, AsyncProbeEngine
+
+
+class TestAsyncProbeEngine(unittest.TestCase):
+    """异步探测引擎测试类"""
+
+    def test_run_preserves_keys(self):
+        """测试批量执行命令并按键返回结果"""
+        engine = AsyncProbeEngine(initial_concurrency=2, min_concurrency=1, max_concurrency=4)
+        commands = {i: [sys.executable, '-c', f'print({i} * 2)'] for i in range(6)}
+        results = engine.run(commands)
+        self.assertEqual(set(results), set(commands))
+        for i, (returncode, stdout, _) in results.items():
+            self.assertEqual(returncode, 0)
+            self.assertEqual(stdout.strip(), str(i * 2))
+        self.assertLessEqual(engine.last_peak_concurrency, 4)
+
+    def test_missing_executable(self):
+        """测试可执行文件不存在时返回错误而不是抛出异常"""
+        results = AsyncProbeEngine().run({'x': ['/nonexistent/ffprobe']})
+        self.assertEqual(results['x'][0], -1)
+
+    def test_run_keeps_caller_event_loop(self):
+        """测试执行后调用方线程设置的事件循环保持不变"""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            AsyncProbeEngine().run({'x': [sys.executable, '-c', 'pass']})
+            self.assertIs(asyncio.get_event_loop_policy().get_event_loop(), loop)
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def test_run_inside_running_loop(self):
+        """测试在正在运行的事件循环中同步调用时不影响该循环"""
+        async def probe():
+            loop = asyncio.get_running_loop()
+            results = AsyncProbeEngine().run({'x': [sys.executable, '-c', 'print(1)']})
+            self.assertIs(asyncio.get_event_loop(), loop)
+            return results
+
+        results = asyncio.run(probe())
+        self.assertEqual(results['x'][:2], (0, '1\n'))
+
+    def test_limiter_grows_and_shrinks(self):
+        """测试并发数随延迟增减"""
+        limiter = AdaptiveLimiter(initial=2, minimum=1, maximum=8)
+        for _ in range(10):
+            limiter._adjust(0.1, ok=True)
+        self.assertGreater(limiter.limit, 2)
+        grown = limiter.limit
+        limiter._adjust(0.1, ok=False)
+        self.assertLess(limiter.limit, grown)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量调度测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.batch import COPY_JOB_THREADS, BatchScheduler, encode_share
+from myproject.media_probe import MediaInfo, StreamInfo
+from myproject.metrics import JobMetrics, MergeResult
+
+
+def make_info(path, width=1920, duration=60.0, audio=None):
+    streams = (StreamInfo(index=0, codec_type='video', codec_name='h264', profile='High',
+                          width=width, height=1080, pix_fmt='yuv420p',
+                          sample_aspect_ratio='1:1', frame_rate='25/1', time_base='1/12800'),)
+    if audio:
+        streams += (StreamInfo(index=1, codec_type='audio', codec_name=audio, sample_rate=48000,
+                               channels=2, channel_layout='stereo'),)
+    return MediaInfo(path=path, duration=duration, size=1000, streams=streams)
+
+
+def fake_probe_many(paths):
+    """series_b 中的第二个片段分辨率不同，需要重编码"""
+    odd = os.path.join('series_b', '2.mp4')
+    return {p: make_info(p, 1280 if p.endswith(odd) else 1920) for p in paths}
+
+
+class TestBatch(unittest.TestCase):
+    """批量调度测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for series in ('series_a', 'series_b', 'empty'):
+            os.makedirs(os.path.join(self.temp_dir, series))
+        for series in ('series_a', 'series_b'):
+            for name in ('1.mp4', '2.mp4'):
+                open(os.path.join(self.temp_dir, series, name), 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_expand_inputs(self):
+        """测试通配符展开、去重并忽略非目录"""
+        open(os.path.join(self.temp_dir, 'notes.txt'), 'w').close()
+        dirs = BatchScheduler.expand_inputs([os.path.join(self.temp_dir, '*'),
+                                             os.path.join(self.temp_dir, 'series_a')])
+        self.assertEqual([os.path.basename(d) for d in dirs], ['empty', 'series_a', 'series_b'])
+
+    @mock.patch('myproject.batch.encode_share', return_value=0.01)
+    @mock.patch('myproject.media_probe.MediaProbe.probe_many', side_effect=fake_probe_many)
+    def test_small_encode_share_uses_encode_budget(self, *_):
+        """测试只需重编码少量片段的任务也在重编码线程预算内调度"""
+        scheduler = BatchScheduler(cpu_budget=4, threads_per_job=2, probe_cache=False)
+        jobs = scheduler.plan([os.path.join(self.temp_dir, 'series_a')])
+        self.assertEqual(jobs[0].kind, 'encode')
+        self.assertEqual(jobs[0].merger.cpu_threads, 2)
+
+    def test_budgets(self):
+        """测试重编码并发数由线程预算决定"""
+        scheduler = BatchScheduler(copy_jobs=6, cpu_budget=32, threads_per_job=8)
+        self.assertEqual(scheduler.encode_jobs, 4)
+        self.assertEqual(BatchScheduler(cpu_budget=4, threads_per_job=8).threads_per_job, 4)
+
+    def test_encode_share(self):
+        """测试只按需要重编码视频的时长计算占比，只有音频不同的片段不计入"""
+        names = ['1.mp4', '2.mp4', '3.mp4', '4.mp4']
+        infos = [make_info(name, duration=600.0, audio='aac') for name in names]
+        self.assertEqual(encode_share(names, dict(zip(names, infos))), 0.0)
+
+        # 只有音频不同：视频直接拷贝，只转码音频
+        audio_only = infos[:3] + [make_info('4.mp4', duration=600.0, audio='mp3')]
+        self.assertEqual(encode_share(names, dict(zip(names, audio_only))), 0.0)
+
+        # 一个短片段分辨率不同：选择性规范化只重编码它
+        short = infos[:3] + [make_info('4.mp4', width=1280, duration=20.0, audio='aac')]
+        self.assertAlmostEqual(encode_share(names, dict(zip(names, short))), 20.0 / 1820.0)
+        self.assertEqual(encode_share(names, dict(zip(names, short)), normalize_mode='full'), 1.0)
+        self.assertEqual(encode_share(names, dict(zip(names, infos[:3] + [None]))), 1.0)
+
+    @mock.patch('myproject.media_probe.MediaProbe.probe_many', side_effect=fake_probe_many)
+    def test_plan_and_run(self, _):
+        """测试按兼容性分类任务并汇总吞吐量"""
+        scheduler = BatchScheduler(output_dir=os.path.join(self.temp_dir, 'out'), cpu_budget=4,
+                                   threads_per_job=2, probe_cache=False, auto_split=False)
+        jobs = scheduler.plan(scheduler.expand_inputs([os.path.join(self.temp_dir, 'series_*'),
+                                                       os.path.join(self.temp_dir, 'empty')]))
+        self.assertEqual([(job.output_name, job.kind) for job in jobs],
+                         [('series_a', 'copy'), ('series_b', 'encode')])
+        self.assertEqual(jobs[0].merger.cpu_threads, COPY_JOB_THREADS)
+        self.assertEqual(jobs[1].merger.cpu_threads, 2)
+
+        calls = []
+
+        def fake_merge(merger, output_name, **kwargs):
+            calls.append((output_name, kwargs['video_files']))
+            return MergeResult(output_name == 'series_a', [], JobMetrics(output_name))
+
+        with mock.patch('myproject.video_merger.VideoMerger.merge_videos', autospec=True,
+                        side_effect=fake_merge):
+            report = scheduler.run([os.path.join(self.temp_dir, 'series_*')])
+
+        self.assertEqual(sorted(calls), [('series_a', ['1.mp4', '2.mp4']),
+                                         ('series_b', ['1.mp4', '2.mp4'])])
+        self.assertFalse(report)
+        self.assertEqual(len(report.succeeded), 1)
+        self.assertEqual(report.input_bytes, 2000)
+        self.assertEqual(report.failed[0].job.output_name, 'series_b')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+兼容性指纹测试
+"""
+
+import os
+import sys
+import unittest
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.media_probe import MediaInfo, StreamInfo
+from myproject.compatibility import build_report, fingerprint, fingerprint_diff
+
+
+def make_info(path, duration=60.0, width=1920, sample_rate=44100, audio=True):
+    streams = [StreamInfo(index=0, codec_type='video', codec_name='h264', profile='High',
+                          width=width, height=1080, pix_fmt='yuv420p',
+                          sample_aspect_ratio='1:1', frame_rate='25/1', time_base='1/12800')]
+    if audio:
+        streams.append(StreamInfo(index=1, codec_type='audio', codec_name='aac', profile='LC',
+                                  sample_rate=sample_rate, channels=2, channel_layout='stereo'))
+    return MediaInfo(path=path, duration=duration, streams=tuple(streams))
+
+
+class TestCompatibility(unittest.TestCase):
+    """兼容性指纹测试类"""
+
+    def test_same_codec_different_params(self):
+        """测试编码相同但分辨率不同的视频不兼容"""
+        report = build_report({
+            'a.mp4': make_info('a.mp4'),
+            'b.mp4': make_info('b.mp4', width=1280),
+            'c.mp4': make_info('c.mp4'),
+        })
+        self.assertFalse(report.compatible)
+        self.assertEqual(report.majority.files, ['a.mp4', 'c.mp4'])
+        self.assertEqual(report.outliers, ['b.mp4'])
+
+    def test_fingerprint_diff(self):
+        """测试列出差异参数"""
+        base = fingerprint(make_info('a'))
+        diffs = fingerprint_diff(base, fingerprint(make_info('b', sample_rate=48000)))
+        self.assertEqual(diffs, ['audio.sample_rate'])
+        diffs = fingerprint_diff(base, fingerprint(make_info('b', audio=False)))
+        self.assertEqual(diffs, ['audio'])
+
+    def test_audio_only_difference(self):
+        """测试只有音频不同时视频兼容，且只需转码音频"""
+        report = build_report({
+            'a.mp4': make_info('a.mp4'),
+            'b.mp4': make_info('b.mp4', sample_rate=48000),
+            'c.mp4': make_info('c.mp4'),
+        })
+        self.assertFalse(report.compatible)
+        self.assertTrue(report.video_compatible)
+        self.assertEqual(report.audio_only_outliers, ['b.mp4'])
+
+        report = build_report({
+            'a.mp4': make_info('a.mp4'),
+            'b.mp4': make_info('b.mp4', width=1280, sample_rate=48000),
+        })
+        self.assertFalse(report.video_compatible)
+        self.assertEqual(report.audio_only_outliers, [])
+
+    def test_silent_outliers(self):
+        """测试没有音轨但视频兼容的片段可以补静音音轨"""
+        report = build_report({
+            'a.mp4': make_info('a.mp4'),
+            'b.mp4': make_info('b.mp4', audio=False),
+            'c.mp4': make_info('c.mp4'),
+            'd.mp4': make_info('d.mp4', width=1280, audio=False),
+        })
+        self.assertEqual(report.audio_only_outliers, ['b.mp4'])
+        self.assertEqual(report.silent_outliers, ['b.mp4'])
+
+    def test_unknown_files(self):
+        """测试无法探测的文件使报告不兼容"""
+        report = build_report({'a.mp4': make_info('a.mp4'), 'b.mp4': None})
+        self.assertFalse(report.compatible)
+        self.assertEqual(report.unknown, ['b.mp4'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+视频文件扫描测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.discovery import natural_key, discover_videos
+from myproject.video_merger import VideoMerger
+
+
+class TestDiscovery(unittest.TestCase):
+    """视频文件扫描测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def touch(self, *names):
+        for name in names:
+            path = os.path.join(self.temp_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'wb').close()
+
+    def test_natural_key(self):
+        """测试自然排序和大小写无关"""
+        names = ['Video10.mp4', 'video2.mp4', 'video1.mp4', 'a.mp4']
+        self.assertEqual(sorted(names, key=natural_key),
+                         ['a.mp4', 'video1.mp4', 'video2.mp4', 'Video10.mp4'])
+
+    def test_flat_scan_excludes_outputs(self):
+        """测试只扫描顶层并排除输出文件"""
+        self.touch('clip10.mp4', 'clip2.MOV', 'notes.txt', 'out.mp4', 'out_part2.mp4',
+                   'day1/clip1.mp4')
+        merger = VideoMerger(input_dir=self.temp_dir, output_dir=self.temp_dir, probe_cache=False,
+                             show_progress=False)
+        self.assertEqual(merger.get_video_files(exclude_output='out'), ['clip2.MOV', 'clip10.mp4'])
+
+    def test_recursive_scan_with_globs(self):
+        """测试递归扫描按目录自然排序，跳过隐藏文件和目录并应用包含/排除通配符"""
+        self.touch('day10/a1.mp4', 'day2/a2.mp4', 'day2/a10.mp4', 'day2/skip_a3.mp4',
+                   '.out_work/00001_a1.mp4', 'day2/._a2.mp4', 'top.mkv')
+        files = discover_videos(self.temp_dir, recursive=True, include=['*.mp4'],
+                                exclude=['skip_*'])
+        self.assertEqual(files, [os.path.join('day2', 'a2.mp4'), os.path.join('day2', 'a10.mp4'),
+                                 os.path.join('day10', 'a1.mp4')])
+
+    def test_large_folder_prints_summary(self):
+        """测试文件很多时只打印汇总而不是逐个打印"""
+        merger = VideoMerger(input_dir=self.temp_dir, output_dir=self.temp_dir, probe_cache=False,
+                             show_progress=False)
+        files = [f'clip{i}.mp4' for i in range(200)]
+        media_info = {os.path.join(self.temp_dir, name): None for name in files}
+        with mock.patch.object(merger, 'get_media_info', return_value=media_info), \
+                mock.patch('builtins.print') as mock_print:
+            video_info = merger.check_video_info(files)
+        self.assertEqual(len(video_info), 200)
+        self.assertLess(mock_print.call_count, 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
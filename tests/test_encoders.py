@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+编码器能力表测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.encoders import EncoderRegistry, EncoderCapability, parse_encoder_list
+
+ENCODERS_OUTPUT = """Encoders:
+ V..... = Video
+ ------
+ V....D libx264              libx264 H.264 / AVC / MPEG-4 AVC (codec h264)
+ V....D h264_nvenc           NVIDIA NVENC H.264 encoder (codec h264)
+ V....D h264_vaapi           H.264/AVC (VAAPI) (codec h264)
+ A....D aac                  AAC (Advanced Audio Coding)
+"""
+
+
+def fake_run(cmd, **kwargs):
+    """模拟FFmpeg：列出编码器；nvenc试编码失败，其余成功"""
+    if '-encoders' in cmd:
+        return mock.MagicMock(returncode=0, stdout=ENCODERS_OUTPUT, stderr='')
+    if 'h264_nvenc' in cmd:
+        return mock.MagicMock(returncode=1, stdout='', stderr='Cannot load libcuda.so.1')
+    return mock.MagicMock(returncode=0, stdout='', stderr='')
+
+
+class TestEncoders(unittest.TestCase):
+    """编码器能力表测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'encoders.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_parse_encoder_list(self):
+        """测试只解析编码器名称列，不受描述文字影响"""
+        self.assertEqual(parse_encoder_list(ENCODERS_OUTPUT),
+                         ['libx264', 'h264_nvenc', 'h264_vaapi', 'aac'])
+
+    @mock.patch('platform.system', return_value='Linux')
+    def test_listed_but_broken_encoder_is_not_selected(self, _):
+        """测试列出但试编码失败的编码器不会被选中"""
+        with mock.patch('subprocess.run', side_effect=fake_run):
+            registry = EncoderRegistry(self.path)
+            capabilities = {c.encoder: c for c in registry.capabilities()}
+            best = registry.best('h264')
+
+        self.assertFalse(capabilities['h264_nvenc'].available)
+        self.assertIn('libcuda', capabilities['h264_nvenc'].error)
+        self.assertFalse(capabilities['h264_qsv'].available)  # 未编译，不试编码
+        self.assertIn(best.encoder, ('libx264', 'h264_vaapi'))
+        self.assertEqual(registry.trial_runs, 3)
+
+    @mock.patch('platform.system', return_value='Linux')
+    def test_persisted_registry_skips_detection(self, _):
+        """测试能力表持久化后不再启动检测进程"""
+        with mock.patch('subprocess.run', side_effect=fake_run):
+            EncoderRegistry(self.path).capabilities()
+        with mock.patch('subprocess.run') as mock_run:
+            registry = EncoderRegistry(self.path)
+            registry.capabilities()
+            registry.best('h264')
+            self.assertEqual(mock_run.call_count, 0)
+
+    def test_best_prefers_fastest(self):
+        """测试选择实测最快的可用编码器，可禁止硬件编码"""
+        registry = EncoderRegistry(self.path)
+        registry._capabilities = [
+            EncoderCapability('none', 'libx264', 'h264', [], True, 120.0),
+            EncoderCapability('nvenc', 'h264_nvenc', 'h264', ['-preset', 'p4'], True, 600.0),
+            EncoderCapability('none', 'libx265', 'hevc', [], True, 40.0),
+        ]
+        self.assertEqual(registry.best('h264').encoder, 'h264_nvenc')
+        self.assertEqual(registry.best('h264', allow_hardware=False).encoder, 'libx264')
+        self.assertEqual(registry.best('hevc').encoder, 'libx265')
+        self.assertIsNone(registry.best('vp9'))
+        self.assertEqual(registry.best('h264', allow_hardware=False).encode_args('fast', 20),
+                         ['-c:v', 'libx264', '-preset', 'fast', '-crf', '20'])
+
+    @mock.patch('platform.system', return_value='Linux')
+    def test_startup_cost_not_counted_as_encode_speed(self, _):
+        """测试硬件编码器启动慢但每帧快时，扣除启动耗时后仍被选为最快"""
+        clock = [0.0]
+        # 编码器 -> (启动耗时, 每帧耗时)
+        costs = {'libx264': (0.05, 0.01), 'h264_vaapi': (0.8, 0.001)}
+
+        def timed_run(cmd, **kwargs):
+            if '-encoders' in cmd:
+                return mock.MagicMock(returncode=0, stdout=ENCODERS_OUTPUT, stderr='')
+            encoder = cmd[cmd.index('-c:v') + 1]
+            if encoder not in costs:
+                return mock.MagicMock(returncode=1, stdout='', stderr='unavailable')
+            if '-frames:v' in cmd:
+                frames = int(cmd[cmd.index('-frames:v') + 1])
+            else:
+                frames = float(cmd[cmd.index('-t') + 1]) * 30
+            startup, per_frame = costs[encoder]
+            clock[0] += startup + per_frame * frames
+            return mock.MagicMock(returncode=0, stdout='', stderr='')
+
+        with mock.patch('subprocess.run', side_effect=timed_run), \
+                mock.patch('myproject.encoders.time.perf_counter', side_effect=lambda: clock[0]):
+            registry = EncoderRegistry(self.path)
+            capabilities = {c.encoder: c for c in registry.capabilities()}
+            best = registry.best('h264')
+        self.assertEqual(best.encoder, 'h264_vaapi')
+        self.assertAlmostEqual(capabilities['h264_vaapi'].fps, 1000.0, delta=1.0)
+        self.assertAlmostEqual(capabilities['libx264'].fps, 100.0, delta=1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
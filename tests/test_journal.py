@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+任务日志与续跑测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.journal import JobJournal, journal_path, job_key
+from myproject.video_merger import VideoMerger
+
+
+class TestJournal(unittest.TestCase):
+    """任务日志测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = journal_path(self.temp_dir, 'out')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name, data=b'x' * 100):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_resume_validates_artifacts(self):
+        """测试产物完好时复用，被修改时重新执行"""
+        artifact = self.write('out_temp.mp4')
+        JobJournal(self.path, 'key').complete('merge', [artifact], note='ok')
+
+        self.assertEqual(JobJournal(self.path, 'key').resume('merge'), {'note': 'ok'})
+        self.write('out_temp.mp4', b'y' * 100)
+        journal = JobJournal(self.path, 'key')
+        self.assertIsNone(journal.resume('merge'))
+        self.assertNotIn('merge', JobJournal(self.path, 'key').stages)
+
+    def test_key_change_discards_journal(self):
+        """测试任务标识变化时丢弃旧日志"""
+        JobJournal(self.path, 'key').complete('probe')
+        self.assertIsNone(JobJournal(self.path, 'other').resume('probe'))
+
+    def test_job_key_depends_on_inputs_and_options(self):
+        """测试任务标识随输入和参数变化"""
+        self.write('1.mp4')
+        key = job_key(['1.mp4'], self.temp_dir, {'crf': 23})
+        self.assertEqual(key, job_key(['1.mp4'], self.temp_dir, {'crf': 23}))
+        self.assertNotEqual(key, job_key(['1.mp4'], self.temp_dir, {'crf': 20}))
+        self.write('1.mp4', b'x' * 200)
+        self.assertNotEqual(key, job_key(['1.mp4'], self.temp_dir, {'crf': 23}))
+
+    def test_merge_resumes_after_final_stage(self):
+        """测试合并结果已生成时跳过合并，只执行后续阶段，完成后删除日志"""
+        self.write('1.mp4')
+        merger = VideoMerger(self.temp_dir, self.temp_dir, probe_cache=False, show_progress=False)
+        with mock.patch.object(merger, '_merge_video_group') as mock_merge, \
+                mock.patch.object(merger, 'get_video_duration', return_value=60.0):
+            # 第一次运行：合并成功后在字幕阶段崩溃
+            def fake_merge(name, *args, **kwargs):
+                self.write(f"{name}.mp4")
+                return True
+            mock_merge.side_effect = fake_merge
+            with mock.patch.object(merger, 'generate_subtitle', side_effect=RuntimeError('killed')):
+                with self.assertRaises(RuntimeError):
+                    merger.merge_videos('out', auto_split=False, generate_subtitles=True)
+            self.assertEqual(mock_merge.call_count, 1)
+            self.assertTrue(os.path.exists(self.path))
+
+            # 第二次运行：复用合并结果
+            with mock.patch.object(merger, 'generate_subtitle', return_value=self.write('out.srt')):
+                result = merger.merge_videos('out', auto_split=False, generate_subtitles=True)
+            self.assertTrue(result)
+            self.assertEqual(mock_merge.call_count, 1)
+            self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
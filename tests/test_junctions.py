@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+拼接点预检测试
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.compatibility import fingerprint
+from myproject.media_probe import MediaInfo, StreamInfo
+from myproject.junctions import (JunctionCheck, Packet, analyze_junction, junction_list,
+                                 offending_clips, parse_packets)
+from myproject.video_merger import MergeOptions, VideoMerger
+
+
+def make_packets(video_end=2.0, audio_end=2.0, right_video_start=2.0, right_audio_start=2.0,
+                 jump_at=None):
+    """生成拼接点两侧各2秒的数据包：视频25fps，音频每包0.02秒"""
+    packets = []
+    for start, end in ((0.0, video_end), (right_video_start, right_video_start + 2.0)):
+        t = start
+        while t < end - 1e-9:
+            shift = 0.5 if jump_at is not None and t >= jump_at else 0.0
+            packets.append(Packet('video', t + shift, t + shift, 0.04))
+            t += 0.04
+    for start, end in ((0.0, audio_end), (right_audio_start, right_audio_start + 2.0)):
+        t = start
+        while t < end - 1e-9:
+            packets.append(Packet('audio', t, t, 0.02))
+            t += 0.02
+    return packets
+
+
+class TestJunctions(unittest.TestCase):
+    """拼接点预检测试类"""
+
+    def test_clean_junction(self):
+        """测试音视频在拼接点处连续时没有异常"""
+        check = analyze_junction(0, 'a.mp4', 'b.mp4', make_packets(), 2.0)
+        self.assertTrue(check.ok)
+        self.assertEqual(check.offenders, ())
+        self.assertAlmostEqual(check.drift, 0.0, places=6)
+
+    def test_short_audio_in_left_clip_causes_drift(self):
+        """测试左片段音频比视频短时，拼接后音频提前，归咎于左片段"""
+        check = analyze_junction(0, 'a.mp4', 'b.mp4', make_packets(audio_end=1.7), 2.0)
+        self.assertFalse(check.ok)
+        self.assertAlmostEqual(check.drift, 0.3, places=6)
+        self.assertIn('音画偏移', check.reason)
+        self.assertEqual(check.offenders, ('a.mp4',))
+
+    def test_timestamp_jump(self):
+        """测试时间戳跳变被标记，两个片段都需要规范化"""
+        check = analyze_junction(0, 'a.mp4', 'b.mp4', make_packets(jump_at=2.5), 2.0)
+        self.assertFalse(check.ok)
+        self.assertIn('时间戳跳变', check.reason)
+        self.assertEqual(check.offenders, ('a.mp4', 'b.mp4'))
+
+    def test_parse_packets_and_list(self):
+        """测试解析ffprobe输出和生成样本列表"""
+        output = json.dumps({'packets': [
+            {'codec_type': 'video', 'pts_time': '0.040000', 'dts_time': '0.000000',
+             'duration_time': '0.040000'},
+            {'codec_type': 'audio', 'pts_time': 'N/A', 'dts_time': 'N/A'},
+        ]})
+        self.assertEqual(parse_packets(output), [Packet('video', 0.04, 0.0, 0.04)])
+        content = junction_list('/v/a.mp4', 60.0, "/v/b'.mp4", 2.0)
+        self.assertIn("file '/v/a.mp4'\ninpoint 58.000000", content)
+        self.assertIn("file '/v/b'\\''.mp4'\noutpoint 2.000000", content)
+
+    def test_offending_clips_deduplicated(self):
+        """测试异常片段去重并保持顺序"""
+        checks = [JunctionCheck(0, 'a', 'b', offenders=('a', 'b'), reason='x'),
+                  JunctionCheck(1, 'b', 'c'),
+                  JunctionCheck(2, 'c', 'd', offenders=('d',), reason='y')]
+        self.assertEqual(offending_clips(checks), ['a', 'b', 'd'])
+
+
+class TestMergerJunctions(unittest.TestCase):
+    """合并前拼接点修复测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.merger = VideoMerger(input_dir=self.temp_dir, output_dir=self.temp_dir,
+                                  probe_cache=False, show_progress=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_no_bad_junctions_keeps_files(self):
+        """测试拼接点都正常时直接返回原列表"""
+        files = ['a.mp4', 'b.mp4']
+        with mock.patch.object(self.merger, 'validate_junctions',
+                               return_value=[JunctionCheck(0, 'a.mp4', 'b.mp4')]):
+            self.assertIs(self.merger._repair_junctions('out', files), files)
+
+    def test_repair_pins_majority_level_and_refs(self):
+        """测试重编码拼接点异常的片段时沿用多数类的 level 和参考帧数，结果不一致时修复失败"""
+        video = StreamInfo(index=0, codec_type='video', codec_name='h264', level=40, refs=4)
+        majority = MediaInfo('a.mp4', 10.0, streams=(video,))
+        report = mock.MagicMock()
+        report.majority.fingerprint = fingerprint(majority)
+        report.majority.files = ['a.mp4']
+        fixed = os.path.join(self.temp_dir, 'b_fixed.mp4')
+        open(fixed, 'w').close()
+        offender = os.path.join(self.temp_dir, 'b.mp4')
+        check = JunctionCheck(0, 'a.mp4', offender, offenders=(offender,), reason='x')
+        with mock.patch.object(self.merger, 'validate_junctions', return_value=[check]), \
+                mock.patch.object(self.merger, 'get_compatibility_report', return_value=report), \
+                mock.patch.object(self.merger, 'get_media_info',
+                                  return_value={'a.mp4': majority}), \
+                mock.patch('myproject.video_merger.ClipNormalizer.normalize',
+                           return_value={offender: fixed}) as mock_normalize, \
+                mock.patch.object(self.merger.media_probe, 'probe',
+                                  return_value=majority._replace(path=fixed)) as mock_probe:
+            self.assertEqual(self.merger._repair_junctions('out', ['a.mp4', 'b.mp4']),
+                             ['a.mp4', fixed])
+            self.assertEqual(mock_normalize.call_args.kwargs['reference'], video)
+
+            mock_probe.return_value = MediaInfo(fixed, 10.0, streams=(video._replace(refs=1),))
+            self.assertIsNone(self.merger._repair_junctions('out', ['a.mp4', 'b.mp4']))
+
+    def test_merge_group_falls_back_to_encode_when_repair_fails(self):
+        """测试拼接点无法修复时改为重编码"""
+        with mock.patch.object(self.merger, 'check_video_info', return_value=[]), \
+                mock.patch.object(self.merger, '_remux_containers',
+                                  side_effect=lambda name, files: files), \
+                mock.patch.object(self.merger, 'check_codecs_compatibility', return_value=True), \
+                mock.patch.object(self.merger, '_repair_junctions', return_value=None), \
+                mock.patch.object(self.merger, '_build_encode_command',
+                                  return_value=['ffmpeg']) as mock_encode, \
+                mock.patch.object(self.merger, '_run_ffmpeg', return_value=False):
+            options = MergeOptions(validate_junctions=True, repair_timestamps=False)
+            self.merger._merge_video_group('out', ['a.mp4', 'b.mp4'], options)
+        mock_encode.assert_called_once()
+        self.assertIn('encode', self.merger.metrics.strategies)
+
+
+if __name__ == '__main__':
+    unittest.main()
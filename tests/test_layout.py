@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+MP4输出布局测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.layout import layout_args, movflags
+from myproject.media_probe import MediaInfo
+from myproject.video_merger import VideoMerger
+
+
+class TestLayout(unittest.TestCase):
+    """MP4输出布局测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.merger = VideoMerger(input_dir=self.temp_dir, output_dir=self.temp_dir,
+                                  probe_cache=False, show_progress=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_layout_args(self):
+        """测试各布局对应的movflags"""
+        self.assertEqual(layout_args('faststart'), ['-movflags', '+faststart'])
+        self.assertEqual(layout_args('fragmented'), ['-movflags', '+frag_keyframe+empty_moov'])
+        self.assertEqual(layout_args('plain'), [])
+        with self.assertRaises(ValueError):
+            movflags('bogus')
+        with self.assertRaises(ValueError):
+            VideoMerger(input_dir=self.temp_dir, output_dir=self.temp_dir, probe_cache=False,
+                        show_progress=False, output_layout='bogus')
+
+    def test_copy_command_layout(self):
+        """测试拷贝命令默认使用最终输出布局，可以指定中间文件布局"""
+        cmd = self.merger._build_copy_command('list.txt', 'out.mp4')
+        self.assertEqual(cmd[cmd.index('-movflags') + 1], '+faststart')
+        cmd = self.merger._build_copy_command('list.txt', 'out.mp4', 'fragmented')
+        self.assertEqual(cmd[cmd.index('-movflags') + 1], '+frag_keyframe+empty_moov')
+        cmd = self.merger._build_copy_command('list.txt', 'out.mp4', 'plain')
+        self.assertNotIn('-movflags', cmd)
+
+    def test_temp_output_is_fragmented_when_split_expected(self):
+        """测试预计需要分割时合并结果使用中间文件布局"""
+        videos = ['a.mp4', 'b.mp4']
+        paths = [os.path.join(self.temp_dir, v) for v in videos]
+        infos = {path: MediaInfo(path, 4000.0, size=1000) for path in paths}
+        with mock.patch.object(self.merger, 'get_media_info', return_value=infos), \
+                mock.patch.object(self.merger, '_merge_video_group',
+                                  return_value=False) as mock_merge:
+            self.merger.merge_videos('out', video_files=videos, resume=False,
+                                     split_max_duration=7200)
+            self.assertEqual(mock_merge.call_args.kwargs['layout'], 'fragmented')
+            self.merger.merge_videos('out', video_files=videos, resume=False, auto_split=False)
+            self.assertEqual(mock_merge.call_args.kwargs['layout'], 'faststart')
+
+
+if __name__ == '__main__':
+    unittest.main()
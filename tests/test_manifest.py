@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+合并清单与增量合并测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.media_probe import MediaInfo, StreamInfo
+from myproject.compatibility import fingerprint
+from myproject.manifest import MergeManifest, ClipRecord, manifest_path
+from myproject.video_merger import VideoMerger
+
+
+def make_info(path, width=1920, size=1000):
+    stream = StreamInfo(index=0, codec_type='video', codec_name='h264', profile='High',
+                        width=width, height=1080, pix_fmt='yuv420p',
+                        sample_aspect_ratio='1:1', frame_rate='25/1', time_base='1/12800')
+    return MediaInfo(path=path, duration=60.0, size=size, streams=(stream,))
+
+
+def record(name, width=1920):
+    return ClipRecord(name, 1000, 60.0, fingerprint(make_info(name, width)))
+
+
+class TestManifest(unittest.TestCase):
+    """合并清单测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_roundtrip(self):
+        """测试保存和读取后指纹仍然相等"""
+        path = manifest_path(self.temp_dir, 'out')
+        MergeManifest('out.mp4', [record('1.mp4')], 1000, 60.0,
+                      record('1.mp4').fingerprint).save(path)
+        manifest = MergeManifest.load(path)
+        self.assertEqual(manifest.clips, [record('1.mp4')])
+        self.assertEqual(manifest.output_fingerprint, record('1.mp4').fingerprint)
+
+    def test_prefix_length(self):
+        """测试只有严格扩展才返回前缀长度"""
+        manifest = MergeManifest('out.mp4', [record('1.mp4'), record('2.mp4')])
+        clips = [record('1.mp4'), record('2.mp4'), record('3.mp4')]
+        self.assertEqual(manifest.prefix_length(clips), 2)
+        self.assertIsNone(manifest.prefix_length([clips[0], clips[2], clips[1]]))
+        self.assertIsNone(manifest.prefix_length([record('1.mp4')]))
+        self.assertIsNone(manifest.prefix_length([record('1.mp4'), record('2.mp4', width=1280)]))
+
+    def test_plan_incremental(self):
+        """测试增量合并只追加新增片段，新片段不兼容时回退"""
+        with open(os.path.join(self.temp_dir, 'out.mp4'), 'wb') as f:
+            f.write(b'\0' * 2000)
+        MergeManifest('out.mp4', [record('1.mp4'), record('2.mp4')], 2000, 120.0,
+                      record('1.mp4').fingerprint).save(manifest_path(self.temp_dir, 'out'))
+        merger = VideoMerger(self.temp_dir, self.temp_dir, probe_cache=False, show_progress=False)
+
+        def media_info(widths):
+            return lambda files: {os.path.join(self.temp_dir, v): make_info(v, w)
+                                  for v, w in zip(files, widths)}
+
+        files = ['1.mp4', '2.mp4', '3.mp4']
+        with mock.patch.object(merger, 'get_media_info',
+                               side_effect=media_info([1920, 1920, 1920])):
+            self.assertEqual(merger._plan_incremental('out', files),
+                             (os.path.join(self.temp_dir, 'out.mp4'), ['3.mp4']))
+        with mock.patch.object(merger, 'get_media_info',
+                               side_effect=media_info([1920, 1920, 1280])):
+            self.assertIsNone(merger._plan_incremental('out', files))
+        with mock.patch.object(merger, 'get_media_info', side_effect=media_info([1920, 1920])):
+            self.assertEqual(merger._plan_incremental('out', files[:2])[1], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
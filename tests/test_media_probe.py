@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+媒体探测器测试
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.media_probe import MediaProbe, MediaInfo
+
+
+FFPROBE_OUTPUT = {
+    'streams': [
+        {'index': 0, 'codec_type': 'video', 'codec_name': 'h264', 'width': 1920,
+         'height': 1080, 'pix_fmt': 'yuv420p', 'time_base': '1/12800', 'bit_rate': '4000000',
+         'level': 40, 'refs': 4},
+        {'index': 1, 'codec_type': 'audio', 'codec_name': 'aac', 'sample_rate': '44100',
+         'channels': 2, 'time_base': '1/44100', 'bit_rate': '128000', 'start_time': '0.500000',
+         'duration': '122.956000'},
+    ],
+    'format': {'format_name': 'mov,mp4,m4a,3gp,3g2,mj2', 'duration': '123.456',
+               'size': '4096', 'bit_rate': '4128000'},
+}
+
+
+class TestMediaProbe(unittest.TestCase):
+    """媒体探测器测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.tmp = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
+        self.tmp.write(b'\0' * 4096)
+        self.tmp.close()
+        self.probe = MediaProbe()
+
+    def tearDown(self):
+        """测试后清理"""
+        os.remove(self.tmp.name)
+
+    def test_parse(self):
+        """测试解析ffprobe的JSON输出"""
+        info = MediaProbe.parse('a.mp4', FFPROBE_OUTPUT)
+        self.assertAlmostEqual(info.duration, 123.456)
+        self.assertEqual(info.video_codec, 'h264')
+        self.assertEqual(info.audio_codec, 'aac')
+        self.assertEqual((info.video.width, info.video.height), (1920, 1080))
+        self.assertEqual((info.video.level, info.video.refs), (40, 4))
+        self.assertEqual(info.audio.sample_rate, 44100)
+        self.assertEqual((info.audio.start_time, info.video.start_time), (0.5, 0.0))
+        self.assertEqual(MediaInfo.from_dict(json.loads(json.dumps(info.to_dict()))), info)
+
+    def test_probe_runs_ffprobe_once(self):
+        """测试同一文件只调用一次ffprobe"""
+        with mock.patch('subprocess.run') as mock_run:
+            mock_run.return_value = mock.MagicMock(returncode=0, stdout=json.dumps(FFPROBE_OUTPUT))
+            first = self.probe.probe(self.tmp.name)
+            second = self.probe.probe(self.tmp.name)
+            self.assertEqual(mock_run.call_count, 1)
+            self.assertEqual(first, second)
+
+    def test_probe_missing_file(self):
+        """测试文件不存在时返回None"""
+        self.assertIsNone(self.probe.probe('/nonexistent/video.mp4'))
+
+
+if __name__ == '__main__':
+    unittest.main()
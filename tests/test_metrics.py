@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分阶段指标测试
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.metrics import JobMetrics, MergeResult
+
+
+class TestMetrics(unittest.TestCase):
+    """分阶段指标测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_stage_records_time_and_bytes(self):
+        """测试阶段记录耗时、子进程CPU时间和读写字节数"""
+        metrics = JobMetrics('job')
+        with metrics.stage('merge') as record:
+            subprocess.run([sys.executable, '-c', 'pass'])
+            record.add_read(100)
+            record.add_written(50)
+        with metrics.stage('merge') as record:
+            record.add_read(10)
+
+        totals = metrics.stage_totals()['merge']
+        self.assertEqual(totals['count'], 2)
+        self.assertEqual(totals['bytes_read'], 110)
+        self.assertEqual(totals['bytes_written'], 50)
+        self.assertGreater(totals['wall_time'], 0)
+        if os.name == 'posix':
+            self.assertGreaterEqual(totals['child_user_time'], 0)
+
+    def test_strategy(self):
+        """测试策略去重并按出现顺序拼接"""
+        metrics = JobMetrics('job')
+        self.assertEqual(metrics.strategy, 'none')
+        metrics.add_strategy('copy')
+        metrics.add_strategy('selective')
+        metrics.add_strategy('copy')
+        self.assertEqual(metrics.strategy, 'copy+selective')
+
+    def test_write_jsonl_appends(self):
+        """测试JSON Lines每次追加一行"""
+        path = os.path.join(self.temp_dir, 'metrics.jsonl')
+        metrics = JobMetrics('job')
+        with metrics.stage('probe'):
+            pass
+        metrics.write_jsonl(path, success=True)
+        metrics.write_jsonl(path, success=False)
+
+        with open(path, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['job'], 'job')
+        self.assertIn('probe', rows[0]['stages'])
+        self.assertFalse(rows[1]['success'])
+
+    def test_write_prometheus(self):
+        """测试Prometheus textfile格式"""
+        path = os.path.join(self.temp_dir, 'merge.prom')
+        metrics = JobMetrics('a"b')
+        metrics.add_strategy('copy')
+        with metrics.stage('merge') as record:
+            record.add_written(1024)
+        metrics.write_prometheus(path, success=True)
+
+        with open(path, encoding='utf-8') as f:
+            content = f.read()
+        self.assertIn('video_merger_job_success{job="a\\"b"} 1', content)
+        self.assertIn('strategy="copy"', content)
+        self.assertIn('video_merger_stage_bytes_written{job="a\\"b",stage="merge"} 1024', content)
+        self.assertFalse(os.path.exists(path + '.tmp'))
+
+    def test_merge_result_bool(self):
+        """测试MergeResult的布尔值与success一致"""
+        metrics = JobMetrics('job')
+        self.assertTrue(MergeResult(True, ['a.mp4'], metrics))
+        self.assertFalse(MergeResult(False, [], metrics))
+        self.assertEqual(MergeResult(True, ['a.mp4'], metrics).to_dict()['outputs'], ['a.mp4'])
+
+
+if __name__ == '__main__':
+    unittest.main()
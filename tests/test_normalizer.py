@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+片段规范化测试
+"""
+
+import os
+import sys
+import unittest
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.compatibility import Fingerprint
+from myproject.encoders import EncoderCapability
+from myproject.media_probe import MediaInfo, StreamInfo
+from myproject.normalizer import ClipNormalizer, build_encode_command, matches_reference
+
+TARGET = Fingerprint(
+    video=('h264', 'High', 1920, 1080, 'yuv420p', '1:1', '25/1', '1/12800'),
+    audio=('aac', 'LC', 44100, 2, 'stereo'),
+)
+
+
+class TestClipNormalizer(unittest.TestCase):
+    """片段规范化测试类"""
+
+    def test_build_command_matches_target(self):
+        """测试规范化命令包含目标格式的全部参数"""
+        normalizer = ClipNormalizer('/tmp/work', threads_per_job=3, encode_preset='veryfast',
+                                    crf=20)
+        cmd = normalizer.build_command('in.mkv', 'out.mp4', TARGET)
+        self.assertEqual(cmd[-1], 'out.mp4')
+        self.assertIn('libx264', cmd)
+        self.assertEqual(cmd[cmd.index('-pix_fmt') + 1], 'yuv420p')
+        self.assertEqual(cmd[cmd.index('-r') + 1], '25/1')
+        self.assertEqual(cmd[cmd.index('-profile:v') + 1], 'high')
+        self.assertEqual(cmd[cmd.index('-video_track_timescale') + 1], '12800')
+        self.assertEqual(cmd[cmd.index('-ar') + 1], '44100')
+        self.assertEqual(cmd[cmd.index('-threads') + 1], '3')
+        self.assertIn('setsar=1/1', cmd[cmd.index('-vf') + 1])
+
+    def test_reference_pins_level_and_refs(self):
+        """测试重编码沿用多数类视频流的 level 和参考帧数，并据此检查结果"""
+        reference = StreamInfo(index=0, codec_type='video', codec_name='h264', level=40, refs=4)
+        cmd = ClipNormalizer('/tmp/work').build_command('in.mkv', 'out.mp4', TARGET,
+                                                        reference=reference)
+        self.assertEqual(cmd[cmd.index('-level:v') + 1], '4.0')
+        self.assertEqual(cmd[cmd.index('-x264-params') + 1], 'ref=4')
+        self.assertNotIn('-level:v', ClipNormalizer('/tmp/work').build_command(
+            'in.mkv', 'out.mp4', TARGET))
+
+        encoded = MediaInfo('out.mp4', 10.0, streams=(reference._replace(refs=3),))
+        self.assertFalse(matches_reference(encoded, reference))
+        self.assertTrue(matches_reference(encoded, reference._replace(refs=3)))
+        self.assertTrue(matches_reference(encoded, None))
+
+    def test_audio_only_command_copies_video(self):
+        """测试视频已一致时直接拷贝视频、只转码音频"""
+        cmd = ClipNormalizer('/tmp/work').build_command('in.mp4', 'out.mp4', TARGET,
+                                                        copy_video=True)
+        self.assertEqual(cmd[cmd.index('-c:v') + 1], 'copy')
+        self.assertNotIn('libx264', cmd)
+        self.assertEqual(cmd[cmd.index('-c:a') + 1], 'aac')
+
+    def test_silence_command_adds_anullsrc(self):
+        """测试没有音轨的片段补上与目标一致的静音音轨，视频直接拷贝"""
+        cmd = ClipNormalizer('/tmp/work').build_command('in.mp4', 'out.mp4', TARGET,
+                                                        copy_video=True, silence=12.5)
+        self.assertIn('anullsrc=channel_layout=stereo:sample_rate=44100', cmd)
+        self.assertEqual(cmd[cmd.index('-t') + 1], '12.500000')
+        self.assertIn('1:a:0', cmd)
+        self.assertIn('-shortest', cmd)
+        self.assertEqual(cmd[cmd.index('-c:v') + 1], 'copy')
+
+    def test_hw_encoder_command(self):
+        """测试使用硬件编码器时其自带的滤镜接在缩放之后，不再使用libx264的参数"""
+        vaapi = EncoderCapability('vaapi', 'h264_vaapi', 'h264',
+                                  ['-vaapi_device', '/dev/dri/renderD128',
+                                   '-vf', 'format=nv12,hwupload'],
+                                  True, 400.0)
+        cmd = build_encode_command(['-i', 'in.mkv'], 'out.mp4', TARGET, 2, hw_encoder=vaapi)
+        self.assertEqual(cmd[cmd.index('-c:v') + 1], 'h264_vaapi')
+        self.assertEqual(cmd.count('-vf'), 1)
+        self.assertTrue(cmd[cmd.index('-vf') + 1].endswith('setsar=1/1,format=nv12,hwupload'))
+        self.assertIn('-vaapi_device', cmd)
+        self.assertNotIn('-crf', cmd)
+        self.assertNotIn('-pix_fmt', cmd)
+        self.assertEqual(cmd[cmd.index('-video_track_timescale') + 1], '12800')
+
+    def test_unknown_encoder(self):
+        """测试目标编码没有可用编码器时返回None"""
+        target = TARGET._replace(video=('prores',) + TARGET.video[1:])
+        self.assertIsNone(ClipNormalizer('/tmp/work').build_command('in.mov', 'out.mp4', target))
+
+
+if __name__ == '__main__':
+    unittest.main()
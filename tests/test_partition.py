@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+片段分组测试
+"""
+
+import os
+import sys
+import unittest
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.partition import partition_contiguous
+
+
+class TestPartition(unittest.TestCase):
+    """片段分组测试类"""
+
+    def test_balanced(self):
+        """测试等长片段均匀分组"""
+        self.assertEqual(partition_contiguous([10] * 6, 3), [(0, 2), (2, 4), (4, 6)])
+
+    def test_contiguous_and_complete(self):
+        """测试分组连续且覆盖全部片段"""
+        durations = [100, 1, 1, 1, 1, 30, 30, 5]
+        ranges = partition_contiguous(durations, 4)
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], len(durations))
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+        self.assertTrue(all(start < end for start, end in ranges))
+
+    def test_more_parts_than_clips(self):
+        """测试分组数超过片段数"""
+        self.assertEqual(partition_contiguous([5, 5], 8), [(0, 1), (1, 2)])
+        self.assertEqual(partition_contiguous([], 3), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+合并规划测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.media_probe import MediaInfo, StreamInfo
+from myproject.encoders import EncoderRegistry
+from myproject.planner import PARALLEL_ENCODE_GAIN, HostCalibration, MergePlanner, MergePlan
+
+
+def make_info(path, codec='h264', width=1280, duration=600.0, size=100 * 1024 * 1024):
+    stream = StreamInfo(index=0, codec_type='video', codec_name=codec, profile='High',
+                        width=width, height=720, pix_fmt='yuv420p',
+                        sample_aspect_ratio='1:1', frame_rate='25/1', time_base='1/12800')
+    return MediaInfo(path=path, duration=duration, size=size, streams=(stream,))
+
+
+class TestPlanner(unittest.TestCase):
+    """合并规划测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        registry = EncoderRegistry(os.path.join(self.temp_dir, 'encoders.json'))
+        registry._capabilities = []
+        self.calibration = HostCalibration(os.path.join(self.temp_dir, 'calibration.json'),
+                                           registry)
+        # 720p下 faster 100fps，磁盘 100MB/s
+        self.calibration.preset_fps = {'ultrafast': 400.0, 'faster': 100.0, 'medium': 50.0,
+                                       'slow': 25.0}
+        self.calibration.disk_throughput = {str(os.stat(self.temp_dir).st_dev): 100 * 1024 * 1024}
+        self.planner = MergePlanner(self.calibration, calibrate=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def plan(self, infos, **kwargs):
+        names = [f"{i}.mp4" for i in range(len(infos))]
+        return self.planner.plan('out', names, dict(zip(names, infos)), self.temp_dir, **kwargs)
+
+    def test_compatible_clips_use_copy(self):
+        """测试兼容片段选择直接拷贝，耗时按读写字节估计"""
+        plan = self.plan([make_info('a'), make_info('b')])
+        self.assertEqual(plan.strategy, 'copy')
+        self.assertAlmostEqual(plan.chosen.wall_time, 4.0)
+        self.assertEqual(plan.chosen.output_size, 200 * 1024 * 1024)
+
+    def test_outlier_uses_selective(self):
+        """测试少数不兼容片段选择选择性规范化"""
+        plan = self.plan([make_info('a'), make_info('b'), make_info('c', width=1920)])
+        self.assertEqual(plan.strategy, 'selective')
+        self.assertEqual(plan.outliers, ['2.mp4'])
+        copy = next(e for e in plan.estimates if e.strategy == 'copy')
+        self.assertFalse(copy.correct)
+        # 1920x720是1280x720像素的1.5倍：15000帧 / (100 / 1.5) fps + 拷贝6秒
+        self.assertAlmostEqual(plan.chosen.wall_time, 15000 / (100 / 1.5) + 6.0)
+
+    def test_junction_offenders_use_selective(self):
+        """测试拼接点异常的片段使拷贝不再正确，只重编码这些片段"""
+        plan = self.plan([make_info('a'), make_info('b'), make_info('c')],
+                         junction_offenders=['1.mp4'])
+        self.assertEqual(plan.strategy, 'selective')
+        self.assertEqual(plan.outliers, ['1.mp4'])
+        self.assertTrue(plan.merge_options()['validate_junctions'])
+        copy = next(e for e in plan.estimates if e.strategy == 'copy')
+        self.assertFalse(copy.correct)
+        self.assertIn('拼接点', copy.reason)
+
+    def test_unencodable_majority_falls_back_to_encode(self):
+        """测试多数格式无法编码时只能全部重编码"""
+        plan = self.plan([make_info('a', codec='prores'), make_info('b', codec='prores'),
+                          make_info('c')])
+        self.assertEqual(plan.strategy, 'encode')
+        self.assertEqual(plan.encode_preset, 'faster')
+        self.assertTrue(plan.merge_options()['force_encode'])
+
+    def test_deadline_picks_best_preset_in_time(self):
+        """测试给出期限时选择期限内质量最高的预设"""
+        infos = [make_info('a'), make_info('b')]
+        # 30000帧：medium 50fps 需要600秒；fast未校准，按已测预设的平均比例推算约80fps
+        plan = self.plan(infos, force_encode=True, deadline=400)
+        self.assertEqual((plan.strategy, plan.encode_preset), ('encode', 'fast'))
+        plan = self.plan(infos, force_encode=True, deadline=700)
+        self.assertEqual(plan.encode_preset, 'medium')
+
+    def test_encode_processes_in_estimate(self):
+        """测试全部重编码的估计计入并行分组编码的进程数，并写入计划"""
+        infos = [make_info('a'), make_info('b')]
+        plan = self.plan(infos, force_encode=True, encode_processes=2)
+        # 每个分组15000帧、100fps；两个进程平分 1 + GAIN 倍的吞吐量，再加分组写出和拷贝拼接6秒
+        self.assertAlmostEqual(plan.chosen.wall_time, 150 * 2 / (1 + PARALLEL_ENCODE_GAIN) + 6.0)
+        self.assertLess(plan.chosen.wall_time, self.plan(infos, force_encode=True).chosen.wall_time)
+        self.assertEqual(plan.merge_options()['encode_processes'], 2)
+        self.assertEqual(MergePlan.from_dict(plan.to_dict()).encode_processes, 2)
+
+    def test_plan_does_not_calibrate(self):
+        """测试规划时不试编码也不测量磁盘，未校准时使用默认估计"""
+        registry = EncoderRegistry(os.path.join(self.temp_dir, 'encoders.json'))
+        registry._capabilities = []
+        calibration = HostCalibration(os.path.join(self.temp_dir, 'empty.json'), registry)
+        with mock.patch.object(calibration, 'calibrate_encoders') as mock_encoders, \
+                mock.patch.object(calibration, 'calibrate_disk') as mock_disk:
+            media_info = {'0.mp4': make_info('a'), '1.mp4': make_info('b')}
+            planner = MergePlanner(calibration)
+            plan = planner.plan('out', list(media_info), media_info, self.temp_dir)
+        mock_encoders.assert_not_called()
+        mock_disk.assert_not_called()
+        self.assertFalse(plan.calibrated)
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'empty.json')))
+
+    def test_calibrate_measures_each_disk_once(self):
+        """测试显式校准时同一磁盘上的多个目录只测量一次"""
+        with mock.patch.object(self.calibration, 'calibrate_encoders') as mock_encoders, \
+                mock.patch.object(self.calibration, 'calibrate_disk',
+                                  return_value=1024.0) as mock_disk:
+            self.calibration.calibrate([self.temp_dir, os.path.join(self.temp_dir, '.')])
+        mock_encoders.assert_called_once()
+        mock_disk.assert_called_once_with(self.temp_dir)
+
+    def test_roundtrip(self):
+        """测试计划序列化后可以恢复"""
+        plan = self.plan([make_info('a'), make_info('b')])
+        restored = MergePlan.from_dict(plan.to_dict())
+        self.assertEqual(restored.strategy, plan.strategy)
+        self.assertEqual(restored.estimates, plan.estimates)
+        self.assertEqual(restored.chosen, plan.chosen)
+        self.assertEqual(restored.merge_options()['video_files'], ['0.mp4', '1.mp4'])
+
+
+if __name__ == '__main__':
+    unittest.main()
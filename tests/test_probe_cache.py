@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+探测缓存测试
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.media_probe import MediaInfo, StreamInfo
+from myproject.probe_cache import ProbeCache
+
+
+class TestProbeCache(unittest.TestCase):
+    """探测缓存测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ProbeCache(os.path.join(self.tmpdir.name, 'cache.sqlite3'), max_entries=2)
+        self.videos = []
+        for i in range(3):
+            path = os.path.join(self.tmpdir.name, f'video{i}.mp4')
+            with open(path, 'wb') as f:
+                f.write(b'\0' * 2048)
+            self.videos.append(path)
+
+    def tearDown(self):
+        """测试后清理"""
+        self.cache.close()
+        self.tmpdir.cleanup()
+
+    def _info(self, path):
+        return MediaInfo(path=path, duration=60.0,
+                         streams=(StreamInfo(index=0, codec_type='video', codec_name='h264'),))
+
+    def test_roundtrip_and_directory_lookup(self):
+        """测试写入后批量查询"""
+        self.cache.put_many({path: self._info(path) for path in self.videos[:2]})
+        hits = self.cache.get_many(self.videos)
+        self.assertEqual(set(hits), set(self.videos[:2]))
+        self.assertEqual(hits[self.videos[0]].video_codec, 'h264')
+        self.assertEqual(len(self.cache.get_directory(self.tmpdir.name)), 2)
+
+    def test_invalidate_on_change(self):
+        """测试文件变化后缓存失效"""
+        self.cache.put(self.videos[0], self._info(self.videos[0]))
+        with open(self.videos[0], 'ab') as f:
+            f.write(b'\0')
+        self.assertIsNone(self.cache.get(self.videos[0]))
+
+    def test_lru_eviction(self):
+        """测试超过条目上限时淘汰最久未使用的条目"""
+        self.cache.put(self.videos[0], self._info(self.videos[0]))
+        self.cache.put(self.videos[1], self._info(self.videos[1]))
+        self.cache.get(self.videos[0])
+        self.cache.put(self.videos[2], self._info(self.videos[2]))
+        hits = self.cache.get_many(self.videos)
+        self.assertEqual(set(hits), {self.videos[0], self.videos[2]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+进度事件测试
+"""
+
+import os
+import sys
+import unittest
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.progress import ProgressParser, run_ffmpeg, with_progress_output
+
+PROGRESS_BLOCK = """frame=250
+fps=50.00
+bitrate=1200.5kbits/s
+total_size=1048576
+out_time_us=10000000
+out_time_ms=10000000
+out_time=00:00:10.000000
+speed=2.5x
+progress=continue
+"""
+
+
+class TestProgress(unittest.TestCase):
+    """进度事件测试类"""
+
+    def test_parse_block(self):
+        """测试解析一个进度块"""
+        parser = ProgressParser('job1', expected_duration=40.0)
+        events = [e for e in (parser.feed(line) for line in PROGRESS_BLOCK.splitlines()) if e]
+        self.assertEqual(len(events), 1)
+        event = events[0]
+        self.assertEqual(event.job, 'job1')
+        self.assertAlmostEqual(event.out_time, 10.0)
+        self.assertAlmostEqual(event.speed, 2.5)
+        self.assertAlmostEqual(event.fps, 50.0)
+        self.assertAlmostEqual(event.bitrate, 1200.5)
+        self.assertEqual(event.total_size, 1048576)
+        self.assertAlmostEqual(event.percent, 25.0)
+        self.assertFalse(event.finished)
+
+    def test_na_values(self):
+        """测试N/A字段"""
+        parser = ProgressParser()
+        event = (parser.feed('speed=N/A') or parser.feed('out_time_us=N/A')
+                 or parser.feed('progress=end'))
+        self.assertIsNone(event.speed)
+        self.assertEqual(event.out_time, 0.0)
+        self.assertTrue(event.finished)
+
+    def test_insert_progress_before_output(self):
+        """测试进度参数插入在输出文件之前"""
+        cmd = with_progress_output(['ffmpeg', '-i', 'in.mp4', 'out.mp4'])
+        self.assertEqual(cmd[-1], 'out.mp4')
+        self.assertEqual(cmd[cmd.index('-progress') + 1], 'pipe:1')
+
+    def test_run_dispatches_events(self):
+        """测试运行子进程并分发事件，标准错误单独收集"""
+        script = ("import sys\n"
+                  "sys.stderr.write('log line\\n')\n"
+                  f"sys.stdout.write({PROGRESS_BLOCK!r})\n"
+                  "sys.stdout.write('out_time_us=20000000\\nprogress=end\\n')\n")
+        events = []
+        result = run_ffmpeg([sys.executable, '-c', script, 'out.mp4'], 'job', 20.0, [events.append])
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stderr_tail, ['log line'])
+        self.assertEqual(len(events), 2)
+        self.assertTrue(events[-1].finished)
+        self.assertEqual(events[-1].percent, 100.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
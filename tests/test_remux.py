@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+容器转封装测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.media_probe import MediaInfo, StreamInfo
+from myproject.compatibility import build_report
+from myproject.remux import build_remux_command, plan_remux, remuxed_info, target_timescale
+from myproject.video_merger import VideoMerger
+
+MP4 = 'mov,mp4,m4a,3gp,3g2,mj2'
+
+
+def make_info(path, format_name=MP4, time_base='1/12800', audio_codec='aac'):
+    streams = (
+        StreamInfo(index=0, codec_type='video', codec_name='h264', profile='High', width=1920,
+                   height=1080, pix_fmt='yuv420p', sample_aspect_ratio='1:1', frame_rate='25/1',
+                   time_base=time_base),
+        StreamInfo(index=1, codec_type='audio', codec_name=audio_codec, profile='LC',
+                   sample_rate=44100, channels=2, channel_layout='stereo'),
+    )
+    return MediaInfo(path=path, duration=60.0, format_name=format_name, size=1000, streams=streams)
+
+
+class TestRemux(unittest.TestCase):
+    """容器转封装测试类"""
+
+    def test_plan_only_when_containers_mixed(self):
+        """测试只有容器混用时才转封装非MP4片段"""
+        infos = {'a.mp4': make_info('a.mp4'),
+                 'b.mkv': make_info('b.mkv', 'matroska,webm', '1/1000'),
+                 'c.mp4': make_info('c.mp4'), 'd.mp4': None}
+        self.assertEqual(plan_remux(infos), ['b.mkv'])
+        self.assertEqual(target_timescale(infos), '12800')
+        self.assertEqual(plan_remux({'a.mkv': make_info('a.mkv', 'matroska,webm')}), [])
+        self.assertEqual(plan_remux({'a.mp4': make_info('a.mp4'), 'c.mp4': make_info('c.mp4')}), [])
+
+    def test_remux_command(self):
+        """测试转封装命令拷贝音视频流、转换ADTS头并统一时间刻度"""
+        cmd = build_remux_command('in.ts', 'out.mp4', make_info('in.ts', 'mpegts', '1/90000'),
+                                  '12800')
+        self.assertEqual(cmd[cmd.index('-c') + 1], 'copy')
+        self.assertEqual(cmd[cmd.index('-bsf:a') + 1], 'aac_adtstoasc')
+        self.assertEqual(cmd[cmd.index('-video_track_timescale') + 1], '12800')
+        self.assertEqual(cmd[-1], 'out.mp4')
+        cmd = build_remux_command('in.avi', 'out.mp4',
+                                  make_info('in.avi', 'avi', audio_codec='mp3'))
+        self.assertNotIn('-bsf:a', cmd)
+        self.assertNotIn('-video_track_timescale', cmd)
+
+    def test_remuxed_info_is_compatible(self):
+        """测试转封装后的预测结果与MP4片段属于同一兼容类"""
+        mkv = remuxed_info(make_info('b.mkv', 'matroska,webm', '1/1000'), '12800')
+        report = build_report({'a.mp4': make_info('a.mp4'), 'b.mkv': mkv})
+        self.assertTrue(report.compatible)
+
+
+class TestMergerRemux(unittest.TestCase):
+    """合并前转封装测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.merger = VideoMerger(input_dir=self.temp_dir, output_dir=self.temp_dir,
+                                  probe_cache=False, show_progress=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def fake_remux(self, clips, timescale=None):
+        results = {}
+        for path in clips:
+            dst = os.path.join(self.temp_dir, os.path.basename(path) + '.mp4')
+            with open(dst, 'wb') as f:
+                f.write(b'x' * 10)
+            results[path] = dst
+        return results
+
+    def test_remux_replaces_non_mp4_clips(self):
+        """测试容器混用时用转封装后的片段替换非MP4片段，并记录到作业统计"""
+        mkv = make_info('b.mkv', 'matroska,webm', '1/1000')
+        media_info = {os.path.join(self.temp_dir, 'a.mp4'): make_info('a.mp4'),
+                      os.path.join(self.temp_dir, 'b.mkv'): mkv}
+        with mock.patch.object(self.merger, 'get_media_info', return_value=media_info), \
+                mock.patch('myproject.video_merger.ContainerRemuxer.remux', autospec=True,
+                           side_effect=lambda _, *args: self.fake_remux(*args)):
+            files = self.merger._remux_containers('out', ['a.mp4', 'b.mkv'])
+        self.assertEqual(files, ['a.mp4', os.path.join(self.temp_dir, 'b.mkv.mp4')])
+        self.assertIn('remux', self.merger.metrics.strategies)
+
+    def test_remux_failure_returns_none(self):
+        """测试任何片段转封装失败时返回None（合并改为重编码）"""
+        media_info = {os.path.join(self.temp_dir, 'a.mp4'): make_info('a.mp4'),
+                      os.path.join(self.temp_dir, 'b.avi'): make_info('b.avi', 'avi')}
+        with mock.patch.object(self.merger, 'get_media_info', return_value=media_info), \
+                mock.patch('myproject.video_merger.ContainerRemuxer.remux',
+                           return_value={os.path.join(self.temp_dir, 'b.avi'): None}):
+            self.assertIsNone(self.merger._remux_containers('out', ['a.mp4', 'b.avi']))
+
+
+if __name__ == '__main__':
+    unittest.main()
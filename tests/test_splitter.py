@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+视频分割测试
+"""
+
+import os
+import sys
+import unittest
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.splitter import plan_split_points
+
+
+class TestSplitPlanning(unittest.TestCase):
+    """分割点计算测试类"""
+
+    def setUp(self):
+        """测试前准备：每2秒一个关键帧的3小时视频"""
+        self.keyframes = [i * 2.0 for i in range(5400)]
+        self.total = 10800.0
+
+    def test_no_split_below_limit(self):
+        """测试未超过上限时不分割"""
+        self.assertEqual(plan_split_points(self.keyframes, 7000, max_duration=7200), [])
+
+    def test_n_way_split_on_keyframes(self):
+        """测试按最大时长分成多部分且切点落在关键帧上"""
+        points = plan_split_points([k + 0.5 for k in self.keyframes], self.total, max_duration=3000)
+        self.assertEqual(len(points), 3)
+        for point in points:
+            self.assertAlmostEqual((point - 0.5) % 2.0, 0.0)
+        bounds = [0.0] + points + [self.total]
+        self.assertTrue(all(b - a <= 3000 for a, b in zip(bounds, bounds[1:])))
+
+    def test_split_by_size(self):
+        """测试按最大体积分割"""
+        points = plan_split_points(self.keyframes, self.total, total_size=10 * 1024 ** 3,
+                                   max_size=4 * 1024 ** 3)
+        self.assertEqual(points, [3600.0, 7200.0])
+
+    def test_last_part_within_limit(self):
+        """测试吸附到关键帧后最后一部分也不超过上限"""
+        points = plan_split_points([0, 25, 50, 75, 100], 110, max_duration=40)
+        self.assertEqual(points, [25, 50, 75])
+        bounds = [0.0] + points + [110]
+        self.assertTrue(all(b - a <= 40 for a, b in zip(bounds, bounds[1:])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+时间戳修复测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.media_probe import MediaInfo, StreamInfo
+from myproject.timestamps import analyze_timestamps, build_fix_command
+from myproject.video_merger import VideoMerger
+
+
+def make_info(path, video_start=0.0, video_duration=10.0, audio_start=0.0, audio_duration=10.0):
+    streams = (
+        StreamInfo(index=0, codec_type='video', codec_name='h264', profile='High', width=1280,
+                   height=720, pix_fmt='yuv420p', sample_aspect_ratio='1:1', frame_rate='25/1',
+                   time_base='1/12800', start_time=video_start, duration=video_duration),
+        StreamInfo(index=1, codec_type='audio', codec_name='aac', profile='LC', sample_rate=48000,
+                   channels=2, channel_layout='stereo', start_time=audio_start,
+                   duration=audio_duration),
+    )
+    return MediaInfo(path=path, duration=10.0, format_name='mov,mp4,m4a,3gp,3g2,mj2', size=2048,
+                     streams=streams)
+
+
+class TestTimestamps(unittest.TestCase):
+    """时间戳修复测试类"""
+
+    def test_aligned_clip_needs_no_fix(self):
+        """测试音视频对齐（包括AAC编码器延迟这样的小偏差）时不修复"""
+        self.assertIsNone(analyze_timestamps(make_info('a.mp4')))
+        self.assertIsNone(analyze_timestamps(make_info('a.mp4', audio_start=-0.021,
+                                                       audio_duration=10.02)))
+
+    def test_late_audio_needs_audio_fix(self):
+        """测试音频晚开始时补齐音频，命令拷贝视频、从视频第一帧开始补静音"""
+        info = make_info('a.mp4', audio_start=0.5, audio_duration=9.5)
+        fix = analyze_timestamps(info)
+        self.assertEqual(fix.kind, 'audio')
+        self.assertAlmostEqual(fix.start_offset, 0.5)
+        cmd = build_fix_command('a.mp4', 'out.mp4', info, fix)
+        self.assertEqual(cmd[cmd.index('-c:v') + 1], 'copy')
+        self.assertEqual(cmd[cmd.index('-af') + 1],
+                         'aresample=async=1:first_pts=0,apad,atrim=end=10.000000')
+        self.assertEqual(cmd[cmd.index('-c:a') + 1], 'aac')
+        self.assertEqual(cmd[cmd.index('-ar') + 1], '48000')
+
+    def test_early_audio_trims_start(self):
+        """测试音频早于视频开始时裁掉视频之前的部分"""
+        info = make_info('a.mp4', video_start=0.4, video_duration=9.6)
+        fix = analyze_timestamps(info)
+        cmd = build_fix_command('a.mp4', 'out.mp4', info, fix)
+        self.assertIn('first_pts=19200', cmd[cmd.index('-af') + 1])
+
+    def test_negative_start_only_shifts(self):
+        """测试音视频对齐但开始时间为负时只流拷贝平移时间戳"""
+        info = make_info('a.mp4', video_start=-0.5, audio_start=-0.5)
+        fix = analyze_timestamps(info)
+        self.assertEqual(fix.kind, 'shift')
+        cmd = build_fix_command('a.mp4', 'out.mp4', info, fix)
+        self.assertEqual(cmd[cmd.index('-c:a') + 1], 'copy')
+        self.assertNotIn('-af', cmd)
+        self.assertEqual(cmd[cmd.index('-avoid_negative_ts') + 1], 'make_zero')
+
+
+class TestMergerTimestamps(unittest.TestCase):
+    """合并前时间戳修复测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.merger = VideoMerger(input_dir=self.temp_dir, output_dir=self.temp_dir,
+                                  probe_cache=False, show_progress=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_only_drifting_clips_replaced(self):
+        """测试只替换时间戳不一致的片段，并记录到作业统计"""
+        a, b = os.path.join(self.temp_dir, 'a.mp4'), os.path.join(self.temp_dir, 'b.mp4')
+        fixed = os.path.join(self.temp_dir, 'b_fixed.mp4')
+        with open(fixed, 'wb') as f:
+            f.write(b'x' * 100)
+        media_info = {a: make_info(a), b: make_info(b, audio_start=0.5, audio_duration=9.5)}
+        with mock.patch.object(self.merger, 'get_media_info', return_value=media_info), \
+                mock.patch('myproject.video_merger.TimestampRepairer.repair',
+                           return_value={b: fixed}), \
+                mock.patch.object(self.merger.media_probe, 'probe', return_value=make_info(fixed)):
+            files = self.merger._repair_timestamps('out', ['a.mp4', 'b.mp4'])
+        self.assertEqual(files, ['a.mp4', fixed])
+        self.assertIn('timestamp_repair', self.merger.metrics.strategies)
+
+    def test_aligned_clips_untouched(self):
+        """测试没有时间戳问题时返回原列表"""
+        files = ['a.mp4']
+        media_info = {os.path.join(self.temp_dir, 'a.mp4'): make_info('a.mp4')}
+        with mock.patch.object(self.merger, 'get_media_info', return_value=media_info):
+            self.assertIs(self.merger._repair_timestamps('out', files), files)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分层合并测试
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.journal import JobJournal, journal_path
+from myproject.trim import TrimSpec
+from myproject.video_merger import MergeOptions, VideoMerger
+
+
+class TestTreeMerge(unittest.TestCase):
+    """分层合并测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.merger = VideoMerger(input_dir=self.temp_dir, output_dir=self.temp_dir,
+                                  probe_cache=False, show_progress=False)
+        self.videos = [f'clip{i}.mp4' for i in range(1, 12)]
+        self.options = MergeOptions(tree_batch_size=3, simple_mode=True)
+        self.calls = []
+        self.fail_once = set()
+        self.layouts = {}
+        self.trims = {}
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def fake_group(self, name, files, *args, layout=None, trims=None, trim_accurate=False):
+        """模拟 _merge_video_group：记录调用并写出输出文件"""
+        self.calls.append((name, [os.path.basename(f) for f in files]))
+        self.layouts[name] = layout
+        self.trims[name] = trims
+        if name in self.fail_once:
+            self.fail_once.discard(name)
+            return False
+        with open(os.path.join(self.temp_dir, f"{name}.mp4"), 'wb') as f:
+            f.write(name.encode('utf-8'))
+        return True
+
+    def test_tree_levels_and_cleanup(self):
+        """测试11个片段按每批3个分两层合并，并删除中间文件"""
+        with mock.patch.object(self.merger, '_merge_video_group', side_effect=self.fake_group):
+            self.assertTrue(self.merger._merge_tree('out', self.videos, self.options))
+
+        names = [name for name, _ in self.calls]
+        self.assertEqual(names, ['.out_tree1_0001', '.out_tree1_0002', '.out_tree1_0003',
+                                 '.out_tree1_0004', '.out_tree2_0001', '.out_tree2_0002', 'out'])
+        self.assertEqual(self.calls[3][1], ['clip10.mp4', 'clip11.mp4'])
+        self.assertEqual(self.calls[-1][1], ['.out_tree2_0001.mp4', '.out_tree2_0002.mp4'])
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ['out.mp4'])
+        self.assertIn('tree', self.merger.metrics.strategies)
+        self.assertEqual(self.layouts['.out_tree1_0001'], 'fragmented')
+        self.assertIsNone(self.layouts['out'])
+
+    def test_failed_batch_retried_alone(self):
+        """测试失败的批次单独重试"""
+        self.fail_once.add('.out_tree1_0002')
+        with mock.patch.object(self.merger, '_merge_video_group', side_effect=self.fake_group):
+            self.assertTrue(self.merger._merge_tree('out', self.videos, self.options))
+        names = [name for name, _ in self.calls]
+        self.assertEqual(names.count('.out_tree1_0002'), 2)
+        self.assertEqual(names.count('.out_tree1_0001'), 1)
+
+    def test_trims_applied_in_first_level_only(self):
+        """测试裁剪只在第一层各批中进行"""
+        spec = TrimSpec(head=5.0)
+        with mock.patch.object(self.merger, '_merge_video_group', side_effect=self.fake_group):
+            self.assertTrue(self.merger._merge_tree('out', self.videos, self.options,
+                                                    trims={'clip1.mp4': spec, 'clip11.mp4': spec}))
+        self.assertEqual(self.trims['.out_tree1_0001'], {'clip1.mp4': spec, 'clip11.mp4': spec})
+        self.assertFalse(self.trims['.out_tree2_0001'])
+        self.assertFalse(self.trims['out'])
+
+    def test_resume_from_highest_complete_level(self):
+        """测试续跑时从最高的完整层继续"""
+        self.merger._journal = JobJournal(journal_path(self.temp_dir, 'out'), 'key')
+        self.fail_once.add('out')
+        with mock.patch.object(self.merger, '_merge_video_group', side_effect=self.fake_group):
+            self.assertFalse(self.merger._merge_tree('out', self.videos, self.options))
+            self.calls = []
+            self.assertTrue(self.merger._merge_tree('out', self.videos, self.options))
+        self.assertEqual(self.calls, [('out', ['.out_tree2_0001.mp4', '.out_tree2_0002.mp4'])])
+
+    @mock.patch('myproject.video_merger.VideoMerger._merge_tree')
+    @mock.patch('myproject.video_merger.VideoMerger._merge_video_group')
+    def test_merge_videos_uses_tree_above_threshold(self, mock_group, mock_tree):
+        """测试片段数超过阈值时merge_videos使用分层合并"""
+        mock_tree.return_value = False
+        self.merger.merge_videos('out', video_files=self.videos, auto_split=False, resume=False,
+                                 tree_threshold=10, tree_batch_size=3)
+        mock_tree.assert_called_once()
+        self.assertEqual(mock_tree.call_args.args[:2], ('out_temp', self.videos))
+        self.assertEqual(mock_tree.call_args.args[2].tree_batch_size, 3)
+        mock_group.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+片头/片尾裁剪测试
+"""
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# 添加项目源码路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from myproject.media_probe import MediaInfo, StreamInfo
+from myproject.intro import audio_print, find_recurring
+from myproject.trim import (ConcatEntry, GopEncoder, TrimSpec, build_gop_command, concat_list,
+                            plan_entries)
+from myproject.video_merger import VideoMerger
+
+KEYFRAMES = [0.0, 2.0, 4.0, 6.0, 8.0, 10.0, 12.0, 14.0, 16.0, 18.0]
+
+
+def make_info(path, duration=20.0):
+    streams = (
+        StreamInfo(index=0, codec_type='video', codec_name='h264', profile='High', width=1280,
+                   height=720, pix_fmt='yuv420p', sample_aspect_ratio='1:1', frame_rate='25/1',
+                   time_base='1/12800'),
+        StreamInfo(index=1, codec_type='audio', codec_name='aac', profile='LC', sample_rate=48000,
+                   channels=2, channel_layout='stereo'),
+    )
+    return MediaInfo(path=path, duration=duration, format_name='mov,mp4,m4a,3gp,3g2,mj2', size=2048,
+                     streams=streams)
+
+
+class TestTrim(unittest.TestCase):
+    """裁剪计划测试类"""
+
+    def test_segments(self):
+        """测试裁剪方式转换为保留的时间段"""
+        self.assertEqual(TrimSpec(head=3.0, tail=2.0).segments(20.0), [(3.0, 18.0)])
+        self.assertEqual(TrimSpec(cut=(5.0, 9.0)).segments(20.0), [(0.0, 5.0), (9.0, 20.0)])
+        self.assertEqual(TrimSpec(head=12.0, tail=10.0).segments(20.0), [])
+        self.assertTrue(TrimSpec().empty)
+
+    def test_copy_trim_snaps_inpoint_to_keyframe(self):
+        """测试拷贝裁剪时起点对齐最近的关键帧，结束点不对齐"""
+        entries = plan_entries('a.mp4', TrimSpec(head=5.2, tail=2.5), 20.0, KEYFRAMES)
+        self.assertEqual(entries, [ConcatEntry('a.mp4', 6.0, 17.5)])
+        entries = plan_entries('a.mp4', TrimSpec(cut=(4.5, 10.9)), 20.0, KEYFRAMES)
+        self.assertEqual(entries, [ConcatEntry('a.mp4', None, 4.5),
+                                   ConcatEntry('a.mp4', 10.0, 20.0)])
+
+    def test_accurate_trim_encodes_first_gop_only(self):
+        """测试帧精确裁剪只重编码起点到下一个关键帧之间的部分"""
+        entries = plan_entries('a.mp4', TrimSpec(head=5.2), 20.0, KEYFRAMES, accurate=True)
+        self.assertEqual(entries, [ConcatEntry('a.mp4', 5.2, 6.0, encode=True),
+                                   ConcatEntry('a.mp4', 6.0, 20.0)])
+        entries = plan_entries('a.mp4', TrimSpec(head=6.0), 20.0, KEYFRAMES, accurate=True)
+        self.assertEqual(entries, [ConcatEntry('a.mp4', 6.0, 20.0)])
+
+    def test_concat_list_and_gop_command(self):
+        """测试生成带 inpoint/outpoint 的列表和GOP重编码命令"""
+        content = concat_list([ConcatEntry("/v/a'.mp4", 6.0, 17.5), ConcatEntry('/v/b.mp4')])
+        self.assertIn("file '/v/a'\\''.mp4'\ninpoint 6.000000\noutpoint 17.500000\n"
+                      "file '/v/b.mp4'\n", content)
+        cmd = build_gop_command(ConcatEntry('a.mp4', 5.2, 6.0, encode=True), 'gop.mp4',
+                                make_info('a.mp4'))
+        self.assertEqual(cmd[cmd.index('-ss') + 1], '5.200000')
+        self.assertLess(cmd.index('-ss'), cmd.index('-i'))
+        self.assertEqual(cmd[cmd.index('-c:v') + 1], 'libx264')
+        self.assertEqual(cmd[cmd.index('-video_track_timescale') + 1], '12800')
+
+        info = make_info('a.mp4')
+        video = info.streams[0]._replace(level=31, refs=3)
+        cmd = build_gop_command(ConcatEntry('a.mp4', 5.2, 6.0, encode=True), 'gop.mp4',
+                                info._replace(streams=(video,) + info.streams[1:]))
+        self.assertEqual(cmd[cmd.index('-level:v') + 1], '3.1')
+        self.assertEqual(cmd[cmd.index('-x264-params') + 1], 'ref=3')
+
+    def test_failed_gop_encode_starts_at_keyframe(self):
+        """测试GOP重编码失败时该段改为从下一个关键帧开始拷贝，不保留原inpoint"""
+        entries = [ConcatEntry('a.mp4', 5.2, 6.0, encode=True), ConcatEntry('a.mp4', 6.0, 20.0)]
+        encoder = GopEncoder(tempfile.gettempdir())
+        with mock.patch.object(encoder, '_encode_one', return_value=None):
+            result = encoder.encode(entries, {'a.mp4': make_info('a.mp4')}, {'a.mp4': KEYFRAMES})
+        self.assertEqual(result, [ConcatEntry('a.mp4', 6.0, 20.0)])
+
+    def test_failed_gop_encode_within_one_gop(self):
+        """测试整段都在一个GOP内且重编码失败时，从段内的关键帧开始拷贝或去掉该段"""
+        entries = [ConcatEntry('b.mp4', 3.0, 3.5, encode=True),
+                   ConcatEntry('c.mp4', 3.0, 4.5, encode=True)]
+        encoder = GopEncoder(tempfile.gettempdir())
+        with mock.patch.object(encoder, '_encode_one', return_value=None):
+            infos = {'b.mp4': make_info('b.mp4'), 'c.mp4': make_info('c.mp4')}
+            result = encoder.encode(entries, infos, {'b.mp4': KEYFRAMES, 'c.mp4': KEYFRAMES})
+        self.assertEqual(result, [ConcatEntry('c.mp4', 4.0, 4.5)])
+        self.assertFalse(any(entry.inpoint == 3.0 for entry in result))
+
+    def test_find_recurring_intro(self):
+        """测试在不同位置出现的同一段片头被找出，没有片头的片段不裁剪"""
+        rng = random.Random(1)
+        intro = [rng.uniform(1e5, 1e7) for _ in range(300)]
+        prints = []
+        for before in (0, 150, 50):
+            noise = [rng.uniform(1e5, 1e7) for _ in range(before)]
+            rest = [rng.uniform(1e5, 1e7) for _ in range(1200 - before - len(intro))]
+            prints.append(audio_print(noise + [e * rng.uniform(1.9, 2.1) for e in intro] + rest))
+        prints.append(audio_print([rng.uniform(1e5, 1e7) for _ in range(1200)]))
+        spans = find_recurring(prints + [None])
+        for span, start in zip(spans, (0.0, 15.0, 5.0)):
+            self.assertAlmostEqual(span[0], start, delta=2.0)
+            self.assertAlmostEqual(span[1], start + 30.0, delta=2.0)
+        self.assertIsNone(spans[3])
+        self.assertIsNone(spans[4])
+
+
+class TestMergerTrim(unittest.TestCase):
+    """合并时裁剪测试类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.merger = VideoMerger(input_dir=self.temp_dir, output_dir=self.temp_dir,
+                                  probe_cache=False, show_progress=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_trim_entries_use_replaced_files(self):
+        """测试按原始片段查找裁剪方式、截取实际参与拼接的文件，并计算裁剪后的时长"""
+        a, b = os.path.join(self.temp_dir, 'a.mp4'), os.path.join(self.temp_dir, 'b_fixed.mp4')
+        media_info = {a: make_info(a), b: make_info(b)}
+        with mock.patch.object(self.merger, 'get_media_info', return_value=media_info), \
+                mock.patch.object(self.merger.media_probe, 'keyframes', return_value=KEYFRAMES):
+            entries, duration = self.merger._trim_entries('out', ['a.mp4', 'b.mp4'], ['a.mp4', b],
+                                                          {'b.mp4': TrimSpec(head=5.2, tail=2.5)})
+        self.assertEqual(entries, [ConcatEntry(a), ConcatEntry(b, 6.0, 17.5)])
+        self.assertAlmostEqual(duration, 31.5)
+        self.assertIn('trim', self.merger.metrics.strategies)
+
+    def test_expect_split_uses_trimmed_duration(self):
+        """测试裁剪后低于分割上限时不预估分割（合并结果直接使用最终输出布局）"""
+        a, b = os.path.join(self.temp_dir, 'a.mp4'), os.path.join(self.temp_dir, 'b.mp4')
+        media_info = {a: make_info(a), b: make_info(b)}
+        with mock.patch.object(self.merger, 'get_media_info', return_value=media_info):
+            self.assertTrue(self.merger._expect_split(['a.mp4', 'b.mp4'], 30.0, None))
+            trims = {'a.mp4': TrimSpec(head=6.0), 'b.mp4': TrimSpec(tail=6.0)}
+            self.assertFalse(self.merger._expect_split(['a.mp4', 'b.mp4'], 30.0, None, trims))
+            self.assertFalse(self.merger._expect_split(['a.mp4', 'b.mp4'], None, 3000, trims))
+
+    def test_resolve_trims(self):
+        """测试trim参数的几种形式"""
+        files = ['a.mp4', 'b.mp4']
+        spec = TrimSpec(head=3.0)
+        self.assertEqual(self.merger._resolve_trims(spec, files), {'a.mp4': spec, 'b.mp4': spec})
+        self.assertEqual(self.merger._resolve_trims({'b.mp4': [0.0, 4.0], 'c.mp4': spec}, files),
+                         {'b.mp4': TrimSpec(tail=4.0)})
+        with mock.patch.object(self.merger, 'detect_trims', return_value={}) as mock_detect:
+            self.merger._resolve_trims('intro', files)
+        mock_detect.assert_called_once_with(files, intro=True, outro=False)
+        with self.assertRaises(ValueError):
+            self.merger._resolve_trims('credits', files)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,13 +7,18 @@
 
 import os
 import sys
+import concurrent.futures
+import shutil
+import tempfile
 import unittest
 from unittest import mock
 
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from myproject.video_merger import VideoMerger
+from myproject.compatibility import Fingerprint
+from myproject.encoders import EncoderCapability
+from myproject.video_merger import MergeOptions, VideoMerger
 
 
 class TestVideoMerger(unittest.TestCase):
@@ -61,6 +66,120 @@ class TestVideoMerger(unittest.TestCase):
             self.assertTrue(result)
             mock_merge.assert_called_once()
     
+    @mock.patch('myproject.video_merger.VideoMerger._merge_video_group')
+    @mock.patch('myproject.video_merger.VideoMerger.check_video_info')
+    def test_split_from_sources_groups_on_clip_boundaries(self, mock_info, mock_merge):
+        """测试直接从源片段合并分割部分"""
+        videos = ['v1.mp4', 'v2.mp4', 'v3.mp4', 'v4.mp4']
+        mock_info.return_value = [(os.path.join(self.input_dir, v), 3000.0) for v in videos]
+        mock_merge.return_value = True
+
+        options = MergeOptions(use_hw_accel=False, simple_mode=True, split_max_duration=7200,
+                               keep_full=False)
+        result = self.merger._merge_split_from_sources('out', videos, options)
+
+        self.assertTrue(result)
+        groups = sorted((c.args[0], c.args[1]) for c in mock_merge.call_args_list)
+        self.assertEqual(groups, [('out_part1', ['v1.mp4', 'v2.mp4']),
+                                  ('out_part2', ['v3.mp4', 'v4.mp4'])])
+
+    def _sized_clips(self, sizes):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir, ignore_errors=True)
+        paths = []
+        for i, size in enumerate(sizes, 1):
+            path = os.path.join(temp_dir, f"v{i}.mp4")
+            with open(path, 'wb') as f:
+                f.write(b'\0' * size)
+            paths.append(path)
+        return temp_dir, paths
+
+    def test_split_from_sources_partitions_by_size(self):
+        """测试设置体积上限时按估计的字节数分组，合并后各部分超过上限时改为普通流程"""
+        temp_dir, paths = self._sized_clips([100, 100, 100, 500])
+        merger = VideoMerger(input_dir=temp_dir, output_dir=temp_dir, probe_cache=False,
+                             show_progress=False)
+        videos = [os.path.basename(p) for p in paths]
+        options = MergeOptions(use_hw_accel=False, simple_mode=True, split_max_duration=None,
+                               split_max_size=500, keep_full=False)
+
+        def fake_merge(name, files, opts, **kwargs):
+            with open(os.path.join(temp_dir, f"{name}.mp4"), 'wb') as f:
+                f.write(b'\0' * (100 * len(files)))
+            return True
+
+        info = [(p, 60.0) for p in paths]
+        with mock.patch.object(merger, 'check_video_info', return_value=info), \
+                mock.patch.object(merger, '_merge_video_group',
+                                  side_effect=fake_merge) as mock_merge:
+            self.assertTrue(merger._merge_split_from_sources('out', videos, options))
+            groups = sorted((c.args[0], c.args[1]) for c in mock_merge.call_args_list)
+            self.assertEqual(groups, [('out_part1', videos[:3]), ('out_part2', videos[3:])])
+
+            # 合并后的实际体积超过上限：删除各部分，交给调用方合并后按关键帧分割
+            mock_merge.side_effect = lambda name, files, opts, **kwargs: fake_merge(
+                name, files * 3, opts)
+            self.assertIsNone(merger._merge_split_from_sources('out', videos, options))
+            self.assertFalse(os.path.exists(os.path.join(temp_dir, 'out_part1.mp4')))
+
+    def test_split_from_sources_uses_one_target(self):
+        """测试各部分需要重编码时使用由全体片段确定的同一个编码目标，并依次运行"""
+        videos = ['v1.mp4', 'v2.mp4', 'v3.mp4', 'v4.mp4']
+        target = Fingerprint(
+            video=('h264', 'High', 1920, 1080, 'yuv420p', '1:1', '25/1', '1/12800'),
+            audio=('aac', 'LC', 48000, 2, 'stereo'))
+        options = MergeOptions(use_hw_accel=False, split_max_duration=7200, keep_full=False)
+        info = [(os.path.join(self.input_dir, v), 3000.0) for v in videos]
+        with mock.patch.object(self.merger, 'check_video_info', return_value=info), \
+                mock.patch.object(self.merger, '_remux_containers', return_value=None), \
+                mock.patch.object(self.merger, '_encode_target',
+                                  return_value=target) as mock_target, \
+                mock.patch.object(self.merger, '_merge_video_group',
+                                  return_value=True) as mock_merge, \
+                mock.patch('concurrent.futures.ThreadPoolExecutor',
+                           wraps=concurrent.futures.ThreadPoolExecutor) as mock_pool:
+            self.assertTrue(self.merger._merge_split_from_sources('out', videos, options))
+        mock_target.assert_called_once_with(videos)
+        self.assertEqual(mock_pool.call_args.kwargs['max_workers'], 1)
+        self.assertEqual(len(mock_merge.call_args_list), 2)
+        for c in mock_merge.call_args_list:
+            self.assertIs(c.kwargs['target'], target)
+            self.assertTrue(c.args[2].force_encode)
+
+    def test_parallel_encode_uses_registry_encoder(self):
+        """测试并行分组编码与非并行重编码一样使用能力表选出的编码器"""
+        vaapi = EncoderCapability('vaapi', 'h264_vaapi', 'h264',
+                                  ['-vaapi_device', '/dev/dri/renderD128',
+                                   '-vf', 'format=nv12,hwupload'],
+                                  True, 400.0)
+        registry = mock.MagicMock()
+        registry.best.return_value = vaapi
+        merger = VideoMerger(input_dir=self.input_dir, output_dir=self.output_dir,
+                             encoder_registry=registry, probe_cache=False, show_progress=False)
+        report = mock.MagicMock()
+        report.majority.fingerprint = Fingerprint(
+            video=('h264', 'High', 1920, 1080, 'yuv420p', '1:1', '25/1', '1/12800'),
+            audio=('aac', 'LC', 44100, 2, 'stereo'))
+        report.classes = [report.majority]
+        videos = ['v1.mp4', 'v2.mp4', 'v3.mp4', 'v4.mp4']
+        with mock.patch.object(merger, 'get_compatibility_report', return_value=report), \
+                mock.patch.object(merger, 'create_merge_list',
+                                  side_effect=lambda files, path: path), \
+                mock.patch.object(merger, '_run_ffmpeg', return_value=True) as mock_run:
+            self.assertTrue(merger._parallel_encode('out', videos, [60.0] * 4, 'out.mp4', 2,
+                                                    'faster', 23))
+            chunk_commands = [c.args[0] for c in mock_run.call_args_list[:-1]]
+            self.assertEqual(len(chunk_commands), 2)
+            for cmd in chunk_commands:
+                self.assertEqual(cmd[cmd.index('-c:v') + 1], 'h264_vaapi')
+
+            mock_run.reset_mock()
+            self.assertTrue(merger._parallel_encode('out', videos, [60.0] * 4, 'out.mp4', 2,
+                                                    'faster', 23, use_hw_accel=False))
+            cmd = mock_run.call_args_list[0].args[0]
+            self.assertEqual(cmd[cmd.index('-c:v') + 1], 'libx264')
+        shutil.rmtree(merger._work_dir('out'), ignore_errors=True)
+
     def test_get_video_codec(self):
         """测试获取视频编码格式"""
         # 使用mock模拟ffmpeg命令输出